@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+from bisect import bisect_left, insort
+
+from dataset_stats import get_token_counter
+from document_parser import parse_document
+
+# Ajuste de los bloques de la ley a un presupuesto de tokens antes de generar
+# los ejemplos:
+#
+#   - Los artículos largos (multas y sanciones, como el 131) se dividen en
+#     partes de como máximo `max_tokens`, cortando en los parágrafos y numerales
+#     del árbol de document_parser.py. Solo si un parágrafo o numeral no cabe se
+#     corta por líneas, oraciones y, en último caso, palabras. Las preguntas de
+#     cada parte indican la continuación: "(parte 2 de 4, desde el parágrafo 1)".
+#   - Los artículos cortos (menos de `min_tokens`) de un mismo capítulo se
+#     empaquetan con best-fit decreasing en bloques de hasta `max_tokens`; los
+#     formatos de chat escriben cada bloque como una conversación de varios
+#     turnos (pregunta y respuesta de cada artículo) y el formato de texto une
+#     sus textos.
+#
+# Así hay menos ejemplos truncados por el límite de contexto y menos tokens de
+# relleno en cada lote de entrenamiento. Los bloques se generan en streaming:
+# solo se guardan los artículos cortos del capítulo en curso.
+#
+#   python article_chunking.py --max-tokens 512 --min-tokens 128
+
+DEFAULT_MAX_TOKENS = 1024  # Tokens máximos de la respuesta de cada ejemplo
+DEFAULT_MIN_TOKENS = 128  # Los artículos con menos tokens se empaquetan
+TURN_OVERHEAD_TOKENS = 32  # Tokens que suma cada turno empaquetado (pregunta y formato de los mensajes)
+SEPARATORS = ("\n", ". ", " ")  # Cortes de respaldo cuando un parágrafo o numeral no cabe
+SPLIT_KINDS = ("paragrafo", "numeral")
+PACKED_SEPARATOR = "\n\n"  # Separador de los textos empaquetados en el formato de texto
+
+
+class ArticlePart:
+    """Parte de un artículo con la misma interfaz que articles.Article (`number`, `title`, `content`).
+
+    `part` y `parts` numeran las partes de un artículo dividido (1 de 1 si
+    cabe completo) y `label` describe dónde empieza la parte ("desde el parágrafo 1").
+    """
+
+    __slots__ = ("article", "content", "tokens", "part", "parts", "label")
+
+    def __init__(self, article, content, tokens, part=1, parts=1, label=""):
+        self.article = article
+        self.content = content
+        self.tokens = tokens
+        self.part = part
+        self.parts = parts
+        self.label = label
+
+    @property
+    def number(self):
+        return self.article.number
+
+    @property
+    def title(self):
+        return self.article.title
+
+    def ancestor(self, kind):
+        ancestor = getattr(self.article, "ancestor", None)
+        return ancestor(kind) if ancestor is not None else None
+
+    def __getattr__(self, name):
+        # Otros datos del artículo (por ejemplo `source` y `key` en un corpus)
+        return getattr(self.article, name)
+
+    @property
+    def question_context(self):
+        """Texto que se agrega a las preguntas de un artículo dividido (vacío si el artículo está completo)."""
+        if self.parts == 1:
+            return ""
+        label = f", {self.label}" if self.label else ""
+        return f" (parte {self.part} de {self.parts}{label})"
+
+    def __repr__(self):
+        return f"<ArticlePart {self.number} {self.part}/{self.parts} {self.tokens} tokens>"
+
+
+def pack_items(sizes, capacity):
+    """Empaqueta elementos en contenedores de `capacity` con best-fit decreasing.
+
+    Cada elemento va al contenedor más lleno donde todavía cabe (búsqueda
+    binaria sobre las capacidades libres), así que el costo es O(n log n) más
+    las inserciones en la lista ordenada. Devuelve listas de índices, cada una
+    en orden creciente.
+    """
+    bins = []
+    free = []  # (capacidad libre, índice del contenedor), ordenada
+    for index in sorted(range(len(sizes)), key=lambda i: (-sizes[i], i)):
+        size = sizes[index]
+        position = bisect_left(free, (size, -1))
+        if position == len(free):
+            bins.append([index])
+            insort(free, (capacity - size, len(bins) - 1))
+            continue
+        remaining, bin_index = free.pop(position)
+        bins[bin_index].append(index)
+        insort(free, (remaining - size, bin_index))
+    return [sorted(items) for items in bins]
+
+
+def _node_label(node, continued=False):
+    """Describe dónde empieza una parte: "desde el parágrafo 1" o, si sigue un trozo anterior, "continuación del numeral B"."""
+    if node is None or node.kind not in SPLIT_KINDS:
+        return ""
+    if node.kind == "paragrafo":
+        name = f"parágrafo {node.label}" if node.label else "parágrafo"
+    else:
+        name = f"literal {node.label})" if node.label.islower() else f"numeral {node.label}"
+    return f"continuación del {name}" if continued else f"desde el {name}"
+
+
+def _article_node(article):
+    """Nodo del árbol del artículo: el propio nodo, o el resultado de analizar su texto (Article de un JSONL)."""
+    if hasattr(article, "iter_nodes"):
+        return article
+    document = parse_document(article.content)
+    return next(document.articles(), None)
+
+
+class ArticleChunker:
+    """Divide los artículos largos y empaqueta los cortos; ver `iter_blocks`."""
+
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, min_tokens=DEFAULT_MIN_TOKENS, tokenizer="aproximado"):
+        if max_tokens < 1:
+            raise ValueError("El presupuesto de tokens debe ser mayor que cero")
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self._count = get_token_counter(tokenizer)
+
+    def count_tokens(self, text):
+        return self._count([text])[0]
+
+    def _split_text(self, text, start, end, separators=SEPARATORS):
+        # Rangos (inicio, fin) de como máximo max_tokens cortando en el primer separador que sirva
+        if start >= end:
+            return []
+        if self.count_tokens(text[start:end]) <= self.max_tokens or not separators:
+            return [(start, end)]
+        separator = separators[0]
+        pieces = []
+        position = start
+        while position < end:
+            cut = text.find(separator, position, end)
+            cut = end if cut == -1 else cut + len(separator)
+            pieces.extend(self._split_text(text, position, cut, separators[1:]))
+            position = cut
+        return pieces
+
+    def _split_node(self, text, start, end, node):
+        """Rangos (inicio, fin, nodo, continuación) que cubren [start, end) sin superar el presupuesto.
+
+        Se corta primero en los parágrafos y numerales hijos del nodo; los
+        trozos de un nodo que no cabe quedan marcados como continuación.
+        """
+        if self.count_tokens(text[start:end]) <= self.max_tokens:
+            return [(start, end, node, False)]
+        children = [child for child in node.children if child.kind in SPLIT_KINDS and start < child.start < end] if node is not None else []
+        head_end = children[0].start if children else end
+        spans = [(piece_start, piece_end, node, i > 0) for i, (piece_start, piece_end) in enumerate(self._split_text(text, start, head_end))]
+        for i, child in enumerate(children):
+            child_end = children[i + 1].start if i + 1 < len(children) else end
+            spans.extend(self._split_node(text, child.start, child_end, child))
+        return spans
+
+    def split(self, article):
+        """Devuelve las partes del artículo (una sola si cabe en el presupuesto)."""
+        content = article.content
+        tokens = self.count_tokens(content)
+        if tokens <= self.max_tokens:
+            return [ArticlePart(article, content, tokens)]
+
+        node = _article_node(article)
+        if node is not None and hasattr(article, "iter_nodes"):
+            text, start, end = node.document.text, node.start, node.end
+        elif node is not None:
+            text, start, end = node.document.text, 0, len(content)
+        else:
+            text, start, end, node = content, 0, len(content), None
+        spans = self._split_node(text, start, end, node)
+
+        # Se juntan los rangos consecutivos mientras quepan en el presupuesto
+        chunks = []
+        for span_start, span_end, span_node, continued in spans:
+            span_tokens = self.count_tokens(text[span_start:span_end])
+            if chunks and chunks[-1][2] + span_tokens <= self.max_tokens:
+                chunks[-1][1] = span_end
+                chunks[-1][2] += span_tokens
+            else:
+                chunks.append([span_start, span_end, span_tokens, _node_label(span_node, continued)])
+        chunks = [chunk for chunk in chunks if text[chunk[0]:chunk[1]].strip()]
+        return [
+            ArticlePart(article, text[chunk_start:chunk_end].strip(), chunk_tokens, part, len(chunks), label)
+            for part, (chunk_start, chunk_end, chunk_tokens, label) in enumerate(chunks, 1)
+        ]
+
+    def _pack(self, parts):
+        sizes = [part.tokens + TURN_OVERHEAD_TOKENS for part in parts]
+        for items in pack_items(sizes, self.max_tokens):
+            yield [parts[index] for index in items]
+
+    @staticmethod
+    def _group_key(article):
+        # Los artículos cortos solo se empaquetan con los de su mismo capítulo (o
+        # título); los nodos se comparan por identidad, así que en un corpus no se
+        # mezclan artículos de distintos documentos
+        ancestor = getattr(article, "ancestor", None)
+        if ancestor is None:
+            return None
+        return ancestor("capitulo") or ancestor("titulo") or getattr(article, "document", None)
+
+    def iter_blocks(self, articles):
+        """Genera bloques (listas de ArticlePart) a partir del flujo de artículos.
+
+        Un artículo largo produce un bloque por parte; los cortos de un capítulo
+        se emiten al terminar el capítulo, empaquetados. El preámbulo
+        ("UNKNOWN") nunca se empaqueta.
+        """
+        pending = []
+        group = None
+        for article in articles:
+            key = self._group_key(article)
+            if key != group:
+                yield from self._pack(pending)
+                pending = []
+                group = key
+            parts = self.split(article)
+            if len(parts) == 1 and parts[0].tokens < self.min_tokens and article.number != "UNKNOWN":
+                pending.append(parts[0])
+                continue
+            for part in parts:
+                yield [part]
+        yield from self._pack(pending)
+
+
+def add_chunking_arguments(parser):
+    parser.add_argument("--max-tokens", dest="max_tokens", type=int, default=None,
+                        help=f"Divide los artículos largos y empaqueta los cortos con este presupuesto de tokens por respuesta (por ejemplo {DEFAULT_MAX_TOKENS})")
+    parser.add_argument("--min-tokens", dest="min_tokens", type=int, default=DEFAULT_MIN_TOKENS,
+                        help=f"Con --max-tokens, los artículos con menos tokens se empaquetan (por defecto {DEFAULT_MIN_TOKENS}; 0 para no empaquetar)")
+
+
+def chunker_from_args(args):
+    """Devuelve un ArticleChunker si se pidió --max-tokens, o None."""
+    if args.max_tokens is None:
+        return None
+    return ArticleChunker(args.max_tokens, args.min_tokens)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Muestra cómo se dividen y empaquetan los artículos con un presupuesto de tokens.")
+    parser.add_argument("--pdf", default="ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf")
+    parser.add_argument("--max-tokens", dest="max_tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--min-tokens", dest="min_tokens", type=int, default=DEFAULT_MIN_TOKENS)
+    parser.add_argument("--articulo", default=None, help="Muestra las partes de este artículo")
+    parser.add_argument("--reporte", default=None, help="Guarda el resumen en este JSON")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.pdf):
+        parser.error(f"No existe el archivo {args.pdf}")
+
+    from articles import extract_pages_from_pdf, iter_articles
+
+    try:
+        chunker = ArticleChunker(args.max_tokens, args.min_tokens)
+    except ValueError as e:
+        parser.error(str(e))
+    pages = extract_pages_from_pdf(args.pdf)
+    articles = list(iter_articles(pages))
+    if args.articulo is not None:
+        article = next((article for article in articles if article.number == args.articulo), None)
+        if article is None:
+            parser.error(f"No se encontró el artículo {args.articulo}")
+        for part in chunker.split(article):
+            print(f"--- Parte {part.part} de {part.parts} ({part.tokens} tokens){part.question_context}")
+            print(part.content[:300] + ("..." if len(part.content) > 300 else ""))
+        return
+
+    tokens = [chunker.count_tokens(article.content) for article in articles]
+    blocks = list(chunker.iter_blocks(articles))
+    block_tokens = [sum(part.tokens for part in block) for block in blocks]
+    summary = {
+        "max_tokens": args.max_tokens,
+        "min_tokens": args.min_tokens,
+        "articles": len(articles),
+        "articles_over_budget": sum(1 for count in tokens if count > args.max_tokens),
+        "split_articles": len({block[0].number for block in blocks if block[0].parts > 1}),
+        "packed_articles": sum(len(block) for block in blocks if len(block) > 1),
+        "packed_blocks": sum(1 for block in blocks if len(block) > 1),
+        "blocks": len(blocks),
+        "max_block_tokens": max(block_tokens, default=0),
+        # Relleno si cada lote se rellena hasta el bloque más largo (lotes de un solo tamaño)
+        "fill_ratio": round(sum(block_tokens) / (len(blocks) * max(block_tokens)), 3) if blocks else 0,
+        "fill_ratio_before": round(sum(tokens) / (len(tokens) * max(tokens)), 3) if tokens else 0,
+    }
+    print(f"  {summary['articles']} bloques de la ley, {summary['articles_over_budget']} superan {args.max_tokens} tokens")
+    print(f"  {summary['split_articles']} artículos divididos, {summary['packed_articles']} artículos cortos en {summary['packed_blocks']} paquetes")
+    print(f"  {summary['blocks']} bloques resultantes, el mayor con {summary['max_block_tokens']} tokens")
+    print(f"  Ocupación frente al bloque más largo: {summary['fill_ratio_before']:.1%} -> {summary['fill_ratio']:.1%}")
+    if args.reporte:
+        with open(args.reporte, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"Resumen guardado en {args.reporte}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import struct
+from array import array
+
+from articles import extract_article_info
+from jsonl_io import read_chunk_lines
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson es opcional
+    import json
+    _loads = json.loads
+
+# Índice de offsets por artículo: un archivo `<dataset>.jsonl.idx` junto a cada
+# JSONL sin comprimir. Es una tabla hash de direccionamiento abierto que se lee
+# con mmap, así que buscar un artículo cuesta lo mismo con mil o con millones
+# de líneas y solo se leen del JSONL los bytes de los ejemplos encontrados.
+#
+# Las claves son los números de artículo o, en los datasets de un corpus,
+# "<norma>:<número>" (ver articles.article_key). Los ejemplos no guardan su
+# clave, así que al reconstruir el índice de un dataset del corpus se deduce
+# con el JSONL de artículos del corpus (corpus_articulos.jsonl) que
+# generate_datasets.py --corpus escribe en la misma carpeta.
+#
+# Formato (little-endian):
+#   encabezado  magic, versión, tamaño y mtime_ns del JSONL, cubetas, entradas
+#   cubetas     (hash de 64 bits del número de artículo, primera entrada, cantidad)
+#   entradas    (offset, longitud) de cada línea, agrupadas por artículo
+
+INDEX_MAGIC = b"JIDX"
+INDEX_VERSION = 1
+INDEX_EXTENSION = ".idx"
+HEADER = struct.Struct("<4sHxxQqII")
+BUCKET = struct.Struct("<QII")
+ENTRY = struct.Struct("<QI")
+
+QUESTION_ARTICLE_PATTERN = re.compile(r'art[ií]culo\s+(\d+)', re.IGNORECASE)
+
+
+def index_path_for(jsonl_path):
+    return jsonl_path + INDEX_EXTENSION
+
+
+def _key_hash(number):
+    digest = hashlib.blake2b(str(number).strip().encode("utf-8"), digest_size=8).digest()
+    # El 0 marca las cubetas vacías
+    return int.from_bytes(digest, "little") or 1
+
+
+def example_article_number(data):
+    """Deduce el número de artículo de un ejemplo ya parseado (texto, OpenAI o Gemini)."""
+    if "text" in data:
+        return extract_article_info(data["text"])[0]
+    answer = ""
+    for message in data.get("messages", []):
+        if message.get("role") == "user":
+            match = QUESTION_ARTICLE_PATTERN.search(message.get("content") or "")
+            if match:
+                return match.group(1)
+        elif message.get("role") in ("assistant", "model"):
+            answer = message.get("content") or ""
+    return extract_article_info(answer)[0]
+
+
+def _first_turn(data):
+    """Primera pregunta y su respuesta de un ejemplo de chat."""
+    question = None
+    for message in data.get("messages", []):
+        if message.get("role") == "user" and question is None:
+            question = message.get("content") or ""
+        elif message.get("role") in ("assistant", "model") and question is not None:
+            return question, message.get("content") or ""
+    return question or "", ""
+
+
+def corpus_path_for(jsonl_path):
+    """JSONL de artículos del corpus que acompaña a un dataset generado con --corpus, o None."""
+    from corpus import DEFAULT_OUTPUT_PATH
+    from emitters import CORPUS_OUTPUT_STEM
+
+    if not os.path.basename(jsonl_path).startswith(CORPUS_OUTPUT_STEM):
+        return None
+    corpus_path = os.path.join(os.path.dirname(jsonl_path), DEFAULT_OUTPUT_PATH)
+    return corpus_path if os.path.isfile(corpus_path) else None
+
+
+class CorpusKeys:
+    """Deduce la clave "<norma>:<número>" de los ejemplos con el JSONL de artículos del corpus.
+
+    En los formatos de chat la pregunta nombra su norma; si no nombra
+    ninguna (o nombra varias), se busca la respuesta entre los artículos del
+    corpus, como en el formato de texto. Un artículo idéntico en varias normas
+    se asigna a la norma del ejemplo anterior: los datasets (y sus divisiones y
+    fragmentos) conservan el orden del corpus.
+    """
+
+    def __init__(self, corpus_path):
+        self._prefixes = {}
+        self._contents = {}
+        self._last_prefix = None
+        with open(corpus_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = _loads(line)
+                self._prefixes.setdefault(record["source"].lower(), record["key"].rsplit(":", 1)[0])
+                self._contents.setdefault(record["content"], []).append(record["key"])
+        # Los nombres más largos primero y con límites de palabra: "Decreto 79 de 2015" no está en "Decreto 1079 de 2015"
+        names = sorted(self._prefixes, key=len, reverse=True)
+        self._source_pattern = re.compile("|".join(rf"\b{re.escape(name)}\b" for name in names), re.IGNORECASE) if names else None
+
+    def key_for(self, data, number):
+        """Clave del ejemplo en el corpus; el número solo si no se puede deducir la norma."""
+        if "text" in data:
+            content = data["text"]
+        else:
+            question, content = _first_turn(data)
+            sources = {name.lower() for name in self._source_pattern.findall(question)} if self._source_pattern else ()
+            if len(sources) == 1:
+                self._last_prefix = self._prefixes[sources.pop()]
+                return f"{self._last_prefix}:{number}"
+        keys = self._contents.get(content)
+        if not keys:
+            return number
+        key = next((key for key in keys if key.rsplit(":", 1)[0] == self._last_prefix), keys[0])
+        self._last_prefix = key.rsplit(":", 1)[0]
+        return key
+
+
+class ArticleIndexBuilder:
+    """Acumula los offsets de las líneas por artículo mientras se escribe el JSONL."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, number, offset, length):
+        entries = self._entries.get(number)
+        if entries is None:
+            entries = self._entries[number] = (array('Q'), array('I'))
+        entries[0].append(offset)
+        entries[1].append(length)
+
+    def save(self, jsonl_path, index_path=None):
+        """Escribe el índice; debe llamarse después de cerrar el JSONL para registrar su tamaño y fecha."""
+        index_path = index_path or index_path_for(jsonl_path)
+        stat = os.stat(jsonl_path)
+
+        # Factor de carga <= 0.5: las búsquedas recorren casi siempre una sola cubeta
+        bucket_count = 1
+        while bucket_count < 2 * len(self._entries):
+            bucket_count *= 2
+        buckets = [(0, 0, 0)] * bucket_count
+        entry_count = 0
+        for number, (offsets, lengths) in self._entries.items():
+            key_hash = _key_hash(number)
+            slot = key_hash & (bucket_count - 1)
+            while buckets[slot][0]:
+                slot = (slot + 1) & (bucket_count - 1)
+            buckets[slot] = (key_hash, entry_count, len(offsets))
+            entry_count += len(offsets)
+
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, bucket_count, entry_count))
+            f.write(b"".join(BUCKET.pack(*bucket) for bucket in buckets))
+            for offsets, lengths in self._entries.values():
+                f.write(b"".join(ENTRY.pack(offset, length) for offset, length in zip(offsets, lengths)))
+        os.replace(tmp_path, index_path)
+        return index_path
+
+
+def build_index(jsonl_path, index_path=None, corpus_path=None):
+    """Reconstruye el índice recorriendo un JSONL existente (por ejemplo, uno de los scripts originales).
+
+    Con `corpus_path` (el JSONL de corpus.py) las claves son "<norma>:<número>",
+    como las que escriben los emisores con --corpus.
+    """
+    corpus_keys = CorpusKeys(corpus_path) if corpus_path else None
+    builder = ArticleIndexBuilder()
+    size = os.path.getsize(jsonl_path)
+    offset = 0
+    for line in read_chunk_lines(jsonl_path, 0, size) if size else []:
+        if line.strip():
+            try:
+                data = _loads(line)
+                number = example_article_number(data)
+                if corpus_keys is not None:
+                    number = corpus_keys.key_for(data, number)
+            except (ValueError, AttributeError, TypeError):
+                number = "UNKNOWN"
+            builder.add(number, offset, len(line) + 1)
+        offset += len(line) + 1
+    return builder.save(jsonl_path, index_path)
+
+
+def is_index_current(jsonl_path, index_path=None):
+    """Indica si el índice existe y corresponde al tamaño y fecha actuales del JSONL."""
+    index_path = index_path or index_path_for(jsonl_path)
+    try:
+        with open(index_path, 'rb') as f:
+            header = f.read(HEADER.size)
+        stat = os.stat(jsonl_path)
+    except OSError:
+        return False
+    if len(header) < HEADER.size:
+        return False
+    magic, version, size, mtime_ns, _, _ = HEADER.unpack(header)
+    return magic == INDEX_MAGIC and version == INDEX_VERSION and (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+
+
+def _read_entries(index_path):
+    """Lee un índice completo: {hash de la clave: [(offset, longitud), ...]}."""
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    _, _, _, _, bucket_count, _ = HEADER.unpack_from(data, 0)
+    entries_start = HEADER.size + bucket_count * BUCKET.size
+    entries = {}
+    for key_hash, first, count in BUCKET.iter_unpack(data[HEADER.size:entries_start]):
+        if key_hash:
+            start = entries_start + first * ENTRY.size
+            entries[key_hash] = list(ENTRY.iter_unpack(data[start:start + count * ENTRY.size]))
+    return entries
+
+
+def verify_index(jsonl_path, index_path=None, corpus_path=None):
+    """Reconstruye el índice en un archivo temporal y devuelve cuántas claves difieren del índice escrito."""
+    index_path = index_path or index_path_for(jsonl_path)
+    rebuilt_path = build_index(jsonl_path, index_path + ".verificar", corpus_path or corpus_path_for(jsonl_path))
+    try:
+        written, rebuilt = _read_entries(index_path), _read_entries(rebuilt_path)
+    finally:
+        os.remove(rebuilt_path)
+    return sum(written.get(key_hash) != rebuilt.get(key_hash) for key_hash in written.keys() | rebuilt.keys())
+
+
+class ArticleIndex:
+    """Índice abierto con mmap; `lookup` y `examples` no leen el resto del archivo.
+
+    Si el JSONL cambió desde que se escribió el índice (o no hay índice), se
+    reconstruye automáticamente al abrirlo; en un dataset del corpus, con el
+    JSONL de artículos del corpus de su carpeta (ver corpus_path_for).
+    """
+
+    def __init__(self, jsonl_path, index_path=None, rebuild=True, corpus_path=None):
+        self.jsonl_path = jsonl_path
+        self.index_path = index_path or index_path_for(jsonl_path)
+        if not is_index_current(jsonl_path, self.index_path):
+            if not rebuild:
+                raise ValueError(f"El índice {self.index_path} no existe o está desactualizado")
+            build_index(jsonl_path, self.index_path, corpus_path or corpus_path_for(jsonl_path))
+        with open(self.index_path, 'rb') as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, self.size, _, self.bucket_count, self.entry_count = HEADER.unpack_from(self._index, 0)
+        self._entries_start = HEADER.size + self.bucket_count * BUCKET.size
+        self._data = None
+
+    def lookup(self, number):
+        """Devuelve la lista de (offset, longitud) de las líneas del artículo."""
+        key_hash = _key_hash(number)
+        slot = key_hash & (self.bucket_count - 1)
+        while True:
+            bucket_hash, first, count = BUCKET.unpack_from(self._index, HEADER.size + slot * BUCKET.size)
+            if bucket_hash == 0:
+                return []
+            if bucket_hash == key_hash:
+                start = self._entries_start + first * ENTRY.size
+                return [ENTRY.unpack_from(self._index, start + i * ENTRY.size) for i in range(count)]
+            slot = (slot + 1) & (self.bucket_count - 1)
+
+    def examples(self, number):
+        """Devuelve las líneas JSONL (bytes, sin salto de línea) del artículo."""
+        ranges = self.lookup(number)
+        if not ranges or not self.size:
+            return []
+        if self._data is None:
+            with open(self.jsonl_path, 'rb') as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return [self._data[offset:offset + length].rstrip(b"\n") for offset, length in ranges]
+
+    def close(self):
+        for mm in (self._index, self._data):
+            if mm is not None:
+                mm.close()
+        self._index = self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca los ejemplos de un artículo en un JSONL usando su índice de offsets.")
+    parser.add_argument("dataset", help="Archivo JSONL sin comprimir")
+    parser.add_argument("articles", nargs="*", help="Números de artículo a buscar (p. ej. 131), o claves en un corpus (p. ej. ley-1383-de-2010:131)")
+    parser.add_argument("--reconstruir", dest="rebuild", action="store_true", help="Reconstruye el índice aunque esté al día")
+    parser.add_argument("--verificar", dest="verify", action="store_true", help="Comprueba que reconstruir el índice da las mismas claves y líneas que el índice escrito")
+    parser.add_argument("--corpus", dest="corpus_path", default=None, help="JSONL de artículos del corpus para las claves <norma>:<número> (por defecto: el corpus_articulos.jsonl junto a un dataset articulos_corpus*)")
+    args = parser.parse_args()
+
+    if args.dataset.endswith((".gz", ".zst")):
+        parser.error("El índice solo está disponible para archivos JSONL sin comprimir")
+    corpus_path = args.corpus_path or corpus_path_for(args.dataset)
+    if args.verify:
+        if not is_index_current(args.dataset):
+            parser.error(f"El índice de {args.dataset} no existe o está desactualizado")
+        differences = verify_index(args.dataset, corpus_path=corpus_path)
+        print(f"Verificación del índice: {differences} claves distintas al reconstruirlo")
+        if differences:
+            raise SystemExit(1)
+    if args.rebuild:
+        print(f"Índice reconstruido: {build_index(args.dataset, corpus_path=corpus_path)}")
+
+    with ArticleIndex(args.dataset, corpus_path=corpus_path) as index:
+        for number in args.articles:
+            lines = index.examples(number)
+            if not lines:
+                print(f"Artículo {number}: sin ejemplos en {args.dataset}")
+                continue
+            for line in lines:
+                print(line.decode("utf-8"))
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import time
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from articles import extract_pages_from_pdf, iter_articles, iter_articles_from_jsonl
+from jsonl_io import get_serializer
+from pdf_cache import hash_file
+from pdf_extraction import add_workers_argument
+from search_index import DEFAULT_TOP_K, SearchIndex, SearchIndexBuilder, fold_text, is_search_index_current, tokenize
+
+# Servicio HTTP local (sin dependencias externas) para consultar los artículos:
+#
+#   GET /articulos/<número>          artículo(s) con ese número
+#   GET /titulos?q=<texto>           artículos cuyo título contiene todas las palabras
+#   GET /buscar?q=<texto>&k=<n>      búsqueda BM25 en el texto de los artículos
+#   GET /metricas                    solicitudes, aciertos de caché y latencias
+#   GET /salud                       comprobación de vida
+#
+# El corpus se carga una sola vez al iniciar. Las respuestas de las consultas
+# se guardan ya serializadas en una caché LRU acotada.
+
+DEFAULT_SOURCE = "ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8769
+DEFAULT_CACHE_SIZE = 4096  # Respuestas guardadas en la caché LRU
+MAX_TOP_K = 50
+KEEP_ALIVE_TIMEOUT = 15  # Segundos que se espera la siguiente solicitud en una conexión abierta
+MAX_HEADER_BYTES = 16 * 1024
+LATENCY_SAMPLES = 10000  # Últimas latencias que se conservan para los percentiles
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 431: "Request Header Fields Too Large"}
+
+_dumps = get_serializer()
+
+
+class LRUCache:
+    """Caché acotada: al llenarse descarta la entrada usada hace más tiempo."""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class LatencyMetrics:
+    """Cuenta solicitudes por ruta y guarda las últimas latencias para calcular percentiles."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.started = time.time()
+        self.requests = 0
+        self.by_route = {}
+        self.by_status = {}
+        self.latencies = deque(maxlen=samples)
+
+    def record(self, route, status, seconds):
+        self.requests += 1
+        self.by_route[route] = self.by_route.get(route, 0) + 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+        self.latencies.append(seconds)
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return 0
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 3)
+
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "by_route": self.by_route,
+            "by_status": {str(status): count for status, count in self.by_status.items()},
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99), "max": percentile(1.0)},
+        }
+
+
+class ArticleCorpus:
+    """Artículos en memoria con sus índices por número, por título y BM25."""
+
+    def __init__(self, articles, search_index):
+        self.articles = [article for article in articles if article.number != "UNKNOWN"]
+        self.by_number = {}
+        for article in self.articles:
+            self.by_number.setdefault(article.number, []).append(article)
+        self.folded_titles = [fold_text(article.title) for article in self.articles]
+        self.search_index = search_index
+
+    @classmethod
+    def load(cls, source_path, index_path, workers=1):
+        """Carga el corpus desde el PDF o desde el JSONL de texto; el índice BM25 se reconstruye si el origen cambió."""
+        if source_path.lower().endswith(".pdf"):
+            articles = list(iter_articles(extract_pages_from_pdf(source_path, workers=workers)))
+        else:
+            articles = list(iter_articles_from_jsonl(source_path))
+        if not is_search_index_current(index_path, source_path):
+            builder = SearchIndexBuilder()
+            for article in articles:
+                builder.add(article)
+            builder.save(index_path, hash_file(source_path))
+        return cls(articles, SearchIndex(index_path))
+
+    def article(self, number):
+        return [_article_dict(article) for article in self.by_number.get(number, [])]
+
+    def search_titles(self, query):
+        words = tokenize(query)
+        if not words:
+            return []
+        return [
+            {"number": article.number, "title": article.title}
+            for article, title in zip(self.articles, self.folded_titles)
+            if all(word in title for word in words)
+        ]
+
+    def search(self, query, k):
+        return [
+            {"number": hit.number, "title": hit.title, "score": round(hit.score, 4)}
+            for hit in self.search_index.search(query, k=k)
+        ]
+
+
+def _article_dict(article):
+    result = {"number": article.number, "title": article.title, "content": article.content}
+    # Los artículos que vienen del PDF conocen su título y capítulo en el árbol del documento
+    if hasattr(article, "ancestor"):
+        for kind in ("titulo", "capitulo"):
+            section = article.ancestor(kind)
+            if section is not None:
+                result[kind] = {"label": section.label, "title": section.title}
+    return result
+
+
+def _response(status, body, keep_alive):
+    headers = (
+        f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return headers.encode("ascii") + body
+
+
+class ArticleServer:
+    def __init__(self, corpus, cache_size=DEFAULT_CACHE_SIZE):
+        self.corpus = corpus
+        self.cache = LRUCache(cache_size)
+        self.metrics = LatencyMetrics()
+
+    def route(self, target):
+        """Resuelve una ruta; devuelve (nombre de la ruta, estado, cuerpo JSON en bytes)."""
+        parts = urlsplit(target)
+        path = unquote(parts.path).rstrip("/")
+        if path == "/metricas":
+            metrics = self.metrics.to_dict()
+            metrics["cache"] = {"size": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses}
+            return "metricas", 200, _dumps(metrics)
+        if path == "/salud":
+            return "salud", 200, _dumps({"status": "ok", "articles": len(self.corpus.articles)})
+
+        route_name = path.split("/")[1] if path.count("/") >= 1 else ""
+        cached = self.cache.get(target)
+        if cached is not None:
+            return route_name, 200, cached
+
+        query = parse_qs(parts.query)
+        text = query.get("q", [""])[0].strip()
+        if path.startswith("/articulos/"):
+            articles = self.corpus.article(path[len("/articulos/"):].strip())
+            if not articles:
+                return route_name, 404, _dumps({"error": "Artículo no encontrado"})
+            body = _dumps({"articles": articles})
+        elif path in ("/titulos", "/buscar"):
+            if not text:
+                return route_name, 400, _dumps({"error": "Falta el parámetro 'q'"})
+            if path == "/titulos":
+                body = _dumps({"query": text, "results": self.corpus.search_titles(text)})
+            else:
+                try:
+                    k = min(MAX_TOP_K, max(1, int(query.get("k", [DEFAULT_TOP_K])[0])))
+                except ValueError:
+                    return route_name, 400, _dumps({"error": "El parámetro 'k' debe ser un entero"})
+                body = _dumps({"query": text, "results": self.corpus.search(text, k)})
+        else:
+            return "desconocida", 404, _dumps({"error": "Ruta no encontrada"})
+        self.cache.put(target, body)
+        return route_name, 200, body
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    writer.write(_response(431, _dumps({"error": "Encabezados demasiado grandes"}), False))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                start = time.perf_counter()
+
+                lines = head.decode("latin-1").split("\r\n")
+                request_line = lines[0].split(" ")
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                if len(request_line) != 3:
+                    writer.write(_response(400, _dumps({"error": "Solicitud inválida"}), False))
+                    break
+                method, target, version = request_line
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                if headers.get("content-length", "0").isdigit() and int(headers.get("content-length", "0")):
+                    # Las rutas solo aceptan GET: el cuerpo se descarta
+                    await reader.readexactly(int(headers["content-length"]))
+
+                if method not in ("GET", "HEAD"):
+                    route_name, status, body = "desconocida", 405, _dumps({"error": "Solo se admite GET"})
+                else:
+                    route_name, status, body = self.route(target)
+                response = _response(status, body, keep_alive)
+                writer.write(response[:len(response) - len(body)] if method == "HEAD" else response)
+                await writer.drain()
+                self.metrics.record(route_name, status, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        print(f"Sirviendo {len(self.corpus.articles)} artículos en http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor HTTP local para consultar y buscar artículos de la Ley 769 de 2002.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="PDF de la ley o JSONL de texto generado por transito_generate_jsonl.py")
+    parser.add_argument("--index", default=None, help="Archivo del índice BM25 (por defecto: <source>.bm25)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Respuestas guardadas en la caché LRU (0 = sin caché)")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    print(f"Cargando {args.source}...")
+    corpus = ArticleCorpus.load(args.source, args.index or args.source + ".bm25", workers=args.workers)
+    try:
+        asyncio.run(ArticleServer(corpus, args.cache_size).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Servidor detenido.")
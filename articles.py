@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import re
+from collections import namedtuple
+
+from document_parser import parse_pages
+from jsonl_io import JsonlWriter, open_jsonl
+from pdf_extraction import add_workers_argument, extract_pages
+from text_normalization import normalize_pages
+
+# Lógica única de extracción de artículos, compartida por todos los formatos de
+# salida e índices (ver emitters.py y generate_datasets.py). La estructura del
+# documento la arma document_parser.py en una sola pasada.
+
+ARTICLE_HEADER_PATTERN = re.compile(r'ART[IÍ]CULO\s+(\d+)[°º.]?\s*[.-]?\s*(.*)', re.IGNORECASE)
+
+Article = namedtuple("Article", ["number", "title", "content"])
+
+FEMININE_SOURCES = ("ley", "resolución", "resolucion", "circular", "sentencia")
+
+
+def article_key(article):
+    """Clave única del artículo para índices y divisiones: el número, o "<fuente>:<número>" en un corpus."""
+    return getattr(article, "key", article.number)
+
+
+def source_phrases(source):
+    """Devuelve ("de la Ley 1383 de 2010", "la Ley 1383 de 2010") o ("del Decreto 1079 de 2015", "el Decreto 1079 de 2015")."""
+    first_word = source.split(" ", 1)[0].lower()
+    if first_word in FEMININE_SOURCES:
+        return f"de la {source}", f"la {source}"
+    return f"del {source}", f"el {source}"
+
+
+# Paso 1: Extraer el texto de cada página del PDF (se omiten las páginas vacías)
+def extract_pages_from_pdf(pdf_path, workers=1, normalize=True, report=None):
+    # Con `normalize` se reparan las palabras partidas y los saltos de línea de
+    # maquetación (ver text_normalization.py); las reparaciones se suman en `report`.
+    try:
+        pages = [page_text for page_text in extract_pages(pdf_path, workers=workers) if page_text]
+    except Exception as e:
+        print(f"Error al leer el PDF: {e}")
+        return []
+    return normalize_pages(pages, report) if normalize else pages
+
+
+# Paso 2: Extraer número y título de un bloque de texto suelto (por ejemplo, una línea de un JSONL)
+def extract_article_info(article_text):
+    lines = article_text.split('\n')
+    first_line = lines[0].strip() if lines else ""
+
+    match = ARTICLE_HEADER_PATTERN.search(first_line)
+    if match:
+        number = match.group(1)
+        # El título termina en el primer punto ("MULTAS. Los infractores..." -> "MULTAS")
+        title = match.group(2).split(". ", 1)[0].strip().rstrip('.')
+        # Si el título está vacío, intenta tomar la siguiente línea
+        if not title and len(lines) > 1:
+            title = lines[1].strip()
+        return number, title if title else "Sin título"
+
+    return "UNKNOWN", "Sin título"
+
+
+# Paso 3: Generar preguntas variadas sobre el artículo
+def generate_questions_for_article(article_number, article_title, source=None):
+    if article_number == "UNKNOWN":
+        return []
+
+    # En un corpus de varias normas cada pregunta nombra la norma del artículo
+    if source is not None:
+        of_source, the_source = source_phrases(source)
+        return [
+            f"¿Qué establece el artículo {article_number} {of_source}?",
+            f"Explícame el contenido del artículo {article_number} {of_source}.",
+            f"¿Cuál es el contenido del artículo {article_number} {of_source} sobre {article_title.lower()}?",
+            f"Artículo {article_number} {of_source}: {article_title}",
+            f"¿Qué dice {the_source} en el artículo {article_number}?",
+            f"Necesito información sobre el artículo {article_number} {of_source}."
+        ]
+
+    questions = [
+        f"¿Qué establece el artículo {article_number} del Código Nacional de Tránsito?",
+        f"Explícame el contenido del artículo {article_number}.",
+        f"¿Cuál es el contenido del artículo {article_number} sobre {article_title.lower()}?",
+        f"Artículo {article_number}: {article_title}",
+        f"¿Qué dice la ley de tránsito en el artículo {article_number}?",
+        f"Necesito información sobre el artículo {article_number} del código de tránsito."
+    ]
+    return questions
+
+
+def iter_articles(pages):
+    """Genera los artículos del documento en orden, precedidos por el preámbulo ("UNKNOWN").
+
+    Cada artículo es un nodo de document_parser.py con la misma interfaz que
+    Article (`number`, `title`, `content`) más su posición en el árbol.
+    """
+    document = parse_pages(pages)
+    preamble = document.preamble()
+    if preamble is not None:
+        yield preamble
+    yield from document.articles()
+
+
+def iter_articles_from_jsonl(jsonl_path):
+    """Lee los artículos desde el JSONL de texto simple (salida de transito_generate_jsonl.py)."""
+    with open_jsonl(jsonl_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            text = json.loads(line)["text"]
+            number, title = extract_article_info(text)
+            yield Article(number, title, text)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Extrae el texto del PDF (guardándolo en la caché) y lo escribe como texto plano o como JSONL de artículos.")
+    parser.add_argument("pdf", help="PDF de entrada")
+    parser.add_argument("--formato", dest="format", choices=["texto", "articulos"], default="texto", help="texto: páginas normalizadas; articulos: un objeto JSON por artículo")
+    parser.add_argument("--salida", dest="output", default=None, help="Archivo de salida (por defecto, junto al PDF con extensión .txt o .articulos.jsonl)")
+    parser.add_argument("--sin-normalizar", dest="normalize", action="store_false", help="Usa el texto tal como lo extrae PyPDF2")
+    add_workers_argument(parser)
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.pdf):
+        parser.error(f"No existe el PDF {args.pdf}")
+    stem = os.path.splitext(args.pdf)[0]
+    output_path = args.output or (stem + (".txt" if args.format == "texto" else ".articulos.jsonl"))
+
+    print(f"Extrayendo el texto de {args.pdf}...")
+    pages = extract_pages_from_pdf(args.pdf, workers=args.workers, normalize=args.normalize)
+    if not pages:
+        print("ERROR: No se pudo extraer texto del PDF.")
+        raise SystemExit(1)
+    if args.format == "texto":
+        text = "\n\n".join(pages)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"  {len(text)} caracteres guardados en {output_path}")
+    else:
+        with JsonlWriter(output_path) as writer:
+            count = writer.write_all(
+                {"number": article.number, "title": article.title, "content": article.content}
+                for article in iter_articles(pages)
+            )
+        print(f"  {count} artículos guardados en {output_path}")
+
+
+if __name__ == "__main__":
+    main()
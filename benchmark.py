@@ -0,0 +1,393 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import transito_generate_jsonl_finetuning as legacy
+from article_chunking import ArticleChunker
+from articles import iter_articles
+from emitters import create_emitters
+from near_duplicates import deduplicate
+from pdf_extraction import extract_pages, read_pdf_pages
+from question_augmentation import QuestionGenerator
+from text_normalization import normalize_pages
+from validate_jsonl import validate_file
+
+# Benchmarks de cada etapa del pipeline contra el PDF de la ley y contra un
+# corpus sintético que repite sus páginas 10x y 100x (con los artículos
+# renumerados). Cada ejecución guarda tiempo, throughput y pico de memoria en un
+# historial JSON y se compara con las ejecuciones anteriores de la misma
+# máquina: si una etapa es más lenta o usa más memoria que el umbral, el script
+# termina con código 1. No usa red ni servicios externos.
+#
+#   python benchmark.py                      # escalas 1, 10 y 100
+#   python benchmark.py --escalas 1 --umbral 0.5
+#   python benchmark.py --arranque           # tiempo de arranque de transito.py
+
+DEFAULT_PDF_PATH = "ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf"
+DEFAULT_HISTORY_PATH = "benchmark_history.json"
+DEFAULT_SCALES = "1,10,100"
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25  # Aumento relativo permitido frente a la línea base
+BASELINE_RUNS = 5  # La línea base es la mediana de las últimas ejecuciones
+# Diferencias menores se consideran ruido aunque superen el umbral relativo
+MIN_REGRESSION_SECONDS = 0.005
+MIN_REGRESSION_MB = 1.0
+CHUNK_MAX_TOKENS = 512  # Presupuesto de la etapa chunking
+AUGMENTED_QUESTIONS = 200  # Preguntas por artículo de la etapa augmented_emitters
+SYNTHETIC_NUMBER_OFFSET = 1000  # Cada copia del corpus numera sus artículos desde 1000 * copia
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transito.py")
+STARTUP_LIMIT = 0.1  # Segundos que pueden tardar --help y validar
+STARTUP_REPEAT = 10  # El arranque es corto y ruidoso: se conserva la más rápida de más ejecuciones
+# Paquetes que los comandos livianos no deben importar
+HEAVY_MODULES = ("PyPDF2", "google", "vertexai", "tiktoken", "zstandard")
+STARTUP_SAMPLE = {"messages": [{"role": "user", "content": "¿Qué establece el artículo 1?"},
+                               {"role": "model", "content": "ARTÍCULO 1. ÁMBITO DE APLICACIÓN."}]}
+
+ARTICLE_NUMBER_PATTERN = re.compile(r'(ART[IÍ]CULO\s+)(\d+)', re.IGNORECASE)
+
+STAGES = []
+
+
+def stage(name, unit, pdf_only=False):
+    """Registra una etapa; la función recibe el estado compartido y devuelve cuántos elementos procesó."""
+    def register(func):
+        STAGES.append((name, unit, pdf_only, func))
+        return func
+    return register
+
+
+@stage("read_pdf_pages", "páginas", pdf_only=True)
+def _read_pdf(state):
+    state["pages"] = read_pdf_pages(state["pdf_path"])
+    return len(state["pages"])
+
+
+# Etapas del pipeline compartido (generate_datasets.py)
+
+@stage("normalize_pages", "páginas")
+def _normalize(state):
+    state["normalized"] = normalize_pages(state["pages"])
+    return len(state["pages"])
+
+
+# parse_pages reemplaza a las etapas split_by_articles y extract_article_info del
+# script original: el árbol del documento divide los artículos y extrae su número
+# y título en una sola pasada. Su línea base empieza con las ejecuciones nuevas.
+@stage("parse_pages", "bloques")
+def _parse(state):
+    state["articles"] = list(iter_articles(state["normalized"]))
+    return len(state["articles"])
+
+
+# Etapas del script original (transito_generate_jsonl_finetuning.py) sobre los artículos ya analizados
+
+@stage("create_training_examples", "ejemplos")
+def _training_examples(state):
+    state["examples"] = list(legacy.create_training_examples(state["articles"]))
+    return len(state["examples"])
+
+
+@stage("save_to_jsonl_finetuning", "ejemplos")
+def _save_jsonl(state):
+    return legacy.save_to_jsonl_finetuning(state["examples"], os.path.join(state["workdir"], "finetuning.jsonl"))
+
+
+@stage("validate_jsonl_format", "ejemplos")
+def _legacy_validation(state):
+    errors = legacy.validate_jsonl_format(os.path.join(state["workdir"], "finetuning.jsonl"))
+    if errors:
+        raise RuntimeError(f"El JSONL generado no es válido: {errors[0]}")
+    return len(state["examples"])
+
+
+# Resto del pipeline compartido
+
+@stage("chunking", "bloques")
+def _chunk(state):
+    blocks = list(ArticleChunker(CHUNK_MAX_TOKENS).iter_blocks(state["articles"]))
+    return len(blocks)
+
+
+@stage("emitters", "ejemplos")
+def _emit(state):
+    emitters = create_emitters(["text", "openai", "gemini"], state["workdir"])
+    for emitter in emitters:
+        emitter.open()
+    for article in state["articles"]:
+        for emitter in emitters:
+            emitter.emit(article)
+    for emitter in emitters:
+        emitter.close()
+    state["openai_path"] = emitters[1].output_path
+    return sum(emitter.count for emitter in emitters)
+
+
+@stage("augmented_emitters", "ejemplos")
+def _emit_augmented(state):
+    # En otra carpeta para no reemplazar los archivos que lee validate_file
+    output_dir = os.path.join(state["workdir"], "aumentado")
+    os.makedirs(output_dir, exist_ok=True)
+    emitters = create_emitters(["openai", "gemini"], output_dir, questions=QuestionGenerator(AUGMENTED_QUESTIONS))
+    for emitter in emitters:
+        emitter.open()
+    for article in state["articles"]:
+        for emitter in emitters:
+            emitter.emit(article)
+    for emitter in emitters:
+        emitter.close()
+    return sum(emitter.count for emitter in emitters)
+
+
+@stage("validate_file", "ejemplos")
+def _validation(state):
+    result = validate_file(state["openai_path"], "openai")
+    if not result.ok:
+        raise RuntimeError(f"El JSONL generado no es válido: {result.error_messages()[0]}")
+    return result.lines
+
+
+# Solo con el PDF: a 100x el cálculo de las firmas MinHash dominaría la ejecución
+@stage("near_duplicates", "ejemplos", pdf_only=True)
+def _near_duplicates(state):
+    report = deduplicate(state["openai_path"], os.path.join(state["workdir"], "openai.dedup.jsonl"))
+    return report["examples"]
+
+
+def scale_pages(pages, factor):
+    """Repite las páginas `factor` veces; cada copia renumera sus artículos para que no se repitan."""
+    scaled = list(pages)
+    for copy in range(1, factor):
+        offset = copy * SYNTHETIC_NUMBER_OFFSET
+        scaled.extend(
+            ARTICLE_NUMBER_PATTERN.sub(lambda match: match.group(1) + str(int(match.group(2)) + offset), page)
+            for page in pages
+        )
+    return scaled
+
+
+def measure(func, state, repeat):
+    """Ejecuta la etapa `repeat` veces y una más con tracemalloc para medir el pico de memoria."""
+    best_wall = best_cpu = None
+    for _ in range(repeat):
+        gc.collect()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        items = func(state)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        if best_wall is None or wall < best_wall:
+            best_wall, best_cpu = wall, cpu
+    # tracemalloc hace más lenta la ejecución, por eso no se mide el tiempo en esta pasada
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "items": items,
+        "wall_s": round(best_wall, 6),
+        "cpu_s": round(best_cpu, 6),
+        "items_per_s": round(items / best_wall, 1) if best_wall else None,
+        "peak_mb": round(peak / (1024 * 1024), 3),
+    }
+
+
+def run_benchmarks(pdf_path, scales, repeat=DEFAULT_REPEAT, stage_names=None):
+    """Ejecuta las etapas en cada escala; devuelve {"etapa@escala": resultado}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Las escalas sintéticas parten del texto ya extraído (con la caché del PDF)
+        source_pages = [page for page in extract_pages(pdf_path) if page]
+        for scale in scales:
+            state = {"pdf_path": pdf_path, "workdir": workdir, "pages": scale_pages(source_pages, scale)}
+            for name, unit, pdf_only, func in STAGES:
+                if pdf_only and scale != 1:
+                    continue
+                if stage_names and name not in stage_names:
+                    # Las etapas omitidas se ejecutan una vez para preparar las siguientes
+                    func(state)
+                    continue
+                result = measure(func, state, repeat)
+                result["unit"] = unit
+                results[f"{name}@{scale}"] = result
+                print(f"  {name:<26} x{scale:<4} {result['wall_s'] * 1000:10.2f} ms  "
+                      f"{result['items_per_s'] or 0:12.1f} {unit}/s  {result['peak_mb']:9.2f} MB")
+    return results
+
+
+def startup_commands(workdir):
+    """Comandos de la CLI cuyo arranque se mide: (nombre, argumentos, si aplica el límite de tiempo)."""
+    sample_path = os.path.join(workdir, "arranque_gemini.jsonl")
+    with open(sample_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(STARTUP_SAMPLE, ensure_ascii=False) + "\n")
+    return [
+        ("--help", ["--help"], True),
+        ("validar --help", ["validar", "--help"], True),
+        ("validar", ["validar", sample_path], True),
+        # Solo se revisa que no importe los SDK de Google Cloud
+        ("ajustar --help", ["ajustar", "--help"], False),
+    ]
+
+
+def run_cli(args, import_time=False):
+    """Ejecuta la CLI en un proceso nuevo; devuelve (tiempo real, uso de recursos, stderr)."""
+    command = [sys.executable] + (["-X", "importtime"] if import_time else []) + [CLI_PATH] + args
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    # wait4 devuelve el uso de CPU de este proceso hijo en particular
+    _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    process.stderr.close()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"transito.py {' '.join(args)} terminó con código {process.returncode}: {stderr.decode(errors='replace')[-500:]}")
+    return wall, usage, stderr.decode(errors="replace")
+
+
+def imported_heavy_modules(import_log):
+    """Paquetes pesados que aparecen en la salida de `python -X importtime`."""
+    found = set()
+    for line in import_log.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            package = line.rsplit("|", 1)[1].strip().split(".")[0]
+            if package in HEAVY_MODULES:
+                found.add(package)
+    return sorted(found)
+
+
+def run_startup_benchmarks(repeat=STARTUP_REPEAT, limit=STARTUP_LIMIT):
+    """Mide el arranque de cada comando liviano; devuelve ({"arranque:comando": resultado}, problemas)."""
+    results = {}
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, args, limited in startup_commands(workdir):
+            best_wall = best_cpu = None
+            for _ in range(repeat):
+                wall, usage, _ = run_cli(args)
+                if best_wall is None or wall < best_wall:
+                    best_wall, best_cpu = wall, usage.ru_utime + usage.ru_stime
+            heavy = imported_heavy_modules(run_cli(args, import_time=True)[2])
+            results[f"arranque:{name}"] = {
+                "items": 1,
+                "wall_s": round(best_wall, 6),
+                "cpu_s": round(best_cpu, 6),
+                "items_per_s": None,
+                # ru_maxrss del hijo incluye la memoria de este proceso antes del exec, así que no se reporta
+                "peak_mb": None,
+                "unit": "arranques",
+                "heavy_imports": heavy,
+            }
+            print(f"  {name:<26} {best_wall * 1000:10.2f} ms  CPU {best_cpu * 1000:8.2f} ms"
+                  + (f"  importa {', '.join(heavy)}" if heavy else ""))
+            if heavy:
+                problems.append(f"arranque:{name}: importa {', '.join(heavy)}")
+            if limited and limit and best_wall > limit:
+                problems.append(f"arranque:{name}: {best_wall * 1000:.1f} ms supera el límite de {limit * 1000:.0f} ms")
+    return results, problems
+
+
+def machine_id():
+    return f"{platform.node()} {platform.machine()} Python {platform.python_version()}"
+
+
+def load_history(history_path):
+    try:
+        with open(history_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"runs": []}
+
+
+def save_history(history, history_path):
+    tmp_path = history_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, history_path)
+
+
+def find_regressions(results, history, machine, threshold=DEFAULT_THRESHOLD):
+    """Compara cada etapa con la mediana de sus últimas ejecuciones en la misma máquina."""
+    previous = [run for run in history["runs"] if run.get("machine") == machine]
+    regressions = []
+    for key, result in results.items():
+        baseline_runs = [run["results"][key] for run in previous if key in run["results"]][-BASELINE_RUNS:]
+        if not baseline_runs:
+            continue
+        for field, minimum, label in (("wall_s", MIN_REGRESSION_SECONDS, "tiempo"), ("peak_mb", MIN_REGRESSION_MB, "memoria")):
+            if result[field] is None:
+                continue
+            values = [run[field] for run in baseline_runs if run.get(field) is not None]
+            if not values:
+                continue
+            baseline = statistics.median(values)
+            if result[field] > baseline * (1 + threshold) and result[field] - baseline > minimum:
+                # Con línea base 0 (p. ej. memoria redondeada a 0.0) el aumento relativo no existe: se informa el absoluto
+                change = f"+{(result[field] / baseline - 1) * 100:.0f}%" if baseline else f"+{result[field] - baseline:g}"
+                regressions.append(f"{key}: {label} {result[field]} frente a {baseline} ({change})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide cada etapa del pipeline con el PDF de la ley y corpus sintéticos más grandes.")
+    parser.add_argument("--pdf", default=DEFAULT_PDF_PATH, help="PDF de entrada")
+    parser.add_argument("--escalas", dest="scales", default=DEFAULT_SCALES, help=f"Factores del corpus sintético separados por comas (por defecto: {DEFAULT_SCALES})")
+    parser.add_argument("--etapas", dest="stages", default=None, help="Etapas a medir separadas por comas (por defecto, todas)")
+    parser.add_argument("--repeticiones", dest="repeat", type=int, default=None, help=f"Ejecuciones por etapa; se conserva la más rápida (por defecto {DEFAULT_REPEAT}, {STARTUP_REPEAT} con --arranque)")
+    parser.add_argument("--umbral", dest="threshold", type=float, default=DEFAULT_THRESHOLD, help="Aumento relativo permitido frente a la línea base (0.25 = 25%%)")
+    parser.add_argument("--historial", dest="history", default=DEFAULT_HISTORY_PATH, help="Archivo JSON con el historial de ejecuciones")
+    parser.add_argument("--no-guardar", dest="save", action="store_false", help="No agrega esta ejecución al historial")
+    parser.add_argument("--arranque", dest="startup", action="store_true", help="Mide el tiempo de arranque de los comandos livianos de transito.py en lugar del pipeline")
+    parser.add_argument("--limite-arranque", dest="startup_limit", type=float, default=STARTUP_LIMIT, help=f"Segundos máximos de arranque con --arranque (por defecto {STARTUP_LIMIT}; 0 = sin límite)")
+    args = parser.parse_args()
+
+    try:
+        scales = sorted({int(scale) for scale in args.scales.split(",") if scale.strip()})
+    except ValueError:
+        parser.error("--escalas debe ser una lista de enteros, p. ej. 1,10,100")
+    if not scales or scales[0] < 1:
+        parser.error("--escalas debe contener enteros mayores que cero")
+    stage_names = [name.strip() for name in args.stages.split(",")] if args.stages else None
+    unknown = set(stage_names or []) - {name for name, _, _, _ in STAGES}
+    if unknown:
+        parser.error(f"Etapas desconocidas: {', '.join(sorted(unknown))}. Disponibles: {', '.join(name for name, _, _, _ in STAGES)}")
+
+    problems = []
+    if args.startup:
+        print(f"Midiendo el arranque de {CLI_PATH}...")
+        results, problems = run_startup_benchmarks(max(1, args.repeat or STARTUP_REPEAT), args.startup_limit)
+        scales = []
+    else:
+        print(f"Midiendo el pipeline con {args.pdf} (escalas: {', '.join(map(str, scales))})...")
+        results = run_benchmarks(args.pdf, scales, max(1, args.repeat or DEFAULT_REPEAT), stage_names)
+
+    machine = machine_id()
+    history = load_history(args.history)
+    regressions = problems + find_regressions(results, history, machine, args.threshold)
+    if args.save:
+        history["runs"].append({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": machine,
+            "scales": scales,
+            "results": results,
+            "regressions": regressions,
+        })
+        save_history(history, args.history)
+        print(f"Resultados agregados a {args.history}")
+
+    if regressions:
+        print(f"ERROR: {len(regressions)} etapas superaron el umbral de {args.threshold * 100:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    print("EXITO: Ninguna etapa superó el umbral de regresión.")
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import re
+import unicodedata
+from collections import namedtuple
+
+from articles import iter_articles
+from jsonl_io import JsonlWriter
+from pdf_cache import PdfTextCache, hash_file
+from pdf_extraction import add_workers_argument, read_pdf_pages, resolve_workers
+from text_normalization import normalize_pages
+
+# Ingesta de un corpus de varias normas (la Ley 769 más sus decretos y leyes
+# modificatorias). El corpus es una carpeta con PDFs o un manifiesto JSON:
+#
+#   {"documentos": [
+#       {"pdf": "ley-769-de-2002.pdf"},
+#       {"pdf": "pdfs/ley1383.pdf", "fuente": "Ley 1383 de 2010"}
+#   ]}
+#
+# Cada proceso del pool extrae y normaliza un documento completo (usando la
+# caché de texto por PDF de pdf_cache.py, así que reconstruir el corpus solo
+# vuelve a leer los PDFs nuevos o modificados); el proceso principal analiza
+# cada documento en el orden del corpus y etiqueta sus artículos con su norma.
+# El resultado no depende del número de procesos.
+
+DEFAULT_OUTPUT_PATH = "corpus_articulos.jsonl"
+DEFAULT_REPORT_PATH = "corpus.report.json"
+
+# "ley-1383-de-2010.pdf", "Decreto_1079_2015.pdf" -> ("Ley", "1383", "2010")
+SOURCE_PATTERN = re.compile(r"(ley|decreto|resoluci[oó]n)[\s_-]*(\d+)[\s_-]*(?:de[\s_-]*)?(\d{4})", re.IGNORECASE)
+
+CorpusDocument = namedtuple("CorpusDocument", ["path", "source", "key"])
+# `page_count` son las páginas con texto del PDF: la normalización puede unir páginas
+DocumentText = namedtuple("DocumentText", ["sha256", "pages", "page_count", "normalization", "cached", "error"])
+
+
+def source_key(source):
+    """Convierte la norma en una clave corta para los índices: "Ley 1383 de 2010" -> "ley-1383-de-2010"."""
+    text = unicodedata.normalize("NFKD", source).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def source_from_filename(path):
+    """Deduce la norma del nombre del PDF ("Ley 1383 de 2010"); si no la reconoce, usa el nombre del archivo."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = SOURCE_PATTERN.search(stem)
+    if match is None:
+        return stem
+    kind, number, year = match.groups()
+    kind = "Resolución" if kind.lower().startswith("resoluci") else kind.capitalize()
+    return f"{kind} {number} de {year}"
+
+
+def _document(path, source=None, key=None):
+    source = source or source_from_filename(path)
+    return CorpusDocument(path, source, key or source_key(source))
+
+
+def load_corpus(path):
+    """Devuelve los documentos del corpus en su orden: los PDFs de la carpeta por nombre, o los del manifiesto.
+
+    Las rutas del manifiesto son relativas a su carpeta. Lanza ValueError si el
+    corpus está vacío, falta un PDF o dos documentos comparten la misma clave.
+    """
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(".pdf"))
+        documents = [_document(os.path.join(path, name)) for name in names]
+    else:
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"No se pudo leer el manifiesto del corpus {path}: {e}") from None
+        entries = manifest.get("documentos") if isinstance(manifest, dict) else manifest
+        if not isinstance(entries, list):
+            raise ValueError(f"El manifiesto {path} debe tener una lista 'documentos'")
+        base = os.path.dirname(path)
+        documents = []
+        for entry in entries:
+            if isinstance(entry, str):
+                entry = {"pdf": entry}
+            if not isinstance(entry, dict) or not entry.get("pdf"):
+                raise ValueError(f"Documento sin 'pdf' en el manifiesto {path}: {entry!r}")
+            documents.append(_document(os.path.join(base, entry["pdf"]), entry.get("fuente"), entry.get("clave")))
+
+    if not documents:
+        raise ValueError(f"El corpus {path} no tiene PDFs")
+    keys = {}
+    for document in documents:
+        if not os.path.isfile(document.path):
+            raise ValueError(f"No existe el PDF {document.path}")
+        if document.key in keys:
+            raise ValueError(f"{document.path} y {keys[document.key]} tienen la misma clave '{document.key}': usa 'clave' en el manifiesto")
+        keys[document.key] = document.path
+    return documents
+
+
+class SourceArticle:
+    """Artículo de un documento del corpus: el nodo de document_parser.py más su norma.
+
+    Delega en el nodo todos los atributos (`number`, `title`, `content`,
+    `ancestor`, ...). `key` identifica al artículo en todo el corpus (ver
+    articles.article_key); `source` es la norma que nombran sus preguntas.
+    """
+
+    __slots__ = ("node", "source", "source_key")
+
+    def __init__(self, node, source, source_key):
+        self.node = node
+        self.source = source
+        self.source_key = source_key
+
+    @property
+    def key(self):
+        return f"{self.source_key}:{self.node.number}"
+
+    def __getattr__(self, name):
+        return getattr(self.node, name)
+
+    def __repr__(self):
+        return f"SourceArticle({self.source!r}, {self.node!r})"
+
+
+def _prepare_document(pdf_path, normalize=True, workers=1):
+    """Extrae (o lee de la caché) y normaliza el texto de un PDF; se ejecuta en un proceso del pool."""
+    try:
+        cache = PdfTextCache()
+        pdf_hash = hash_file(pdf_path)
+        pages = cache.get(pdf_hash)
+        cached = pages is not None
+        if not cached:
+            pages = read_pdf_pages(pdf_path, workers=workers)
+            try:
+                cache.put(pdf_hash, pages)
+            except OSError as e:
+                print(f"Aviso: no se pudo guardar el texto de {pdf_path} en caché: {e}")
+    except Exception as e:
+        return DocumentText(None, [], 0, {}, False, str(e))
+    pages = [page_text for page_text in pages if page_text]
+    page_count = len(pages)
+    normalization = {}
+    if normalize:
+        pages = normalize_pages(pages, normalization)
+    return DocumentText(pdf_hash, pages, page_count, normalization, cached, None)
+
+
+def iter_document_texts(documents, normalize=True, workers=1):
+    """Genera (documento, DocumentText) en el orden del corpus, preparando los documentos en paralelo.
+
+    Cada proceso toma un documento completo y los más grandes se envían
+    primero para repartir mejor la carga; los resultados se entregan igual en
+    el orden del corpus. Con un solo documento, los procesos se reparten sus
+    páginas (ver pdf_extraction.read_pdf_pages).
+    """
+    workers = resolve_workers(workers)
+    if workers == 1 or len(documents) == 1:
+        for document in documents:
+            yield document, _prepare_document(document.path, normalize, workers)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    by_size = sorted(range(len(documents)), key=lambda i: os.path.getsize(documents[i].path), reverse=True)
+    with ProcessPoolExecutor(max_workers=min(workers, len(documents))) as executor:
+        futures = {i: executor.submit(_prepare_document, documents[i].path, normalize) for i in by_size}
+        for i, document in enumerate(documents):
+            yield document, futures[i].result()
+
+
+def iter_corpus_articles(documents, normalize=True, workers=1, report=None, profiler=None):
+    """Genera los artículos de todo el corpus como SourceArticle, documento por documento.
+
+    Si se pasa `report` (un diccionario), se agregan en report["documents"] los
+    datos de cada documento (hash, páginas, artículos, errores) y en
+    report["normalization"] la suma de las reparaciones del texto.
+    """
+    report = {} if report is None else report
+    entries = report.setdefault("documents", [])
+    totals = report.setdefault("normalization", {})
+    texts = iter_document_texts(documents, normalize, workers)
+    if profiler is not None:
+        texts = profiler.iterate("prepare_documents", texts)
+    for document, text in texts:
+        entry = {
+            "pdf": document.path,
+            "source": document.source,
+            "key": document.key,
+            "sha256": text.sha256,
+            "pages": text.page_count,
+            "articles": 0,
+            "cached": text.cached,
+        }
+        entries.append(entry)
+        for name, count in text.normalization.items():
+            totals[name] = totals.get(name, 0) + count
+        if text.error is not None or not text.pages:
+            entry["error"] = text.error or "No se pudo extraer texto del PDF"
+            continue
+        for node in iter_articles(text.pages):
+            if node.number != "UNKNOWN":
+                entry["articles"] += 1
+            yield SourceArticle(node, document.source, document.key)
+
+
+def corpus_record(article):
+    """Línea del JSONL del corpus: el artículo con su norma."""
+    return {"source": article.source, "key": article.key, "number": article.number, "title": article.title, "content": article.content}
+
+
+def write_report(report, report_path):
+    """Guarda el reporte del corpus (documentos, hashes y conteos) de forma atómica."""
+    tmp_path = f"{report_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, report_path)
+
+
+def print_corpus_report(report):
+    for entry in report["documents"]:
+        origin = " [caché]" if entry["cached"] else ""
+        if "error" in entry:
+            print(f"  ERROR: {entry['pdf']}: {entry['error']}")
+        else:
+            print(f"  {entry['source']} ({entry['key']}): {entry['pages']} páginas, {entry['articles']} artículos{origin}")
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Extrae en paralelo los artículos de varias normas y los escribe en un solo JSONL etiquetado con su norma.")
+    parser.add_argument("corpus", help="Carpeta con PDFs o manifiesto JSON del corpus")
+    parser.add_argument("--salida", dest="output", default=DEFAULT_OUTPUT_PATH, help=f"JSONL de artículos del corpus (por defecto: {DEFAULT_OUTPUT_PATH})")
+    parser.add_argument("--reporte", dest="report", default=DEFAULT_REPORT_PATH, help=f"Reporte JSON de los documentos procesados (por defecto: {DEFAULT_REPORT_PATH})")
+    parser.add_argument("--listar", dest="list_only", action="store_true", help="Solo muestra los documentos del corpus y la norma detectada para cada uno")
+    parser.add_argument("--sin-normalizar", dest="normalize", action="store_false", help="Usa el texto tal como lo extrae PyPDF2")
+    add_workers_argument(parser, help="Procesos para preparar los documentos en paralelo (0 = todos los núcleos)")
+    args = parser.parse_args(argv)
+
+    try:
+        documents = load_corpus(args.corpus)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.list_only:
+        for document in documents:
+            print(f"{document.path}: {document.source} ({document.key})")
+        return
+
+    print(f"Procesando {len(documents)} documentos del corpus {args.corpus}...")
+    report = {"corpus": args.corpus}
+    with JsonlWriter(args.output) as writer:
+        count = writer.write_all(
+            corpus_record(article)
+            for article in iter_corpus_articles(documents, args.normalize, args.workers, report)
+        )
+    write_report(report, args.report)
+    print_corpus_report(report)
+    print(f"  {count} artículos guardados en {args.output}")
+    print(f"  Reporte: {args.report}")
+    if any("error" in entry for entry in report["documents"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
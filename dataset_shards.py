@@ -0,0 +1,202 @@
+import json
+import os
+import random
+from collections import namedtuple
+
+from article_index import ArticleIndexBuilder
+from jsonl_io import JsonlWriter
+
+# Salida fragmentada con división entrenamiento/validación. En lugar de un único
+# JSONL, cada formato escribe fragmentos de tamaño acotado:
+#
+#   articulos_ley_769_gemini.train-00000.jsonl
+#   articulos_ley_769_gemini.train-00001.jsonl
+#   articulos_ley_769_gemini.validation-00000.jsonl
+#   articulos_ley_769_gemini.shards.json          (manifiesto)
+#
+# La validación es una muestra uniforme de artículos elegida con muestreo de
+# reservorio (algoritmo R) y una semilla fija: se decide en la misma pasada en
+# que se generan los ejemplos, sin conocer el total de artículos, y solo los
+# ejemplos de los artículos del reservorio se mantienen en memoria. Todos los
+# ejemplos de un mismo número de artículo quedan del mismo lado para que las
+# preguntas sobre un artículo de validación no aparezcan en el entrenamiento.
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".shards.json"
+JSONL_EXTENSIONS = (".jsonl.gz", ".jsonl.zst", ".jsonl")
+DEFAULT_SEED = 769
+
+ShardingOptions = namedtuple("ShardingOptions", ["max_bytes", "max_examples", "validation_articles", "seed"])
+ShardingOptions.__new__.__defaults__ = (None, None, 0, DEFAULT_SEED)
+
+
+def split_extension(path):
+    """Separa la ruta en base y extensión JSONL ("salida.jsonl.gz" -> ("salida", ".jsonl.gz"))."""
+    for extension in JSONL_EXTENSIONS:
+        if path.endswith(extension):
+            return path[:-len(extension)], extension
+    return os.path.splitext(path)
+
+
+def manifest_path_for(output_path):
+    return split_extension(output_path)[0] + MANIFEST_SUFFIX
+
+
+class ShardedJsonlWriter:
+    """Escribe líneas JSONL repartidas en fragmentos de como máximo `max_bytes` (sin comprimir) o `max_examples` líneas.
+
+    Cada fragmento sin comprimir lleva su propio índice de offsets por artículo
+    (ver article_index.py).
+    """
+
+    def __init__(self, output_path, split, max_bytes=None, max_examples=None):
+        self.stem, self.extension = split_extension(output_path)
+        self.split = split
+        self.max_bytes = max_bytes
+        self.max_examples = max_examples
+        self.shards = []
+        self.count = 0
+        self._writer = None
+        self._index = None
+        self._last_number = None
+
+    def _shard_path(self, shard_number):
+        return f"{self.stem}.{self.split}-{shard_number:05d}{self.extension}"
+
+    def _is_full(self, line):
+        writer = self._writer
+        if not writer.count:
+            # Una línea más grande que el límite queda sola en su fragmento
+            return False
+        if self.max_examples and writer.count >= self.max_examples:
+            return True
+        return bool(self.max_bytes) and writer.position + len(line) > self.max_bytes
+
+    def _close_shard(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        if self._index is not None:
+            self._index.save(self._writer.output_path)
+        self.shards[-1].update(examples=self._writer.count, bytes=self._writer.bytes_written)
+        self._writer = self._index = None
+
+    def write_line(self, line, number):
+        """Agrega una línea serializada (bytes con salto de línea) del artículo `number`."""
+        if self._writer is None or self._is_full(line):
+            self._close_shard()
+            path = self._shard_path(len(self.shards))
+            self._writer = JsonlWriter(path)
+            self._index = None if self.extension != ".jsonl" else ArticleIndexBuilder()
+            self.shards.append({"path": os.path.basename(path), "examples": 0, "bytes": 0, "articles": 0})
+            self._last_number = None
+        if self._index is not None:
+            self._index.add(number, self._writer.position, len(line))
+        self._writer.write_line(line)
+        if number != self._last_number:
+            # Las líneas de un artículo se escriben seguidas, así que basta comparar con el anterior
+            self.shards[-1]["articles"] += 1
+            self._last_number = number
+        self.count += 1
+
+    def close(self):
+        self._close_shard()
+
+    def to_dict(self):
+        return {
+            "examples": self.count,
+            "bytes": sum(shard["bytes"] for shard in self.shards),
+            "shards": self.shards,
+        }
+
+
+class StratifiedSplitWriter:
+    """Reparte los artículos entre entrenamiento y validación y los escribe en fragmentos."""
+
+    def __init__(self, output_path, options):
+        self.output_path = output_path
+        self.options = options
+        self.train = ShardedJsonlWriter(output_path, "train", options.max_bytes, options.max_examples)
+        self.validation = ShardedJsonlWriter(output_path, "validation", options.max_bytes, options.max_examples)
+        self._random = random.Random(options.seed)
+        self._reservoir = []  # [orden de llegada, número, líneas] de los artículos de validación
+        self._reservoir_slots = {}  # número -> posición en el reservorio
+        self._train_numbers = set()
+        self._seen = 0
+
+    @property
+    def count(self):
+        return self.train.count + self.validation.count + sum(len(entry[2]) for entry in self._reservoir)
+
+    def _write_train(self, number, lines):
+        self._train_numbers.add(number)
+        for line in lines:
+            self.train.write_line(line, number)
+
+    def write_article(self, number, lines):
+        """Agrega las líneas serializadas de un artículo; todas quedan en el mismo lado de la división."""
+        if number in self._train_numbers:
+            self._write_train(number, lines)
+            return
+        slot = self._reservoir_slots.get(number)
+        if slot is not None:
+            self._reservoir[slot][2].extend(lines)
+            return
+
+        capacity = self.options.validation_articles
+        if len(self._reservoir) < capacity:
+            self._reservoir_slots[number] = len(self._reservoir)
+            self._reservoir.append([self._seen, number, list(lines)])
+        else:
+            # Algoritmo R: el artículo k-ésimo entra al reservorio con probabilidad capacidad / k
+            slot = self._random.randrange(self._seen + 1)
+            if slot < capacity:
+                _, evicted_number, evicted_lines = self._reservoir[slot]
+                del self._reservoir_slots[evicted_number]
+                self._write_train(evicted_number, evicted_lines)
+                self._reservoir[slot] = [self._seen, number, list(lines)]
+                self._reservoir_slots[number] = slot
+            else:
+                self._write_train(number, lines)
+        self._seen += 1
+
+    def close(self):
+        """Escribe los artículos de validación (en el orden del documento), cierra los fragmentos y guarda el manifiesto."""
+        for _, number, lines in sorted(self._reservoir, key=lambda entry: entry[0]):
+            for line in lines:
+                self.validation.write_line(line, number)
+        validation_articles = len(self._reservoir)
+        self._reservoir = []
+        self._reservoir_slots = {}
+        self.train.close()
+        self.validation.close()
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "output": os.path.basename(self.output_path),
+            "seed": self.options.seed,
+            "max_bytes": self.options.max_bytes,
+            "max_examples": self.options.max_examples,
+            "splits": {
+                "train": dict(self.train.to_dict(), articles=len(self._train_numbers)),
+                "validation": dict(self.validation.to_dict(), articles=validation_articles),
+            },
+        }
+        manifest_path = manifest_path_for(self.output_path)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+        return manifest
+
+
+def load_shard_manifest(manifest_path):
+    """Lee un manifiesto de fragmentos y devuelve {split: [rutas de los fragmentos]} junto al manifiesto."""
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(manifest_path)
+    paths = {
+        split: [os.path.join(directory, shard["path"]) for shard in info["shards"]]
+        for split, info in manifest["splits"].items()
+    }
+    return paths, manifest
@@ -0,0 +1,314 @@
+import argparse
+import heapq
+import json
+import re
+from array import array
+
+from jsonl_io import open_jsonl, read_chunk_lines, split_chunks
+from pdf_extraction import add_workers_argument, resolve_workers
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+# Valores de referencia para la estimación; ajústalos al proveedor y modelo que uses
+DEFAULT_TRAIN_STEPS = 100  # Igual que tune_gemini.py
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_PRICE_PER_MILLION = 8.0  # USD por millón de tokens de entrenamiento
+MESSAGE_OVERHEAD_TOKENS = 4  # Tokens de formato que agrega cada mensaje de chat
+BATCH_SIZE_LINES = 10000
+TOKEN_CACHE_SIZE = 200000  # Textos distintos cuyo conteo se recuerda (las respuestas y el prompt de sistema se repiten)
+TOP_ARTICLES = 10
+
+# Aproximación sin conexión de un tokenizador BPE: palabras en trozos de hasta
+# 4 caracteres y cada signo de puntuación como un token.
+APPROXIMATE_TOKEN_PATTERN = re.compile(r'\w{1,4}|[^\w\s]')
+ARTICLE_NUMBER_PATTERN = re.compile(r'art[ií]culo\s+(\d+|UNKNOWN)', re.IGNORECASE)
+HISTOGRAM_BUCKETS = [64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768]
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def approximate_token_counts(texts):
+    """Cuenta tokens aproximados para un lote de textos."""
+    findall = APPROXIMATE_TOKEN_PATTERN.findall
+    return [len(findall(text)) for text in texts]
+
+
+def _tiktoken_counter(encoding_name="cl100k_base"):
+    try:
+        import tiktoken
+    except ImportError:
+        raise ValueError("El tokenizador 'tiktoken' requiere instalar el paquete tiktoken") from None
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(texts):
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+    return count
+
+
+def get_token_counter(name="aproximado"):
+    """Devuelve una función lista_de_textos -> lista_de_conteos."""
+    if name == "aproximado":
+        return approximate_token_counts
+    if name == "tiktoken":
+        return _tiktoken_counter()
+    raise ValueError(f"Tokenizador desconocido: '{name}'")
+
+
+def _example_parts(data):
+    """Devuelve (textos, número de mensajes, pregunta, índice de la respuesta) de un ejemplo de cualquier formato.
+
+    Devuelve None si la línea no tiene la forma de un ejemplo (por ejemplo, un número o una lista).
+    """
+    if not isinstance(data, dict):
+        return None
+    if "text" in data:
+        return ([data["text"]], 0, "", 0) if isinstance(data["text"], str) else None
+    messages = data.get("messages", [])
+    if not isinstance(messages, list) or not all(isinstance(message, dict) for message in messages):
+        return None
+    texts = []
+    question = ""
+    answer_index = None
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            return None
+        if message.get("role") == "user":
+            question = content
+        elif message.get("role") in ("assistant", "model"):
+            answer_index = len(texts)
+        texts.append(content)
+    return texts, len(texts), question, answer_index
+
+
+def _article_number(question, answer):
+    match = ARTICLE_NUMBER_PATTERN.search(question) or ARTICLE_NUMBER_PATTERN.match(answer)
+    return match.group(1) if match else "UNKNOWN"
+
+
+def _bucket_label(tokens):
+    lower = 0
+    for upper in HISTOGRAM_BUCKETS:
+        if tokens < upper:
+            return f"{lower}-{upper - 1}"
+        lower = upper
+    return f"{lower}+"
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class StatsAccumulator:
+    """Acumula las estadísticas de un conjunto de líneas; los parciales de varios procesos se combinan con merge()."""
+
+    def __init__(self, count_tokens=approximate_token_counts):
+        self.count_tokens = count_tokens
+        self.example_tokens = array('l')
+        self.histogram = {}
+        self.total_chars = 0
+        self.unknown_examples = 0
+        self.invalid_lines = 0
+        self.article_tokens = {}
+        self._token_cache = {}
+
+    def _cached_token_counts(self, texts):
+        # Solo se tokenizan los textos que no se han visto; el resto se toma de la caché
+        missing = list({text for text in texts if text not in self._token_cache})
+        if missing:
+            if len(self._token_cache) + len(missing) > TOKEN_CACHE_SIZE:
+                self._token_cache.clear()
+            self._token_cache.update(zip(missing, self.count_tokens(missing)))
+        return [self._token_cache[text] for text in texts]
+
+    def add_lines(self, lines):
+        """Procesa un iterable de líneas JSONL (str o bytes) en lotes."""
+        batch = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                parts = _example_parts(_loads(line))
+            except ValueError:
+                parts = None
+            if parts is None:
+                self.invalid_lines += 1
+                continue
+            batch.append(parts)
+            if len(batch) >= BATCH_SIZE_LINES:
+                self.add_batch(batch)
+                batch = []
+        if batch:
+            self.add_batch(batch)
+
+    def add_batch(self, batch):
+        # Todos los textos del lote se tokenizan en una sola llamada
+        texts = []
+        spans = []
+        for texts_in_example, message_count, question, answer_index in batch:
+            spans.append((len(texts), len(texts_in_example), message_count, question, answer_index))
+            texts.extend(texts_in_example)
+        counts = self._cached_token_counts(texts)
+        for start, length, message_count, question, answer_index in spans:
+            tokens = sum(counts[start:start + length]) + message_count * MESSAGE_OVERHEAD_TOKENS
+            self.example_tokens.append(tokens)
+            label = _bucket_label(tokens)
+            self.histogram[label] = self.histogram.get(label, 0) + 1
+            self.total_chars += sum(map(len, texts[start:start + length]))
+
+            answer = texts[start + answer_index] if answer_index is not None else ""
+            answer_tokens = counts[start + answer_index] if answer_index is not None else 0
+            number = _article_number(question, answer)
+            if number == "UNKNOWN":
+                self.unknown_examples += 1
+            elif answer_tokens > self.article_tokens.get(number, (0, 0))[0]:
+                self.article_tokens[number] = (answer_tokens, len(answer))
+
+    def merge(self, other):
+        self.example_tokens.extend(other.example_tokens)
+        for label, count in other.histogram.items():
+            self.histogram[label] = self.histogram.get(label, 0) + count
+        self.total_chars += other.total_chars
+        self.unknown_examples += other.unknown_examples
+        self.invalid_lines += other.invalid_lines
+        for number, value in other.article_tokens.items():
+            if value[0] > self.article_tokens.get(number, (0, 0))[0]:
+                self.article_tokens[number] = value
+
+    def __getstate__(self):
+        # La caché y el tokenizador no se envían entre procesos
+        state = dict(self.__dict__)
+        state["count_tokens"] = None
+        state["_token_cache"] = {}
+        return state
+
+    def to_dict(self, path):
+        sorted_tokens = sorted(self.example_tokens)
+        examples = len(sorted_tokens)
+        total_tokens = sum(sorted_tokens)
+        longest = heapq.nlargest(TOP_ARTICLES, self.article_tokens.items(), key=lambda item: item[1][0])
+        return {
+            "dataset": path,
+            "examples": examples,
+            "invalid_lines": self.invalid_lines,
+            "unknown_examples": self.unknown_examples,
+            "chars": {"total": self.total_chars, "mean": round(self.total_chars / examples, 1) if examples else 0},
+            "tokens": {
+                "total": total_tokens,
+                "mean": round(total_tokens / examples, 1) if examples else 0,
+                "p50": _percentile(sorted_tokens, 0.50),
+                "p95": _percentile(sorted_tokens, 0.95),
+                "max": sorted_tokens[-1] if sorted_tokens else 0,
+            },
+            "histogram": {label: self.histogram[label] for label in sorted(self.histogram, key=lambda label: int(label.split("-")[0].rstrip("+")))},
+            "longest_articles": [
+                {"article": number, "tokens": tokens, "chars": chars} for number, (tokens, chars) in longest
+            ],
+        }
+
+
+def _stats_for_chunk(path, start, end, tokenizer):
+    accumulator = StatsAccumulator(get_token_counter(tokenizer))
+    accumulator.add_lines(read_chunk_lines(path, start, end))
+    return accumulator
+
+
+def compute_stats(path, tokenizer="aproximado", workers=1):
+    """Recorre el JSONL una sola vez y calcula las estadísticas de caracteres y tokens.
+
+    Con `workers` > 1 los archivos sin comprimir se dividen en bloques que se
+    procesan en paralelo y luego se combinan.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1 or path.endswith((".gz", ".zst")):
+        accumulator = StatsAccumulator(get_token_counter(tokenizer))
+        with open_jsonl(path) as f:
+            accumulator.add_lines(f)
+        return accumulator.to_dict(path)
+
+    chunks = split_chunks(path, workers * 4)
+    accumulator = StatsAccumulator()
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(
+            _stats_for_chunk,
+            [path] * len(chunks),
+            [start for start, _ in chunks],
+            [end for _, end in chunks],
+            [tokenizer] * len(chunks),
+        ):
+            accumulator.merge(partial)
+    return accumulator.to_dict(path)
+
+
+def estimate_training(stats, train_steps=DEFAULT_TRAIN_STEPS, batch_size=DEFAULT_BATCH_SIZE, price_per_million=DEFAULT_PRICE_PER_MILLION):
+    """Estima épocas, tokens entrenados y costo para los hiperparámetros dados."""
+    examples = stats["examples"]
+    epochs = train_steps * batch_size / examples if examples else 0
+    trained_tokens = round(stats["tokens"]["mean"] * train_steps * batch_size)
+    return {
+        "train_steps": train_steps,
+        "batch_size": batch_size,
+        "epochs": round(epochs, 2),
+        "trained_tokens": trained_tokens,
+        "price_per_million_tokens": price_per_million,
+        "estimated_cost": round(trained_tokens / 1_000_000 * price_per_million, 2),
+        "steps_per_epoch": round(examples / batch_size, 1) if batch_size else 0,
+    }
+
+
+def report_path_for(dataset_path):
+    for extension in (".jsonl.gz", ".jsonl.zst", ".jsonl"):
+        if dataset_path.endswith(extension):
+            return dataset_path[:-len(extension)] + ".stats.json"
+    return dataset_path + ".stats.json"
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Estadísticas de un dataset JSONL y estimación de tokens y costo de entrenamiento.")
+    parser.add_argument("dataset", help="Archivo JSONL (.jsonl, .jsonl.gz o .jsonl.zst)")
+    parser.add_argument("--tokenizer", choices=["aproximado", "tiktoken"], default="aproximado", help="Tokenizador para contar tokens (por defecto, aproximado sin conexión)")
+    parser.add_argument("--train-steps", type=int, default=DEFAULT_TRAIN_STEPS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--price-per-million", type=float, default=DEFAULT_PRICE_PER_MILLION, help="Precio en USD por millón de tokens de entrenamiento")
+    parser.add_argument("--report", default=None, help="Ruta del reporte JSON (por defecto junto al dataset)")
+    add_workers_argument(parser, help="Procesos para analizar el archivo en paralelo")
+    args = parser.parse_args(argv)
+
+    try:
+        get_token_counter(args.tokenizer)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"Analizando {args.dataset}...")
+    stats = compute_stats(args.dataset, args.tokenizer, workers=args.workers)
+    stats["tokenizer"] = args.tokenizer
+    stats["training"] = estimate_training(stats, args.train_steps, args.batch_size, args.price_per_million)
+
+    report_path = args.report or report_path_for(args.dataset)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+
+    tokens = stats["tokens"]
+    training = stats["training"]
+    print(f"  Ejemplos: {stats['examples']} (con artículo UNKNOWN: {stats['unknown_examples']})")
+    if stats["invalid_lines"]:
+        print(f"  Líneas inválidas omitidas: {stats['invalid_lines']}")
+    print(f"  Tokens ({args.tokenizer}): total {tokens['total']}, promedio {tokens['mean']}, p95 {tokens['p95']}, máximo {tokens['max']}")
+    print("  Histograma de tokens por ejemplo:")
+    for label, count in stats["histogram"].items():
+        print(f"    {label:>12}: {count}")
+    print("  Artículos más largos: " + ", ".join(f"{item['article']} ({item['tokens']} tokens)" for item in stats["longest_articles"]))
+    print(f"  Con train_steps={training['train_steps']} y batch_size={training['batch_size']}: {training['epochs']} épocas, "
+          f"~{training['trained_tokens']} tokens entrenados, costo estimado ${training['estimated_cost']}")
+    print(f"Reporte guardado en {report_path}")
+
+
+if __name__ == "__main__":
+    main()
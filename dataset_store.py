@@ -0,0 +1,262 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+from emitters import SYSTEM_MESSAGE
+from jsonl_io import JsonlWriter, get_serializer, open_jsonl
+from storage import backend_for, print_upload_result, upload_stream
+
+# Formato intermedio normalizado: cada artículo se guarda una sola vez y las
+# preguntas lo referencian por id; los mensajes de sistema se guardan también
+# una sola vez (internados). A partir de él se materializa el JSONL de OpenAI o
+# de Gemini con un simple join, a un archivo o directamente al destino de
+# subida (storage.py) sin escribirlo en disco. El JSONL materializado usa el
+# serializador de JsonlWriter (JSON compacto): coincide byte a byte con los
+# archivos que escribe este repositorio, y con otros JSONL solo en su contenido.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    number TEXT,
+    title TEXT,
+    content_hash TEXT NOT NULL UNIQUE,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prompts (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    article_id INTEGER NOT NULL REFERENCES articles(id),
+    prompt_id INTEGER REFERENCES prompts(id),
+    text TEXT NOT NULL
+);
+"""
+
+ARTICLE_HEADER_PATTERN = re.compile(r'ART[IÍ]CULO\s+(\d+)[°º.]?\s*[.-]?\s*(.*)', re.IGNORECASE)
+
+
+def to_openai_example(system_message, question, content):
+    messages = []
+    if system_message:
+        messages.append({"role": "system", "content": system_message})
+    messages.append({"role": "user", "content": question})
+    messages.append({"role": "assistant", "content": content})
+    return {"messages": messages}
+
+
+def to_gemini_example(system_message, question, content):
+    # El formato de Gemini solo tiene los roles user y model
+    return {
+        "messages": [
+            {"role": "user", "content": question},
+            {"role": "model", "content": content}
+        ]
+    }
+
+
+TARGETS = {
+    "openai": to_openai_example,
+    "gemini": to_gemini_example,
+}
+
+
+def hash_content(content):
+    # Se indexa un hash corto y no el texto: un índice sobre el contenido duplicaría cada artículo
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def parse_article_header(content):
+    """Obtiene el número y título del artículo a partir de su primera línea."""
+    first_line = content.split('\n', 1)[0].strip()
+    match = ARTICLE_HEADER_PATTERN.search(first_line)
+    if match:
+        return match.group(1), match.group(2).strip().rstrip('.') or None
+    return None, None
+
+
+class DatasetStore:
+    """Dataset normalizado en SQLite: tabla de artículos, de preguntas y de prompts de sistema."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._article_ids = {}
+        self._prompt_ids = {}
+
+    def add_article(self, number, title, content):
+        """Agrega un artículo (si ya existe el mismo contenido devuelve su id)."""
+        content_hash = hash_content(content)
+        article_id = self._article_ids.get(content_hash)
+        if article_id is not None:
+            return article_id
+        row = self.connection.execute("SELECT id FROM articles WHERE content_hash = ?", (content_hash,)).fetchone()
+        if row:
+            article_id = row[0]
+        else:
+            cursor = self.connection.execute(
+                "INSERT INTO articles (number, title, content_hash, content) VALUES (?, ?, ?, ?)",
+                (number, title, content_hash, content),
+            )
+            article_id = cursor.lastrowid
+        self._article_ids[content_hash] = article_id
+        return article_id
+
+    def intern_prompt(self, text):
+        """Devuelve el id del mensaje de sistema, guardándolo una sola vez."""
+        if not text:
+            return None
+        prompt_id = self._prompt_ids.get(text)
+        if prompt_id is not None:
+            return prompt_id
+        self.connection.execute("INSERT OR IGNORE INTO prompts (text) VALUES (?)", (text,))
+        prompt_id = self.connection.execute("SELECT id FROM prompts WHERE text = ?", (text,)).fetchone()[0]
+        self._prompt_ids[text] = prompt_id
+        return prompt_id
+
+    def add_question(self, article_id, question, system_message=None):
+        self.connection.execute(
+            "INSERT INTO questions (article_id, prompt_id, text) VALUES (?, ?, ?)",
+            (article_id, self.intern_prompt(system_message), question),
+        )
+
+    def add_example(self, example):
+        """Normaliza un ejemplo de chat (formato OpenAI o Gemini) y lo agrega al dataset."""
+        system_message = question = content = None
+        for message in example["messages"]:
+            role = message.get("role")
+            if role == "system":
+                system_message = message["content"]
+            elif role == "user":
+                question = message["content"]
+            elif role in ("assistant", "model"):
+                content = message["content"]
+        if question is None or content is None:
+            raise ValueError("El ejemplo debe tener un mensaje 'user' y uno 'assistant' o 'model'")
+        number, title = parse_article_header(content)
+        article_id = self.add_article(number, title, content)
+        self.add_question(article_id, question, system_message)
+
+    def iter_examples(self, target, system_message=None):
+        """Genera los ejemplos en el formato indicado, en el orden en que se agregaron.
+
+        `system_message` reemplaza el prompt guardado; útil para pasar a OpenAI un
+        dataset que vino de Gemini (que no tiene mensaje de sistema).
+        """
+        build_example = TARGETS[target]
+        cursor = self.connection.execute(
+            "SELECT prompts.text, questions.text, articles.content"
+            " FROM questions"
+            " JOIN articles ON articles.id = questions.article_id"
+            " LEFT JOIN prompts ON prompts.id = questions.prompt_id"
+            " ORDER BY questions.id"
+        )
+        for stored_prompt, question, content in cursor:
+            yield build_example(system_message or stored_prompt, question, content)
+
+    def counts(self):
+        return {
+            table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("articles", "questions", "prompts")
+        }
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def normalize_jsonl(jsonl_path, store_path):
+    """Convierte un JSONL de chat (OpenAI o Gemini) al formato normalizado."""
+    if os.path.exists(store_path):
+        os.remove(store_path)
+    with DatasetStore(store_path) as store:
+        with open_jsonl(jsonl_path) as f:
+            for line in f:
+                if line.strip():
+                    store.add_example(json.loads(line))
+        counts = store.counts()
+    # Compactar el archivo: las páginas libres no se guardan
+    connection = sqlite3.connect(store_path)
+    connection.execute("VACUUM")
+    connection.close()
+    return counts
+
+
+def materialize(store_path, output_path, target, system_message=None):
+    """Expande el dataset normalizado a un JSONL del formato indicado; devuelve el número de ejemplos."""
+    with DatasetStore(store_path) as store:
+        with JsonlWriter(output_path) as writer:
+            return writer.write_all(store.iter_examples(target, system_message))
+
+
+def iter_materialized_lines(store_path, target, system_message=None):
+    """Genera las líneas JSONL (bytes) del formato indicado, serializadas igual que con JsonlWriter."""
+    dumps = get_serializer()
+    with DatasetStore(store_path) as store:
+        for example in store.iter_examples(target, system_message):
+            yield dumps(example) + b"\n"
+
+
+def upload_materialized(store_path, destination, name, target, system_message=None, compress=False):
+    """Materializa el dataset y lo sube en streaming a "gs://bucket/prefijo" o a una carpeta local; devuelve un UploadResult."""
+    backend, prefix = backend_for(destination)
+    name = f"{prefix}/{name}" if prefix else name
+    return upload_stream(backend, lambda: iter_materialized_lines(store_path, target, system_message), name, compress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Formato de dataset normalizado (artículos + preguntas) y su materialización a JSONL.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    normalize_parser = subparsers.add_parser("normalizar", help="Convierte un JSONL de chat al formato normalizado")
+    normalize_parser.add_argument("jsonl", help="JSONL de entrada (formato OpenAI o Gemini)")
+    normalize_parser.add_argument("store", help="Archivo SQLite de salida")
+
+    materialize_parser = subparsers.add_parser("materializar", help="Genera el JSONL de OpenAI o Gemini desde el formato normalizado")
+    materialize_parser.add_argument("store", help="Archivo SQLite de entrada")
+    materialize_parser.add_argument("--target", choices=sorted(TARGETS), required=True)
+    materialize_parser.add_argument("--output", required=True, help="Archivo de salida (.jsonl, .jsonl.gz o .jsonl.zst); con --destino, nombre del objeto subido")
+    materialize_parser.add_argument("--system", default=None, help="Mensaje de sistema a usar en lugar del guardado")
+    materialize_parser.add_argument("--destino", dest="destination", default=None, help='Sube el JSONL a "gs://bucket/prefijo" o a una carpeta local sin escribirlo en disco (con .gz se comprime al subir)')
+
+    args = parser.parse_args()
+
+    if args.command == "normalizar":
+        counts = normalize_jsonl(args.jsonl, args.store)
+        input_size = os.path.getsize(args.jsonl)
+        store_size = os.path.getsize(args.store)
+        print(f"Dataset normalizado en {args.store}")
+        print(f"  {counts['articles']} artículos, {counts['questions']} preguntas, {counts['prompts']} prompts de sistema")
+        print(f"  Tamaño: {input_size / 1024:.1f} KB -> {store_size / 1024:.1f} KB ({input_size / store_size:.1f}x)")
+    else:
+        system_message = args.system
+        if args.target == "openai" and system_message is None:
+            with DatasetStore(args.store) as store:
+                if store.counts()["prompts"] == 0:
+                    system_message = SYSTEM_MESSAGE
+        if args.destination is None:
+            count = materialize(args.store, args.output, args.target, system_message)
+            print(f"Generados {count} ejemplos en {args.output} (formato {args.target})")
+        else:
+            if args.output.endswith(".zst"):
+                materialize_parser.error("Con --destino el JSONL solo se puede comprimir con gzip (.gz)")
+            try:
+                result = upload_materialized(args.store, args.destination, os.path.basename(args.output), args.target,
+                                             system_message, compress=args.output.endswith(".gz"))
+            except ValueError as e:
+                materialize_parser.error(str(e))
+            print_upload_result(result)
@@ -0,0 +1,178 @@
+import re
+
+# Modelo estructurado de la ley: un árbol título > capítulo > artículo >
+# parágrafo > numeral. Todos los nodos guardan solo offsets (inicio y fin) en un
+# único texto compartido, así que el árbol no copia el texto de la ley; las
+# subcadenas se crean únicamente cuando se pide `node.text`, `node.title`, etc.
+#
+# El árbol se construye en una sola pasada: una expresión regular encuentra los
+# encabezados al inicio de cada línea (en orden) y una pila decide qué nodos
+# cierra cada encabezado según su nivel.
+
+MARKER_PATTERN = re.compile(
+    r'^(?:'
+    r'(?P<titulo>T ?[IÍ] ?T ?U ?L ?O)\s+(?P<titulo_label>(?:[IVXLC] ?)+|[A-ZÁÉÍÓÚ]+)\b\.?'
+    r'|(?P<capitulo>CAP[IÍ]TULO)\s+(?P<capitulo_label>[IVXLC]+|[A-ZÁÉÍÓÚ]+)\b\.?'
+    r'|(?P<articulo>ART[IÍ]CULO|Art[ií]culo)\s+(?P<articulo_label>\d+)\s*[°º]?\s*(?:o\b)?\s*[.-]?'
+    r'|(?P<paragrafo>PAR[AÁ]GRAFO)\b(?:\s+(?P<paragrafo_label>\d+[°º]?o?|[A-ZÁÉÍÓÚ]+)\b)?\s*[°º]?\.?'
+    r'|(?P<numeral>(?P<numeral_label>\d{1,2}|[a-zA-Z])[.)])(?=\s)'
+    r')',
+    re.MULTILINE,
+)
+
+LEVELS = {"documento": 0, "titulo": 1, "capitulo": 2, "articulo": 3, "paragrafo": 4, "numeral": 5}
+MARKER_KINDS = ("titulo", "capitulo", "articulo", "paragrafo", "numeral")
+UNTITLED = "Sin título"
+MAX_TITLE_WORDS = 12  # Los artículos sin título en mayúsculas toman el inicio de su primera oración
+
+
+class DocumentNode:
+    """Nodo del árbol: tipo, etiqueta ("131", "II", "1o") y offsets en el texto del documento."""
+
+    __slots__ = ("kind", "label", "start", "end", "header_end", "title_start", "title_end", "parent", "children", "document")
+
+    def __init__(self, document, kind, label, start, header_end, parent):
+        self.document = document
+        self.kind = kind
+        self.label = label
+        self.start = start
+        self.end = len(document.text)
+        self.header_end = header_end
+        self.title_start = self.title_end = header_end
+        self.parent = parent
+        self.children = []
+
+    @property
+    def level(self):
+        # Los literales ("a)") dentro de un numeral ("1." o "A.") quedan un nivel más abajo
+        if self.kind == "numeral" and self.label.islower() and self.parent.kind == "numeral" and not self.parent.label.islower():
+            return LEVELS["numeral"] + 1
+        return LEVELS[self.kind]
+
+    @property
+    def text(self):
+        return self.document.text[self.start:self.end]
+
+    @property
+    def title(self):
+        title = self.document.text[self.title_start:self.title_end]
+        return title if title else UNTITLED
+
+    # Interfaz de articles.Article para que los emisores e índices reciban los nodos directamente
+    @property
+    def number(self):
+        return self.label
+
+    @property
+    def content(self):
+        return self.text
+
+    def ancestor(self, kind):
+        """Devuelve el título o capítulo que contiene al nodo (o None)."""
+        node = self.parent
+        while node is not None and node.kind != kind:
+            node = node.parent
+        return node
+
+    def iter_nodes(self, kind=None):
+        """Recorre el subárbol en orden del documento."""
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if kind is None or node.kind == kind:
+                yield node
+            stack.extend(reversed(node.children))
+
+    def __repr__(self):
+        return f"<{self.kind} {self.label} [{self.start}:{self.end}]>"
+
+
+class Document:
+    """Texto completo de la ley y la raíz de su árbol."""
+
+    def __init__(self, text):
+        self.text = text
+        self.root = DocumentNode(self, "documento", "", 0, 0, None)
+
+    def articles(self):
+        return self.root.iter_nodes("articulo")
+
+    def preamble(self):
+        """Nodo con el texto anterior al primer encabezado (o None si está vacío)."""
+        end = self.root.children[0].start if self.root.children else len(self.text)
+        start, end = _strip_span(self.text, 0, end)
+        if start == end:
+            return None
+        node = DocumentNode(self, "preambulo", "UNKNOWN", start, start, None)
+        node.end = end
+        return node
+
+
+def _strip_span(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _line_end(text, position):
+    end = text.find("\n", position)
+    return len(text) if end == -1 else end
+
+
+def _set_title(node, text):
+    """Ubica el título del nodo: el resto de la línea del encabezado hasta el primer punto, o la línea siguiente."""
+    line_end = _line_end(text, node.header_end)
+    start, end = _strip_span(text, node.header_end, line_end)
+    if start == end and line_end < len(text) and node.kind != "numeral":
+        start, end = _strip_span(text, line_end + 1, _line_end(text, line_end + 1))
+    if node.kind in ("articulo", "paragrafo", "numeral"):
+        period = text.find(". ", start, end)
+        if period != -1:
+            end = period
+        word_end = start
+        for _ in range(MAX_TITLE_WORDS):
+            word_end = text.find(" ", word_end + 1, end)
+            if word_end == -1:
+                break
+        if word_end != -1:
+            end = word_end
+    while end > start and text[end - 1] in ". ":
+        end -= 1
+    node.title_start, node.title_end = start, end
+
+
+def _close(node, position, text):
+    node.end = _strip_span(text, node.start, position)[1]
+
+
+def parse_document(text):
+    """Construye el árbol del documento en una sola pasada sobre el texto."""
+    document = Document(text)
+    stack = [document.root]
+    for match in MARKER_PATTERN.finditer(text):
+        kind = next(name for name in MARKER_KINDS if match.group(name))
+        label = (match.group(kind + "_label") or "").replace(" ", "")
+        if kind == "numeral" and not any(node.kind == "articulo" for node in stack):
+            # Listas fuera de un artículo (por ejemplo, en el preámbulo)
+            continue
+
+        node = DocumentNode(document, kind, label, match.start(), match.end(), None)
+        # Un literal ("a)") se anida en el numeral abierto; cualquier otro encabezado cierra los de su nivel o inferior
+        node.parent = stack[-1]
+        while node.level <= stack[-1].level:
+            _close(stack.pop(), match.start(), text)
+            node.parent = stack[-1]
+        _set_title(node, text)
+        node.parent.children.append(node)
+        stack.append(node)
+
+    while len(stack) > 1:
+        _close(stack.pop(), len(text), text)
+    return document
+
+
+def parse_pages(pages):
+    """Une las páginas en un solo texto y lo analiza."""
+    return parse_document("\n".join(page.rstrip("\n") for page in pages))
@@ -0,0 +1,285 @@
+import itertools
+import os
+
+from article_chunking import PACKED_SEPARATOR
+from article_index import ArticleIndexBuilder
+from articles import article_key, generate_questions_for_article
+from dataset_shards import StratifiedSplitWriter, load_shard_manifest, manifest_path_for
+from jsonl_io import JsonlWriter, get_serializer
+from validate_jsonl import DEFAULT_MAX_CHARS, ValidationResult, check_example, validate_file
+
+QUESTION_PLACEHOLDER = "\x00pregunta\x00"  # Se reemplaza por cada pregunta en la línea ya serializada
+SYSTEM_MESSAGE = "Eres un asistente experto en el Código Nacional de Tránsito de Colombia (Ley 769 de 2002). Proporciona información precisa y detallada sobre los artículos del código cuando se te consulte."
+# Con --corpus los ejemplos mezclan varias normas y cada pregunta nombra la suya (ver corpus.py)
+CORPUS_SYSTEM_MESSAGE = "Eres un asistente experto en las normas de tránsito de Colombia: el Código Nacional de Tránsito (Ley 769 de 2002) y las leyes y decretos que lo modifican o reglamentan. Proporciona información precisa y detallada sobre los artículos de cada norma cuando se te consulte."
+OUTPUT_STEM = "articulos_ley_769"  # Prefijo de los archivos de salida
+CORPUS_OUTPUT_STEM = "articulos_corpus"
+
+
+EMITTERS = {}
+
+
+def register_emitter(emitter_class):
+    """Registra un formato de salida para que generate_datasets.py pueda usarlo."""
+    EMITTERS[emitter_class.name] = emitter_class
+    return emitter_class
+
+
+class Emitter:
+    """Formato de salida que recibe el flujo de artículos y escribe su propio JSONL.
+
+    Las subclases definen `name`, `default_output`, `schema` (ver
+    validate_jsonl.py), `examples_for(article)` y `packed_examples_for(parts)`.
+    Cada ejemplo se valida al escribirlo. `version` debe aumentarse cuando
+    cambia lo que se genera para un mismo artículo.
+
+    Opciones:
+      sharding   ShardingOptions: fragmentos de entrenamiento y validación con
+                 su manifiesto (dataset_shards.py). Sin fragmentos y sin
+                 compresión se escribe el índice de offsets (article_index.py).
+      questions  QuestionGenerator: preguntas de plantillas en los formatos de
+                 chat (question_augmentation.py).
+      system_message  Prompt de sistema de los formatos que lo usan.
+
+    `emit(article)` recibe un artículo y `emit_block(parts)` un bloque de
+    ArticleChunker (article_chunking.py). Los ejemplos se indexan y se reparten
+    con la clave de articles.article_key.
+    """
+
+    name = None
+    default_output = None
+    schema = None
+    # Aumentar al cambiar el contenido generado: invalida las salidas incrementales previas
+    version = 1
+
+    def __init__(self, output_path=None, max_chars=DEFAULT_MAX_CHARS, sharding=None, questions=None, system_message=SYSTEM_MESSAGE):
+        self.output_path = output_path or self.default_output
+        self.max_chars = max_chars
+        self.sharding = sharding
+        self.questions = questions
+        self.system_message = system_message
+        self.writer = None
+        self.index = None
+        self.validation = ValidationResult()
+        self.manifest = None
+
+    def open(self):
+        self.validation = ValidationResult()
+        self._dumps = get_serializer()
+        if self.sharding is not None:
+            # Cada fragmento escribe su propio índice
+            self.writer = StratifiedSplitWriter(self.output_path, self.sharding)
+            self.index = None
+            return
+        self.writer = JsonlWriter(self.output_path)
+        # El índice guarda offsets del archivo tal cual, así que solo tiene sentido sin compresión
+        self.index = None if self.output_path.endswith((".gz", ".zst")) else ArticleIndexBuilder()
+
+    def emit(self, article):
+        self._write_examples([article_key(article)], self.examples_for(article))
+
+    def emit_block(self, parts):
+        """Emite un bloque de ArticleChunker: una parte como un artículo, varias empaquetadas."""
+        if len(parts) == 1:
+            self.emit(parts[0])
+            return
+        self._write_examples([article_key(part) for part in parts], self.packed_examples_for(parts))
+
+    def _write_examples(self, numbers, examples):
+        # Un ejemplo empaquetado se indexa en todos sus artículos; en la salida
+        # fragmentada queda del lado de la división de su primer artículo
+        if self.sharding is not None:
+            lines = []
+            for example in examples:
+                lines.append(self._dumps(example) + b"\n")
+                self.validation.check(self.schema, example, self.writer.count + len(lines), self.max_chars)
+            if lines:
+                self.writer.write_article(numbers[0], lines)
+            return
+        for example in examples:
+            offset = self.writer.position
+            line = self.writer.write(example)
+            if self.index is not None:
+                for number in numbers:
+                    self.index.add(number, offset, len(line))
+            self.validation.check(self.schema, example, self.writer.count, self.max_chars)
+
+    @property
+    def count(self):
+        return self.writer.count if self.writer else 0
+
+    def close(self):
+        if self.writer is not None:
+            if self.sharding is not None:
+                self.manifest = self.writer.close()
+                return
+            self.writer.close()
+            if self.index is not None:
+                self.index.save(self.output_path)
+                self.index = None
+
+    def examples_for(self, article):
+        raise NotImplementedError
+
+    def packed_examples_for(self, parts):
+        raise NotImplementedError
+
+    def validate_example(self, data):
+        """Devuelve los mensajes de error de un ejemplo ya parseado."""
+        return [message for _, message in check_example(self.schema, data, self.max_chars)]
+
+    def validate(self, workers=1):
+        """Vuelve a validar el archivo escrito completo (o todos sus fragmentos) y devuelve un ValidationResult."""
+        if self.sharding is None:
+            return validate_file(self.output_path, self.schema, workers=workers, max_chars=self.max_chars)
+        result = ValidationResult()
+        paths, _ = load_shard_manifest(manifest_path_for(self.output_path))
+        for split_paths in paths.values():
+            for path in split_paths:
+                result.merge(validate_file(path, self.schema, workers=workers, max_chars=self.max_chars), line_offset=result.lines)
+        return result
+
+
+@register_emitter
+class TextEmitter(Emitter):
+    """Formato simple: un objeto {"text": ...} por bloque, incluidos los que no son artículos."""
+
+    name = "text"
+    default_output = f"{OUTPUT_STEM}.jsonl"
+    schema = "text"
+
+    def examples_for(self, article):
+        yield {"text": article.content}
+
+    def packed_examples_for(self, parts):
+        yield {"text": PACKED_SEPARATOR.join(part.content for part in parts)}
+
+
+class ChatEmitter(Emitter):
+    """Base para los formatos de chat: una pregunta por ejemplo, solo bloques con número de artículo."""
+
+    def _questions(self, article):
+        if article.number == "UNKNOWN":
+            return []
+        if self.questions is not None:
+            questions = list(self.questions.questions_for(article))
+        else:
+            questions = generate_questions_for_article(article.number, article.title, getattr(article, "source", None))
+        # Las partes de un artículo dividido indican en la pregunta cuál parte se responde
+        context = getattr(article, "question_context", "")
+        return [question + context for question in questions] if context else questions
+
+    def examples_for(self, article):
+        content = article.content
+        for question in self._questions(article):
+            yield self.build_example(question, content)
+
+    def packed_examples_for(self, parts):
+        # Una conversación por ronda: en la ronda k cada artículo aporta su k-ésima pregunta
+        questions = [self._questions(part) for part in parts]
+        for round_index in range(max(map(len, questions))):
+            turns = [(part_questions[round_index], part.content)
+                     for part, part_questions in zip(parts, questions) if round_index < len(part_questions)]
+            yield self.build_conversation(turns)
+
+    def build_example(self, question, content):
+        return self.build_conversation([(question, content)])
+
+    def build_conversation(self, turns):
+        """Ejemplo con una lista de turnos (pregunta, respuesta)."""
+        raise NotImplementedError
+
+    def emit(self, article):
+        if self.questions is None:
+            super().emit(article)
+            return
+        # Con muchas preguntas por artículo, el ejemplo se serializa una sola vez
+        # y cada línea es prefijo + pregunta en JSON + sufijo; solo cambia la pregunta.
+        batches = self.questions.iter_batches(article)
+        first = next(batches, None)
+        if first is None:
+            return
+        context = getattr(article, "question_context", "")
+        if context:
+            batches = ([question + context for question in batch] for batch in batches)
+            first = [question + context for question in first]
+        dumps = self._dumps
+        prefix, suffix = dumps(self.build_example(QUESTION_PLACEHOLDER, article.content)).split(dumps(QUESTION_PLACEHOLDER))
+        suffix += b"\n"
+        for batch in itertools.chain([first], batches):
+            lines = [prefix + dumps(question) + suffix for question in batch]
+            self._check_batch(article, batch)
+            if self.sharding is not None:
+                self.writer.write_article(article_key(article), lines)
+                continue
+            if self.index is not None:
+                offset = self.writer.position
+                key = article_key(article)
+                for line in lines:
+                    self.index.add(key, offset, len(line))
+                    offset += len(line)
+            self.writer.write_raw(b"".join(lines), len(lines))
+
+    def _check_batch(self, article, batch):
+        # Los ejemplos del lote solo difieren en la pregunta: si el de la pregunta
+        # más larga es válido, todos lo son; si no, se valida uno por uno
+        line_num = self.validation.lines + 1
+        longest = self.build_example(max(batch, key=len), article.content)
+        if not check_example(self.schema, longest, self.max_chars):
+            self.validation.add_valid(len(batch))
+            return
+        for offset, question in enumerate(batch):
+            self.validation.check(self.schema, self.build_example(question, article.content), line_num + offset, self.max_chars)
+
+
+@register_emitter
+class OpenAIEmitter(ChatEmitter):
+    name = "openai"
+    default_output = f"{OUTPUT_STEM}_openai.jsonl"
+    schema = "openai"
+
+    def build_conversation(self, turns):
+        messages = [{"role": "system", "content": self.system_message}]
+        for question, content in turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "assistant", "content": content})
+        return {"messages": messages}
+
+
+@register_emitter
+class GeminiEmitter(ChatEmitter):
+    name = "gemini"
+    default_output = f"{OUTPUT_STEM}_gemini.jsonl"
+    schema = "gemini"
+
+    def build_conversation(self, turns):
+        messages = []
+        for question, content in turns:
+            messages.append({"role": "user", "content": question})
+            messages.append({"role": "model", "content": content})
+        return {"messages": messages}
+
+
+def output_name(emitter_class, extension=".jsonl", corpus=False):
+    """Nombre del archivo del formato: articulos_ley_769_openai.jsonl, o articulos_corpus_openai.jsonl con un corpus."""
+    base_name = emitter_class.default_output[:-len(".jsonl")]
+    if corpus and base_name.startswith(OUTPUT_STEM):
+        base_name = CORPUS_OUTPUT_STEM + base_name[len(OUTPUT_STEM):]
+    return base_name + extension
+
+
+def create_emitters(names, output_dir=".", extension=".jsonl", sharding=None, questions=None, corpus=False):
+    """Instancia los emisores pedidos; los archivos se escriben en `output_dir`.
+
+    Con `corpus` los archivos se llaman articulos_corpus* y los formatos de
+    chat usan el prompt de sistema de varias normas.
+    """
+    system_message = CORPUS_SYSTEM_MESSAGE if corpus else SYSTEM_MESSAGE
+    emitters = []
+    for name in names:
+        if name not in EMITTERS:
+            raise ValueError(f"Formato desconocido: '{name}'. Disponibles: {', '.join(sorted(EMITTERS))}")
+        emitter_class = EMITTERS[name]
+        output_path = os.path.join(output_dir, output_name(emitter_class, extension, corpus))
+        emitters.append(emitter_class(output_path, sharding=sharding, questions=questions, system_message=system_message))
+    return emitters
@@ -0,0 +1,312 @@
+import argparse
+import os
+
+from article_chunking import add_chunking_arguments, chunker_from_args
+from articles import extract_pages_from_pdf, iter_articles
+from corpus import DEFAULT_OUTPUT_PATH as CORPUS_OUTPUT_PATH, DEFAULT_REPORT_PATH as CORPUS_REPORT_PATH
+from corpus import corpus_record, iter_corpus_articles, load_corpus, print_corpus_report, write_report
+from dataset_shards import DEFAULT_SEED, ShardingOptions, manifest_path_for
+from emitters import EMITTERS, create_emitters
+from incremental import DEFAULT_MANIFEST_PATH, build_incremental
+from jsonl_io import JsonlWriter
+from pdf_cache import hash_file
+from pdf_extraction import add_workers_argument
+from profiling import StageProfiler, add_profile_arguments, profiler_from_args
+from question_augmentation import add_question_arguments, question_generator_from_args
+from search_index import CORPUS_INDEX_PATH, DEFAULT_INDEX_PATH, SearchIndexBuilder, build_search_index
+from streaming import CountedIterator
+from text_normalization import normalize_pages
+from validate_jsonl import print_validation_result
+
+DEFAULT_PDF_PATH = "ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf"
+EXTENSIONS = {"ninguna": ".jsonl", "gz": ".jsonl.gz", "zst": ".jsonl.zst"}
+
+
+def _index_articles(articles, search_index, profiler):
+    for article in articles:
+        with profiler.stage("search_index") as record:
+            search_index.add(article)
+            record.items += 1
+        yield article
+
+
+def generate_datasets(pdf_path, emitters, workers=1, search_index=None, normalize=True, normalization=None, profiler=None, chunker=None):
+    """Procesa el PDF una sola vez y reparte cada artículo a todos los emisores.
+
+    Si se pasa un SearchIndexBuilder, también recibe cada artículo. Las
+    reparaciones de la normalización del texto se suman en `normalization`.
+    Con un StageProfiler se mide cada etapa (ver profiling.py). Con un
+    ArticleChunker (ver article_chunking.py) los emisores reciben los bloques
+    ajustados al presupuesto de tokens en lugar de los artículos completos.
+    Devuelve el número de bloques de artículos procesados.
+    """
+    profiler = profiler or StageProfiler(enabled=False)
+    with profiler.stage("extract_pages_from_pdf") as record:
+        pages = extract_pages_from_pdf(pdf_path, workers=workers, normalize=False)
+        record.items = len(pages)
+    if not pages:
+        return 0
+    if normalize:
+        with profiler.stage("normalize_pages") as record:
+            record.items = len(pages)
+            pages = normalize_pages(pages, normalization)
+
+    articles = profiler.iterate("iter_articles", iter_articles(pages))
+    return emit_articles(articles, emitters, search_index, profiler, chunker)
+
+
+def generate_corpus(documents, emitters, workers=1, search_index=None, normalize=True, report=None, profiler=None, chunker=None, corpus_path=None):
+    """Como generate_datasets, pero con todos los documentos de un corpus (ver corpus.py).
+
+    Los documentos se preparan en paralelo y sus artículos, etiquetados con su
+    norma, llegan a los emisores en el orden del corpus. Con `corpus_path`
+    también se escribe el JSONL de artículos del corpus. Los datos de cada
+    documento se agregan en `report`.
+    """
+    profiler = profiler or StageProfiler(enabled=False)
+    articles = iter_corpus_articles(documents, normalize, workers, report, profiler)
+    if corpus_path is None:
+        return emit_articles(articles, emitters, search_index, profiler, chunker)
+    with JsonlWriter(corpus_path) as writer:
+        return emit_articles(_write_corpus(articles, writer), emitters, search_index, profiler, chunker)
+
+
+def _write_corpus(articles, writer):
+    for article in articles:
+        writer.write(corpus_record(article))
+        yield article
+
+
+def emit_articles(articles, emitters, search_index=None, profiler=None, chunker=None):
+    """Abre los emisores, les reparte cada artículo (o bloque del chunker) y los cierra.
+
+    Devuelve el número de artículos procesados.
+    """
+    profiler = profiler or StageProfiler(enabled=False)
+    articles = CountedIterator(articles)
+    for emitter in emitters:
+        emitter.open()
+    try:
+        if chunker is not None:
+            # El índice de búsqueda recibe los artículos completos antes de dividirlos
+            stream = articles if search_index is None else _index_articles(articles, search_index, profiler)
+            for block in profiler.iterate("chunking", chunker.iter_blocks(stream)):
+                for emitter in emitters:
+                    with profiler.stage(f"emit:{emitter.name}") as record:
+                        emitter.emit_block(block)
+                        record.items += 1
+            return articles.count
+        for article in articles:
+            for emitter in emitters:
+                with profiler.stage(f"emit:{emitter.name}") as record:
+                    emitter.emit(article)
+                    record.items += 1
+            if search_index is not None:
+                with profiler.stage("search_index") as record:
+                    search_index.add(article)
+                    record.items += 1
+    finally:
+        for emitter in emitters:
+            with profiler.stage(f"emit:{emitter.name}"):
+                emitter.close()
+    return articles.count
+
+
+def print_validation_errors(errors):
+    print("  ERROR: Se encontraron errores de formato:")
+    for error in errors[:10]:  # Mostrar solo los primeros 10 errores
+        print(f"    {error}")
+    if len(errors) > 10:
+        print(f"    ... y {len(errors) - 10} errores más")
+
+
+def print_normalization_report(report):
+    if not report:
+        return
+    print(f"  Texto normalizado: {report['words_repaired']} palabras reparadas, "
+          f"{report['line_breaks_removed']} saltos de línea eliminados, "
+          f"{report['degree_signs']} símbolos º, {report['whitespace_fixed']} espacios corregidos")
+
+
+def print_shard_manifest(emitter):
+    splits = emitter.manifest["splits"]
+    for label, split in (("entrenamiento", "train"), ("validación", "validation")):
+        info = splits[split]
+        if info["shards"]:
+            print(f"  {label}: {info['examples']} ejemplos de {info['articles']} artículos en {len(info['shards'])} fragmentos")
+    print(f"  Manifiesto: {manifest_path_for(emitter.output_path)}")
+
+
+def print_incremental_report(report):
+    print_normalization_report(report["normalization"])
+    print(f"  {report['articles']} bloques de artículos")
+    if report["full_build"]:
+        print("  Sin manifiesto previo: se generaron todos los artículos")
+    for label, key in (("Agregados", "added"), ("Eliminados", "removed"), ("Modificados", "modified")):
+        if report["full_build"]:
+            break
+        numbers = report[key]
+        print(f"  {label}: {len(numbers)}" + (f" ({', '.join(numbers)})" if numbers else ""))
+    for name, regenerated in report["regenerated"].items():
+        print(f"  [{name}] {regenerated} artículos regenerados")
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Genera todos los formatos JSONL de la Ley 769 de 2002 procesando el PDF una sola vez.")
+    parser.add_argument("--pdf", default=DEFAULT_PDF_PATH, help="PDF de entrada")
+    parser.add_argument("--corpus", default=None, help="Carpeta con PDFs o manifiesto JSON de varias normas (ver corpus.py); reemplaza a --pdf")
+    parser.add_argument(
+        "--targets",
+        default=",".join(EMITTERS),
+        help=f"Formatos a generar separados por comas (por defecto: {','.join(EMITTERS)})",
+    )
+    parser.add_argument("--output-dir", default=".", help="Carpeta donde se escriben los archivos")
+    parser.add_argument("--compression", choices=sorted(EXTENSIONS), default="ninguna", help="Compresión de los archivos de salida")
+    parser.add_argument("--incremental", action="store_true", help="Regenera solo los artículos que cambiaron desde la última ejecución incremental")
+    parser.add_argument("--manifest", default=None, help=f"Manifiesto de la regeneración incremental (por defecto: <output-dir>/{DEFAULT_MANIFEST_PATH})")
+    parser.add_argument("--revalidar", dest="revalidate", action="store_true", help="Valida además los archivos completos después de escribirlos")
+    parser.add_argument(
+        "--indice-busqueda",
+        dest="search_index",
+        nargs="?",
+        const=DEFAULT_INDEX_PATH,
+        default=None,
+        help=f"Reconstruye también el índice de búsqueda BM25 (por defecto: <output-dir>/{DEFAULT_INDEX_PATH}, o {CORPUS_INDEX_PATH} con --corpus)",
+    )
+    parser.add_argument("--sin-normalizar", dest="normalize", action="store_false", help="Usa el texto tal como lo extrae PyPDF2, sin reparar palabras partidas ni saltos de línea")
+    parser.add_argument("--fragmento-mb", dest="shard_mb", type=float, default=None, help="Divide cada formato en fragmentos de como máximo estos MB (sin comprimir)")
+    parser.add_argument("--fragmento-ejemplos", dest="shard_examples", type=int, default=None, help="Divide cada formato en fragmentos de como máximo estos ejemplos")
+    parser.add_argument("--validacion", dest="validation_articles", type=int, default=0, help="Artículos que se apartan para validación (con todas sus preguntas)")
+    parser.add_argument("--semilla", dest="seed", type=int, default=DEFAULT_SEED, help=f"Semilla de la división entrenamiento/validación (por defecto {DEFAULT_SEED})")
+    add_question_arguments(parser)
+    add_chunking_arguments(parser)
+    add_workers_argument(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    profiler = profiler_from_args(args)
+    if args.questions is not None and args.questions < 1:
+        parser.error("--preguntas debe ser mayor que cero")
+    if args.questions and args.incremental:
+        parser.error("--incremental no admite --preguntas")
+    questions = question_generator_from_args(args)
+    if args.max_tokens is not None and args.incremental:
+        parser.error("--incremental no admite --max-tokens")
+    if args.corpus and args.incremental:
+        parser.error("--incremental no admite --corpus")
+    documents = None
+    if args.corpus:
+        try:
+            documents = load_corpus(args.corpus)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        chunker = chunker_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sharding = None
+    if args.shard_mb or args.shard_examples or args.validation_articles > 0:
+        if args.incremental:
+            parser.error("--incremental no admite salida fragmentada ni división de validación")
+        sharding = ShardingOptions(
+            max_bytes=int(args.shard_mb * 1024 * 1024) if args.shard_mb else None,
+            max_examples=args.shard_examples,
+            validation_articles=max(0, args.validation_articles),
+            seed=args.seed,
+        )
+
+    target_names = [name.strip() for name in args.targets.split(",") if name.strip()]
+    try:
+        emitters = create_emitters(target_names, args.output_dir, EXTENSIONS[args.compression], sharding, questions, corpus=bool(documents))
+    except ValueError as e:
+        parser.error(str(e))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    search_index_path = None
+    if args.search_index:
+        index_name = CORPUS_INDEX_PATH if documents else DEFAULT_INDEX_PATH
+        search_index_path = args.search_index if args.search_index != DEFAULT_INDEX_PATH else os.path.join(args.output_dir, index_name)
+    source_name = f"el corpus {args.corpus} ({len(documents)} documentos)" if documents else args.pdf
+    print(f"Procesando {source_name} para los formatos: {', '.join(target_names)}...")
+
+    if args.incremental:
+        manifest_path = args.manifest or os.path.join(args.output_dir, DEFAULT_MANIFEST_PATH)
+        # En modo incremental se mide cada paso completo
+        with profiler.stage("build_incremental") as record:
+            report = build_incremental(args.pdf, emitters, manifest_path, workers=args.workers, normalize=args.normalize)
+            record.items = report["articles"]
+        print_incremental_report(report)
+        if search_index_path:
+            with profiler.stage("build_search_index") as record:
+                record.items = build_search_index(args.pdf, search_index_path, workers=args.workers, normalize=args.normalize)
+            print(f"  Índice de búsqueda actualizado: {search_index_path}")
+        if args.profile:
+            profiler.finish(args.profile)
+        if report["errors"]:
+            print_validation_errors(report["errors"])
+            raise SystemExit(1)
+        print(f"EXITO: Archivos actualizados. Manifiesto: {manifest_path}")
+        raise SystemExit(0)
+
+    search_index = SearchIndexBuilder() if search_index_path else None
+    if documents:
+        corpus_path = os.path.join(args.output_dir, CORPUS_OUTPUT_PATH)
+        corpus_report = {"corpus": args.corpus}
+        article_count = generate_corpus(
+            documents, emitters, workers=args.workers, search_index=search_index, normalize=args.normalize,
+            report=corpus_report, profiler=profiler, chunker=chunker, corpus_path=corpus_path,
+        )
+        report_path = os.path.join(args.output_dir, CORPUS_REPORT_PATH)
+        write_report(corpus_report, report_path)
+        print_corpus_report(corpus_report)
+        normalization = corpus_report["normalization"]
+        source_path = corpus_path
+        print(f"  Artículos del corpus en {corpus_path} (reporte: {report_path})")
+    else:
+        normalization = {}
+        article_count = generate_datasets(
+            args.pdf, emitters, workers=args.workers, search_index=search_index, normalize=args.normalize,
+            normalization=normalization, profiler=profiler, chunker=chunker,
+        )
+        source_path = args.pdf
+    if not article_count:
+        print("ERROR: No se pudo extraer texto del PDF.")
+        raise SystemExit(1)
+    print_normalization_report(normalization)
+    print(f"  Encontrados {article_count} bloques de artículos")
+    if search_index is not None:
+        with profiler.stage("search_index"):
+            search_index.save(search_index_path, hash_file(source_path))
+        print(f"  Índice de búsqueda guardado en {search_index_path}")
+
+    # Los ejemplos ya se validaron mientras se escribían; --revalidar vuelve a leer los archivos
+    failed = False
+    for emitter in emitters:
+        if emitter.manifest is not None:
+            print(f"[{emitter.name}] {emitter.count} ejemplos")
+            print_shard_manifest(emitter)
+        else:
+            print(f"[{emitter.name}] {emitter.count} ejemplos en {emitter.output_path}")
+        if args.revalidate:
+            with profiler.stage("validate_file") as record:
+                validation = emitter.validate(workers=args.workers)
+                record.items += validation.lines
+        else:
+            validation = emitter.validation
+        if validation.ok:
+            print("  Formato validado correctamente.")
+        else:
+            failed = True
+            print_validation_result(validation)
+
+    if args.profile:
+        profiler.finish(args.profile)
+    if documents and any("error" in entry for entry in corpus_report["documents"]):
+        failed = True
+    if failed:
+        raise SystemExit(1)
+    print("EXITO: Todos los archivos fueron generados y validados.")
+
+
+if __name__ == "__main__":
+    main()
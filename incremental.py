@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+
+from article_index import ArticleIndexBuilder
+from articles import extract_pages_from_pdf, iter_articles
+from jsonl_io import JsonlWriter
+
+# Regeneración incremental: el manifiesto guarda el hash de cada artículo y,
+# para cada formato, el rango de bytes que ocupan sus ejemplos en el JSONL. En
+# la siguiente ejecución los artículos sin cambios se copian tal cual del
+# archivo anterior y solo se generan y validan de nuevo los que cambiaron.
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = "articulos_ley_769.manifest.json"
+
+
+def hash_article(article):
+    """Hash del texto normalizado del artículo (número, título y contenido ya limpios)."""
+    digest = hashlib.sha256()
+    for part in (article.number, article.title, article.content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def keyed_articles(articles):
+    """Asigna a cada artículo una clave estable: número + aparición (para números repetidos o UNKNOWN)."""
+    seen = {}
+    for article in articles:
+        occurrence = seen.get(article.number, 0)
+        seen[article.number] = occurrence + 1
+        yield f"{article.number}#{occurrence}", article
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def _generator_id(emitter):
+    return f"{emitter.name}/{emitter.version}"
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _reusable_target(old_target, emitter):
+    """Indica si el archivo anterior de este formato sigue siendo el que describe el manifiesto."""
+    if not old_target or old_target.get("generator") != _generator_id(emitter):
+        return False
+    if old_target.get("path") != emitter.output_path:
+        return False
+    # Los rangos de bytes solo se pueden copiar de archivos sin comprimir
+    if emitter.output_path.endswith((".gz", ".zst")):
+        return False
+    try:
+        size, mtime_ns = _file_signature(emitter.output_path)
+    except OSError:
+        return False
+    return size == old_target.get("size") and mtime_ns == old_target.get("mtime_ns")
+
+
+def _article_number(key):
+    return key.rsplit("#", 1)[0]
+
+
+def diff_articles(old_entries, new_entries):
+    """Compara dos listas de (clave, hash) y devuelve los números agregados, eliminados y modificados."""
+    old_hashes = dict(old_entries)
+    new_hashes = dict(new_entries)
+    return {
+        "added": [_article_number(key) for key, _ in new_entries if key not in old_hashes],
+        "removed": [_article_number(key) for key, _ in old_entries if key not in new_hashes],
+        "modified": [_article_number(key) for key, h in new_entries if key in old_hashes and old_hashes[key] != h],
+    }
+
+
+def _write_target(emitter, entries, old_manifest, reuse, errors):
+    """Escribe el JSONL de un formato copiando los rangos reutilizables; devuelve sus rangos nuevos."""
+    old_ranges = {}
+    old_file = None
+    if reuse:
+        old_target = old_manifest["targets"][emitter.name]
+        for (key, article_hash), byte_range in zip(
+            ((entry["key"], entry["hash"]) for entry in old_manifest["articles"]), old_target["ranges"]
+        ):
+            old_ranges[key] = (article_hash, byte_range)
+        old_file = open(emitter.output_path, 'rb')
+
+    ranges = []
+    generated = 0
+    index = ArticleIndexBuilder()
+    tmp_path = emitter.output_path + ".tmp"
+    try:
+        with JsonlWriter(tmp_path) as writer:
+            for key, article_hash, article in entries:
+                start = writer.position
+                start_count = writer.count
+                old = old_ranges.get(key)
+                if old and old[0] == article_hash:
+                    offset, length, count = old[1]
+                    old_file.seek(offset)
+                    data = old_file.read(length)
+                    line_offset = start
+                    for line in data.splitlines(keepends=True):
+                        index.add(article.number, line_offset, len(line))
+                        line_offset += len(line)
+                    writer.write_raw(data, count)
+                else:
+                    generated += 1
+                    for example in emitter.examples_for(article):
+                        for error in emitter.validate_example(example):
+                            errors.append(f"[{emitter.name}] Artículo {article.number}: {error}")
+                        line_offset = writer.position
+                        index.add(article.number, line_offset, len(writer.write(example)))
+                ranges.append([start, writer.position - start, writer.count - start_count])
+            count = writer.count
+    finally:
+        if old_file is not None:
+            old_file.close()
+    os.replace(tmp_path, emitter.output_path)
+    if not emitter.output_path.endswith((".gz", ".zst")):
+        index.save(emitter.output_path)
+
+    size, mtime_ns = _file_signature(emitter.output_path)
+    target = {
+        "path": emitter.output_path,
+        "generator": _generator_id(emitter),
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "count": count,
+        "ranges": ranges,
+    }
+    return target, generated
+
+
+def build_incremental(pdf_path, emitters, manifest_path=DEFAULT_MANIFEST_PATH, workers=1, normalize=True):
+    """Regenera los formatos reutilizando los artículos sin cambios según el manifiesto.
+
+    Devuelve un reporte con los números de artículo agregados, eliminados y
+    modificados, cuántos artículos se regeneraron por formato, los errores de
+    validación de los ejemplos nuevos y las reparaciones de la normalización.
+    """
+    normalization = {}
+    pages = extract_pages_from_pdf(pdf_path, workers=workers, normalize=normalize, report=normalization)
+    entries = [(key, hash_article(article), article) for key, article in keyed_articles(iter_articles(pages))]
+    new_article_entries = [(key, article_hash) for key, article_hash, _ in entries]
+
+    old_manifest = load_manifest(manifest_path)
+    old_article_entries = []
+    if old_manifest:
+        old_article_entries = [(entry["key"], entry["hash"]) for entry in old_manifest["articles"]]
+
+    report = diff_articles(old_article_entries, new_article_entries)
+    report.update({
+        "articles": len(entries),
+        "full_build": old_manifest is None,
+        "regenerated": {},
+        "errors": [],
+        "normalization": normalization,
+    })
+
+    targets = dict(old_manifest["targets"]) if old_manifest else {}
+    for emitter in emitters:
+        reuse = old_manifest is not None and _reusable_target(old_manifest["targets"].get(emitter.name), emitter)
+        if reuse and old_article_entries == new_article_entries:
+            # Nada cambió para este formato: no se reescribe el archivo
+            report["regenerated"][emitter.name] = 0
+            continue
+        targets[emitter.name], report["regenerated"][emitter.name] = _write_target(
+            emitter, entries, old_manifest, reuse, report["errors"]
+        )
+
+    # Los formatos que no se pidieron en esta ejecución quedan desalineados con la nueva lista de artículos
+    if old_article_entries != new_article_entries:
+        requested = {emitter.name for emitter in emitters}
+        targets = {name: target for name, target in targets.items() if name in requested}
+
+    save_manifest({
+        "version": MANIFEST_VERSION,
+        "pdf": pdf_path,
+        "articles": [{"key": key, "hash": article_hash} for key, article_hash in new_article_entries],
+        "targets": targets,
+    }, manifest_path)
+    return report
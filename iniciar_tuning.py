@@ -1,7 +1,7 @@
 import os
-import vertexai
-from google.cloud import storage
-from google.api_core import exceptions
+
+from storage import GCSBackend, upload_file
+from tuning_registry import DEFAULT_REGISTRY_PATH, TuningRegistry, VertexTuningBackend, launch_or_reuse, print_job
 
 # ------------------------------------------------------------------
 # ACCIÓN REQUERIDA: Edita la siguiente línea con tu información
@@ -14,6 +14,8 @@ REGION = "us-central1"
 BUCKET_NAME = "bucket-codigo-transito-devpaul-2025"
 LOCAL_JSONL_PATH = "articulos_ley_769_gemini.jsonl"
 MODEL_DISPLAY_NAME = "ley-transito-colombia-v1"
+BASE_MODEL = "gemini-1.0-pro-002"
+HYPERPARAMETERS = {"train_steps": 100}
 # ------------------------------------------------------------------
 
 # Validar que el PROJECT_ID ha sido cambiado
@@ -23,47 +25,24 @@ if "tu-project-id" in PROJECT_ID:
     exit()
 
 def upload_to_gcs(bucket_name, source_file_path, destination_blob_name):
-    """Sube un archivo local a un bucket de GCS, creándolo si no existe."""
-    storage_client = storage.Client(project=PROJECT_ID)
-    
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-        print(f"Bucket '{bucket_name}' ya existe.")
-    except exceptions.NotFound:
-        print(f"Bucket '{bucket_name}' no encontrado. Creándolo en la región {REGION}...")
-        bucket = storage_client.create_bucket(bucket_name, location=REGION)
-        print(f"Bucket '{bucket_name}' creado exitosamente.")
+    """Sube un archivo local a un bucket de GCS (creándolo si no existe); si el archivo no cambió, no se vuelve a subir."""
+    backend = GCSBackend.open(bucket_name, project=PROJECT_ID, location=REGION)
 
-    blob = bucket.blob(destination_blob_name)
-    
     print(f"Subiendo archivo '{source_file_path}' a 'gs://{bucket_name}/{destination_blob_name}'...")
-    blob.upload_from_filename(source_file_path)
-    print("Archivo subido exitosamente.")
-    
-    return f"gs://{bucket_name}/{destination_blob_name}"
+    result = upload_file(backend, source_file_path, destination_blob_name)
+    print("El archivo ya estaba en el bucket sin cambios." if result.skipped else "Archivo subido exitosamente.")
+
+    return result.uri
 
-def tune_gemini_model(project_id, region, training_data_uri, model_display_name):
-    """Inicia un trabajo de fine-tuning para un modelo Gemini."""
-    print(f"Inicializando Vertex AI para el proyecto '{project_id}' en la región '{region}'...")
-    vertexai.init(project=project_id, location=region)
-    
-    base_model = vertexai.generative_models.GenerativeModel("gemini-1.0-pro-002")
-    
-    print(f"Iniciando trabajo de fine-tuning para el modelo '{model_display_name}'...")
-    print(f"Usando datos de entrenamiento: {training_data_uri}")
-    
-    tuning_job = base_model.tune(
-        training_data=training_data_uri,
-        model_display_name=model_display_name,
-        train_steps=100,
-        tuning_job_location="europe-west4",
-        tuned_model_location=region,
-    )
-    
-    print("\n¡Trabajo de fine-tuning iniciado!")
-    print(f"ID del Job: {tuning_job.resource_name}")
+def tune_gemini_model(project_id, region, model_display_name):
+    """Sube el dataset e inicia un trabajo de fine-tuning, salvo que el registro local ya tenga uno para este dataset."""
+    with TuningRegistry(DEFAULT_REGISTRY_PATH) as registry:
+        job, reused = launch_or_reuse(
+            registry, VertexTuningBackend(project_id, region), [LOCAL_JSONL_PATH], BASE_MODEL, HYPERPARAMETERS, model_display_name,
+            lambda: (upload_to_gcs(BUCKET_NAME, LOCAL_JSONL_PATH, LOCAL_JSONL_PATH), None),
+        )
+    print_job(job, reused)
     print(f"Para monitorear el progreso, visita la consola de Vertex AI en tu proyecto.")
 
 if __name__ == "__main__":
-    gcs_uri = upload_to_gcs(BUCKET_NAME, LOCAL_JSONL_PATH, LOCAL_JSONL_PATH)
-    tune_gemini_model(PROJECT_ID, REGION, gcs_uri, MODEL_DISPLAY_NAME)
+    tune_gemini_model(PROJECT_ID, REGION, MODEL_DISPLAY_NAME)
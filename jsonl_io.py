@@ -0,0 +1,161 @@
+import gzip
+import io
+import json
+import mmap
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la librería estándar
+    orjson = None
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # 1 MB por escritura
+MIN_CHUNK_SIZE = 1024 * 1024  # Tamaño mínimo de los bloques que se procesan en paralelo
+
+
+def _dumps_json(obj):
+    # Mismo formato que orjson: sin espacios, sin escapar caracteres no ASCII
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def get_serializer(name=None):
+    """Devuelve una función objeto -> bytes (una línea JSON sin el salto de línea).
+
+    `name` puede ser "orjson", "json" o None (orjson si está instalado). Ambas
+    opciones producen exactamente los mismos bytes para los ejemplos del
+    dataset (cadenas, enteros, listas y diccionarios).
+    """
+    if name is None:
+        name = "orjson" if orjson is not None else "json"
+    if name == "orjson":
+        if orjson is None:
+            raise ValueError("El serializador 'orjson' no está disponible: instala el paquete orjson")
+        return orjson.dumps
+    if name == "json":
+        return _dumps_json
+    raise ValueError(f"Serializador desconocido: '{name}'")
+
+
+def _open_zstd(path, mode):
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("Para leer o escribir archivos .zst instala el paquete zstandard") from None
+    return zstandard.open(path, mode)
+
+
+def open_binary(path, mode):
+    """Abre un archivo en modo binario, comprimiendo según la extensión (.gz o .zst)."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "b")
+    if path.endswith(".zst"):
+        return _open_zstd(path, mode + "b")
+    return open(path, mode + "b")
+
+
+def open_jsonl(path):
+    """Abre un archivo JSONL (comprimido o no) para leerlo como texto línea por línea."""
+    return io.TextIOWrapper(open_binary(path, "r"), encoding="utf-8")
+
+
+def split_chunks(path, chunk_count):
+    """Divide un archivo sin comprimir en rangos de bytes que empiezan y terminan en un salto de línea."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    chunk_size = max(MIN_CHUNK_SIZE, size // chunk_count + 1)
+    bounds = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = mm.find(b"\n", min(start + chunk_size, size) - 1)
+            end = size if end == -1 else end + 1
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def read_chunk_lines(path, start, end):
+    """Devuelve las líneas (bytes, sin el salto de línea) del rango [start, end) leído con mmap."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = mm[start:end].split(b"\n")
+    # El rango termina en un salto de línea, así que el último elemento está vacío
+    if lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+class JsonlWriter:
+    """Escribe objetos como líneas JSONL agrupando las líneas en escrituras grandes.
+
+    El archivo se comprime automáticamente si la ruta termina en .gz o .zst.
+    Se usa como administrador de contexto:
+
+        with JsonlWriter("salida.jsonl.gz") as writer:
+            writer.write_all(ejemplos)
+    """
+
+    def __init__(self, output_path, serializer=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.output_path = output_path
+        self.buffer_size = buffer_size
+        self._dumps = get_serializer(serializer)
+        self._file = open_binary(output_path, "w")
+        self._pending = []
+        self._pending_size = 0
+        self.count = 0
+        # Bytes de JSONL escritos antes de comprimir (coinciden con los offsets del archivo sin comprimir)
+        self.bytes_written = 0
+
+    def write(self, obj):
+        """Serializa un objeto y lo agrega al búfer; devuelve la línea escrita (bytes)."""
+        line = self._dumps(obj) + b"\n"
+        self.write_line(line)
+        return line
+
+    def write_line(self, line):
+        """Agrega al búfer una línea ya serializada (bytes terminados en salto de línea)."""
+        self._pending.append(line)
+        self._pending_size += len(line)
+        self.count += 1
+        if self._pending_size >= self.buffer_size:
+            self.flush()
+
+    def write_raw(self, data, line_count):
+        """Agrega bytes que ya contienen `line_count` líneas JSONL completas (por ejemplo, copiadas de otro archivo)."""
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+            self.count += line_count
+            if self._pending_size >= self.buffer_size:
+                self.flush()
+
+    def write_all(self, objects):
+        """Escribe todos los objetos de un iterable y devuelve cuántos se escribieron."""
+        start = self.count
+        for obj in objects:
+            self.write(obj)
+        return self.count - start
+
+    @property
+    def position(self):
+        """Offset (sin comprimir) donde empezará la próxima línea."""
+        return self.bytes_written + self._pending_size
+
+    def flush(self):
+        if self._pending:
+            self._file.write(b"".join(self._pending))
+            self.bytes_written += self._pending_size
+            self._pending = []
+            self._pending_size = 0
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
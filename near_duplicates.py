@@ -0,0 +1,506 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections import deque
+from functools import lru_cache
+from operator import eq
+
+from dataset_stats import MESSAGE_OVERHEAD_TOKENS, get_token_counter
+from jsonl_io import JsonlWriter, open_binary, read_chunk_lines, split_chunks
+from pdf_extraction import add_workers_argument, resolve_workers
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+# Poda de ejemplos casi duplicados con MinHash y LSH:
+#
+#   1. Cada ejemplo se reduce a los shingles (n-gramas de palabras) de su
+#      pregunta (o, con --campos, de su respuesta o de ambas) y se resume en una
+#      firma MinHash. La fracción de posiciones iguales entre dos firmas estima
+#      su similitud de Jaccard.
+#   2. La firma se divide en bandas; dos ejemplos son candidatos si coinciden en
+#      alguna banda completa (LSH), así no se compara cada par de ejemplos. Con
+#      "pregunta" la clave de cada banda incluye el hash de la respuesta: solo
+#      se agrupan preguntas casi iguales que tienen exactamente la misma
+#      respuesta. La respuesta (el artículo completo) es mucho más larga que la
+#      pregunta y, si se compara, dos ejemplos cualesquiera del mismo artículo
+#      superan el umbral, lo que borraría la variedad de preguntas de --preguntas.
+#   3. Los candidatos cuya similitud estimada supera el umbral se agrupan y de
+#      cada grupo se conservan los primeros `representantes` en orden del archivo.
+#
+# Las firmas se calculan en paralelo por bloques del archivo y se guardan en
+# disco (las bandas en una tabla SQLite temporal y las firmas en un archivo
+# binario), de modo que en memoria solo quedan unos bytes por ejemplo y el
+# dataset puede ser mucho más grande que la RAM.
+#
+#   python near_duplicates.py articulos_ley_769_openai.jsonl --umbral 0.8 --representantes 2
+
+DEFAULT_THRESHOLD = 0.8  # Similitud de Jaccard a partir de la cual dos ejemplos son casi duplicados
+DEFAULT_PERMUTATIONS = 128  # Posiciones de la firma MinHash
+DEFAULT_SHINGLE_SIZE = 3  # Palabras por shingle
+DEFAULT_REPRESENTATIVES = 1  # Ejemplos que se conservan de cada grupo
+DEFAULT_SEED = 769
+DEFAULT_RECALL = 0.99  # Probabilidad de que un par con similitud igual al umbral llegue a compararse
+FIELDS = ("pregunta", "ambos", "respuesta")
+
+SIGNATURE_TYPECODE = 'I'  # Valores de 32 bits
+CHUNK_BYTES = 16 * 1024 * 1024  # Tamaño máximo de cada bloque: acota lo que devuelve cada proceso
+BATCH_SIZE_LINES = 10000  # Líneas por lote en los archivos comprimidos, que no se pueden dividir
+INSERT_BATCH_ROWS = 50000
+SIGNATURE_CACHE_SIZE = 50000  # Textos distintos cuya firma se recuerda (las respuestas se repiten en cada pregunta)
+SHINGLE_CACHE_SIZE = 50000  # Filas de shingles que se recuerdan (~0.5 KB cada una con 128 permutaciones)
+LANE_BITS = 128  # Bits por permutación al calcular una fila con un solo entero: a*h + b < 2^97 no invade el carril siguiente
+
+WORD_PATTERN = re.compile(r'\w+')
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+@lru_cache(maxsize=None)
+def permutations(count, seed=DEFAULT_SEED):
+    """Coeficientes (a, b) de las funciones hash ((a*x + b) mod 2^64) >> 32; los mismos en todos los procesos.
+
+    Con `a` y `b` de 64 bits es la familia multiply-add-shift, 2-independiente
+    para claves de 32 bits como los CRC32 de los shingles.
+    """
+    rng = random.Random(seed)
+    return tuple((rng.getrandbits(64), rng.getrandbits(64)) for _ in range(count))
+
+
+@lru_cache(maxsize=None)
+def packed_permutations(count, seed=DEFAULT_SEED):
+    """Los coeficientes `a` y `b` de todas las permutaciones empaquetados en dos enteros, uno por carril de LANE_BITS."""
+    perms = permutations(count, seed)
+    return (sum(a << (LANE_BITS * i) for i, (a, _) in enumerate(perms)),
+            sum(b << (LANE_BITS * i) for i, (_, b) in enumerate(perms)))
+
+
+def choose_bands(threshold, permutations_count, recall=DEFAULT_RECALL):
+    """Elige (bandas, filas) para que un par con similitud `threshold` sea candidato con probabilidad >= `recall`.
+
+    La probabilidad de que dos firmas con similitud s coincidan en alguna banda
+    es 1 - (1 - s^filas)^bandas. Entre las opciones que alcanzan `recall` se
+    prefiere la de más filas, que genera menos candidatos que luego se descartan
+    al comparar las firmas.
+    """
+    best = (1, permutations_count)
+    for rows in range(1, permutations_count + 1):
+        bands = permutations_count // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+def shingles(text, size=DEFAULT_SHINGLE_SIZE):
+    """Hashes (CRC32) de los n-gramas de palabras del texto en minúsculas."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Calcula firmas MinHash de textos recordando las firmas de textos y las filas de shingles ya vistos.
+
+    La fila de un shingle (su hash en cada permutación) se calcula con una sola
+    multiplicación de enteros grandes: cada permutación ocupa un carril de
+    LANE_BITS bits y los bits 32-63 de cada carril son el hash. La firma de un
+    texto es el mínimo posición a posición de las filas de sus shingles. Las
+    preguntas de plantillas y el texto legal repiten muchos shingles, así que
+    buena parte de las filas sale de la caché.
+    """
+
+    def __init__(self, permutations_count=DEFAULT_PERMUTATIONS, seed=DEFAULT_SEED, shingle_size=DEFAULT_SHINGLE_SIZE):
+        self.packed_a, self.packed_b = packed_permutations(permutations_count, seed)
+        self.row_bytes = permutations_count * LANE_BITS // 8
+        self.shingle_size = shingle_size
+        self.empty = array(SIGNATURE_TYPECODE, [0] * permutations_count)
+        self._rows = {}
+        self._signatures = {}
+
+    def _row(self, shingle_hash):
+        row = self._rows.get(shingle_hash)
+        if row is None:
+            if len(self._rows) >= SHINGLE_CACHE_SIZE:
+                self._rows.clear()
+            words = array(SIGNATURE_TYPECODE, (shingle_hash * self.packed_a + self.packed_b).to_bytes(self.row_bytes, "little"))
+            if sys.byteorder == "big":
+                words.byteswap()
+            # Palabra 1 de cada carril de 4 palabras de 32 bits: ((a*h + b) mod 2^64) >> 32
+            row = self._rows[shingle_hash] = words[1::LANE_BITS // 32]
+        return row
+
+    def signature(self, text):
+        """Firma del texto; un texto sin palabras da una firma de ceros."""
+        signature = self._signatures.get(text)
+        if signature is None:
+            hashes = shingles(text, self.shingle_size)
+            if len(hashes) > 1:
+                signature = array(SIGNATURE_TYPECODE, map(min, *[self._row(h) for h in hashes]))
+            else:
+                signature = self._row(hashes.pop()) if hashes else self.empty
+            if len(self._signatures) >= SIGNATURE_CACHE_SIZE:
+                self._signatures.clear()
+            self._signatures[text] = signature
+        return signature
+
+    def combine(self, texts):
+        """Firma de la unión de los shingles de varios textos: el mínimo posición a posición de sus firmas."""
+        signatures = [self.signature(text) for text in texts]
+        if len(signatures) == 1:
+            return signatures[0]
+        return array(SIGNATURE_TYPECODE, map(min, *signatures)) if signatures else self.empty
+
+
+ROLES = {"ambos": ("user", "assistant", "model"), "pregunta": ("user",), "respuesta": ("assistant", "model")}
+
+
+def example_texts(data, fields="pregunta"):
+    """Textos de un ejemplo que se comparan: preguntas y/o respuestas (sin el prompt de sistema)."""
+    if "text" in data:
+        return [data["text"]]
+    roles = ROLES[fields]
+    return [message.get("content") or "" for message in data.get("messages", []) if message.get("role") in roles]
+
+
+def answer_key(data, fields="pregunta"):
+    """Hash de las respuestas del ejemplo si solo se comparan las preguntas (0 en otro caso): separa los cubos LSH por respuesta."""
+    if fields != "pregunta" or "text" in data:
+        return 0
+    answers = "\x00".join(example_texts(data, "respuesta"))
+    return int.from_bytes(hashlib.blake2b(answers.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def example_tokens(data, count_tokens, cache):
+    """Tokens de todo el ejemplo, contados igual que dataset_stats.py; `cache` recuerda los conteos por texto."""
+    contents = [data["text"]] if "text" in data else [message.get("content") or "" for message in data.get("messages", [])]
+    missing = [text for text in set(contents) if text not in cache]
+    if missing:
+        if len(cache) + len(missing) > SIGNATURE_CACHE_SIZE:
+            cache.clear()
+        cache.update(zip(missing, count_tokens(missing)))
+    tokens = sum(cache[text] for text in contents)
+    return tokens if "text" in data else tokens + len(contents) * MESSAGE_OVERHEAD_TOKENS
+
+
+class SignatureBatch:
+    """Firmas, tokens y claves de banda de un lote de líneas; se envía del proceso de trabajo al principal."""
+
+    def __init__(self):
+        self.count = 0
+        self.signatures = array(SIGNATURE_TYPECODE)
+        self.tokens = array('q')
+        self.band_keys = array('q')
+        self.band_examples = array('q')  # Índice (dentro del lote) del ejemplo de cada clave de banda
+
+
+def compute_signatures(lines, options):
+    """Calcula las firmas de las líneas no vacías; las líneas que no son JSON válido no se agrupan."""
+    permutations_count, seed, bands, rows, shingle_size, fields, tokenizer = options
+    hasher = MinHasher(permutations_count, seed, shingle_size)
+    count_tokens = get_token_counter(tokenizer)
+    token_cache = {}
+    batch = SignatureBatch()
+    for line in lines:
+        if not line.strip():
+            continue
+        index = batch.count
+        batch.count += 1
+        try:
+            data = _loads(line)
+            texts = example_texts(data, fields)
+            answer = answer_key(data, fields)
+        except (ValueError, AttributeError, TypeError):
+            batch.signatures.extend(hasher.empty)
+            batch.tokens.append(0)
+            continue
+        batch.tokens.append(example_tokens(data, count_tokens, token_cache))
+        signature = hasher.combine(texts)
+        batch.signatures.extend(signature)
+        if signature == hasher.empty:
+            continue
+        for band in range(bands):
+            batch.band_keys.append(hash((band, answer) + tuple(signature[band * rows:(band + 1) * rows])))
+            batch.band_examples.append(index)
+    return batch
+
+
+def _signatures_for_chunk(path, start, end, options):
+    return compute_signatures(read_chunk_lines(path, start, end), options)
+
+
+def _iter_line_batches(path):
+    with open_binary(path, "r") as f:
+        batch = []
+        for line in f:
+            batch.append(line)
+            if len(batch) >= BATCH_SIZE_LINES:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def iter_signature_batches(path, options, workers=1):
+    """Genera los SignatureBatch del archivo en orden.
+
+    Los archivos sin comprimir se dividen en bloques que se procesan en
+    paralelo; como mucho hay 2 bloques por proceso en vuelo para que la memoria
+    no crezca si el proceso principal se atrasa.
+    """
+    if path.endswith((".gz", ".zst")):
+        for lines in _iter_line_batches(path):
+            yield compute_signatures(lines, options)
+        return
+    chunk_count = max(workers * 4, os.path.getsize(path) // CHUNK_BYTES + 1)
+    chunks = split_chunks(path, chunk_count)
+    if workers == 1:
+        for start, end in chunks:
+            yield _signatures_for_chunk(path, start, end, options)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        chunks = iter(chunks)
+        for start, end in chunks:
+            pending.append(executor.submit(_signatures_for_chunk, path, start, end, options))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            batch = pending.popleft().result()
+            for start, end in chunks:
+                pending.append(executor.submit(_signatures_for_chunk, path, start, end, options))
+                break
+            yield batch
+
+
+class DisjointSet:
+    """Union-find sobre índices de ejemplos; la raíz de cada grupo es su primer ejemplo en el archivo."""
+
+    def __init__(self, size):
+        self.parent = array('q', range(size))
+
+    def find(self, index):
+        parent = self.parent
+        root = index
+        while parent[root] != root:
+            root = parent[root]
+        while parent[index] != root:
+            parent[index], index = root, parent[index]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+        return first != second
+
+
+def similarity(first, second):
+    """Similitud de Jaccard estimada: fracción de posiciones iguales de dos firmas."""
+    return sum(map(eq, first, second)) / len(first)
+
+
+def find_clusters(path, threshold=DEFAULT_THRESHOLD, permutations_count=DEFAULT_PERMUTATIONS, shingle_size=DEFAULT_SHINGLE_SIZE,
+                  fields="pregunta", tokenizer="aproximado", seed=DEFAULT_SEED, workers=1, temp_dir=None):
+    """Primera pasada: devuelve (DisjointSet, tokens por ejemplo, estadísticas) de las líneas no vacías."""
+    workers = resolve_workers(workers)
+    bands, rows = choose_bands(threshold, permutations_count)
+    options = (permutations_count, seed, bands, rows, shingle_size, fields, tokenizer)
+    signature_size = permutations_count * array(SIGNATURE_TYPECODE).itemsize
+    tokens = array('q')
+    stats = {"bands": bands, "rows": rows, "candidate_pairs": 0, "merged_pairs": 0}
+
+    with tempfile.TemporaryDirectory(dir=temp_dir, prefix="near_duplicates_") as work_dir:
+        connection = sqlite3.connect(os.path.join(work_dir, "bands.sqlite"))
+        connection.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; "
+                                 "CREATE TABLE bands (band_key INTEGER NOT NULL, example INTEGER NOT NULL);")
+        signatures_path = os.path.join(work_dir, "signatures.bin")
+        with open(signatures_path, "wb") as signatures_file:
+            for batch in iter_signature_batches(path, options, workers):
+                offset = len(tokens)
+                tokens.extend(batch.tokens)
+                batch.signatures.tofile(signatures_file)
+                for start in range(0, len(batch.band_keys), INSERT_BATCH_ROWS):
+                    connection.executemany("INSERT INTO bands VALUES (?, ?)", zip(
+                        batch.band_keys[start:start + INSERT_BATCH_ROWS],
+                        (offset + index for index in batch.band_examples[start:start + INSERT_BATCH_ROWS]),
+                    ))
+                connection.commit()
+
+        clusters = DisjointSet(len(tokens))
+        if not tokens:
+            connection.close()
+            return clusters, tokens, stats
+        with open(signatures_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            def signature(index):
+                return array(SIGNATURE_TYPECODE, mm[index * signature_size:(index + 1) * signature_size])
+
+            # SQLite ordena en disco; solo se recorren los cubos con más de un ejemplo
+            current_key, first, first_signature = None, None, None
+            for band_key, example in connection.execute("SELECT band_key, example FROM bands ORDER BY band_key, example"):
+                if band_key != current_key:
+                    current_key, first, first_signature = band_key, example, None
+                    continue
+                if clusters.find(example) == clusters.find(first):
+                    continue
+                stats["candidate_pairs"] += 1
+                if first_signature is None:
+                    first_signature = signature(first)
+                if similarity(first_signature, signature(example)) >= threshold:
+                    clusters.union(first, example)
+                    stats["merged_pairs"] += 1
+        connection.close()
+    return clusters, tokens, stats
+
+
+def deduplicate(path, output_path, threshold=DEFAULT_THRESHOLD, representatives=DEFAULT_REPRESENTATIVES,
+                permutations_count=DEFAULT_PERMUTATIONS, shingle_size=DEFAULT_SHINGLE_SIZE, fields="pregunta",
+                tokenizer="aproximado", seed=DEFAULT_SEED, workers=1, removed_path=None):
+    """Escribe en `output_path` el dataset sin los casi duplicados y devuelve el reporte.
+
+    Segunda pasada: copia las líneas tal cual, conservando los primeros
+    `representatives` ejemplos de cada grupo.
+    """
+    if representatives < 1:
+        raise ValueError("Se debe conservar al menos un representante por grupo")
+    if not 0 < threshold <= 1:
+        raise ValueError("El umbral debe estar entre 0 y 1")
+    started = time.perf_counter()
+    clusters, tokens, stats = find_clusters(path, threshold, permutations_count, shingle_size, fields, tokenizer, seed, workers,
+                                            temp_dir=os.path.dirname(os.path.abspath(output_path)))
+
+    # Tamaño de los grupos con más de un ejemplo, indexado por su raíz
+    sizes = {}
+    removed_tokens = 0
+    removed_writer = JsonlWriter(removed_path) if removed_path else None
+    try:
+        with JsonlWriter(output_path) as writer, open_binary(path, "r") as f:
+            index = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                root = clusters.find(index)
+                if root != index:
+                    sizes[root] = sizes.get(root, 1) + 1
+                    if sizes[root] > representatives:
+                        removed_tokens += tokens[index]
+                        if removed_writer is not None:
+                            removed_writer.write_line(line)
+                        index += 1
+                        continue
+                writer.write_line(line)
+                index += 1
+            kept = writer.count
+    finally:
+        if removed_writer is not None:
+            removed_writer.close()
+
+    examples = len(tokens)
+    total_tokens = sum(tokens)
+    return {
+        "dataset": path,
+        "output": output_path,
+        "threshold": threshold,
+        "representatives": representatives,
+        "fields": fields,
+        "tokenizer": tokenizer,
+        "minhash": {"permutations": permutations_count, "bands": stats["bands"], "rows": stats["rows"],
+                    "shingle_size": shingle_size, "seed": seed},
+        "examples": examples,
+        "kept": kept,
+        "removed": examples - kept,
+        "clusters": len(sizes),
+        "largest_cluster": max(sizes.values(), default=1 if examples else 0),
+        "candidate_pairs": stats["candidate_pairs"],
+        "tokens": {
+            "total": total_tokens,
+            "removed": removed_tokens,
+            "kept": total_tokens - removed_tokens,
+            "removed_fraction": round(removed_tokens / total_tokens, 4) if total_tokens else 0,
+        },
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _split_extension(path):
+    for extension in (".jsonl.gz", ".jsonl.zst", ".jsonl"):
+        if path.endswith(extension):
+            return path[:-len(extension)], extension
+    return path, ".jsonl"
+
+
+def output_path_for(dataset_path):
+    base, extension = _split_extension(dataset_path)
+    return f"{base}.dedup{extension}"
+
+
+def report_path_for(output_path):
+    return _split_extension(output_path)[0] + ".report.json"
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Elimina ejemplos casi duplicados de un dataset JSONL (MinHash + LSH).")
+    parser.add_argument("dataset", help="Archivo JSONL (.jsonl, .jsonl.gz o .jsonl.zst)")
+    parser.add_argument("--salida", default=None, help="JSONL sin duplicados (por defecto <dataset>.dedup.jsonl)")
+    parser.add_argument("--umbral", type=float, default=DEFAULT_THRESHOLD, help="Similitud de Jaccard mínima para considerar dos ejemplos casi duplicados")
+    parser.add_argument("--representantes", type=int, default=DEFAULT_REPRESENTATIVES, help="Ejemplos que se conservan de cada grupo")
+    parser.add_argument("--campos", choices=FIELDS, default="pregunta", help="Texto que se compara: la pregunta entre ejemplos con la misma respuesta (por defecto), pregunta y respuesta, o solo la respuesta")
+    parser.add_argument("--permutaciones", type=int, default=DEFAULT_PERMUTATIONS, help="Tamaño de la firma MinHash")
+    parser.add_argument("--shingle", type=int, default=DEFAULT_SHINGLE_SIZE, help="Palabras por shingle")
+    parser.add_argument("--semilla", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--tokenizer", choices=["aproximado", "tiktoken"], default="aproximado", help="Tokenizador para contar los tokens eliminados")
+    parser.add_argument("--eliminados", default=None, help="Guarda también los ejemplos eliminados en este JSONL")
+    parser.add_argument("--reporte", default=None, help="Ruta del reporte JSON (por defecto <salida>.report.json)")
+    add_workers_argument(parser, help="Procesos para calcular las firmas en paralelo")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.dataset):
+        parser.error(f"No existe el archivo {args.dataset}")
+    if args.permutaciones < 1 or args.shingle < 1:
+        parser.error("--permutaciones y --shingle deben ser positivos")
+    try:
+        get_token_counter(args.tokenizer)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output_path = args.salida or output_path_for(args.dataset)
+    print(f"Buscando casi duplicados en {args.dataset} (umbral {args.umbral})...")
+    try:
+        report = deduplicate(args.dataset, output_path, args.umbral, args.representantes, args.permutaciones, args.shingle,
+                             args.campos, args.tokenizer, args.semilla, args.workers, args.eliminados)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report_path = args.reporte or report_path_for(output_path)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    tokens = report["tokens"]
+    minhash_info = report["minhash"]
+    print(f"  Firmas de {minhash_info['permutations']} posiciones en {minhash_info['bands']} bandas de {minhash_info['rows']} filas")
+    print(f"  Ejemplos: {report['examples']}, conservados {report['kept']}, eliminados {report['removed']} "
+          f"({report['clusters']} grupos, el mayor con {report['largest_cluster']} ejemplos)")
+    print(f"  Tokens ({args.tokenizer}) eliminados: {tokens['removed']} de {tokens['total']} ({tokens['removed_fraction']:.1%})")
+    print(f"Dataset sin duplicados guardado en {output_path}")
+    print(f"Reporte guardado en {report_path}")
+
+
+if __name__ == "__main__":
+    main()
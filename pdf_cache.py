@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import time
+
+# Versión del extractor: cambia si cambia PyPDF2 o la forma en que extraemos el texto.
+# Cualquier cambio invalida automáticamente las entradas anteriores de la caché.
+EXTRACTION_FORMAT = 1
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "pdf_text")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+
+def get_extractor_version():
+    """Devuelve la versión del extractor sin importar PyPDF2 (importarlo es lento)."""
+    # importlib.metadata también es lento de importar y solo se necesita al consultar la caché
+    from importlib import metadata
+
+    try:
+        pypdf2_version = metadata.version("PyPDF2")
+    except metadata.PackageNotFoundError:
+        pypdf2_version = "desconocida"
+    return f"PyPDF2-{pypdf2_version}/formato-{EXTRACTION_FORMAT}"
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfTextCache:
+    """Caché en disco del texto extraído por página, indexada por el SHA-256 del PDF.
+
+    Cada PDF se guarda en un archivo JSON cuyo nombre combina el hash del PDF y
+    el de la versión del extractor. Al superar `max_bytes` se eliminan las
+    entradas usadas hace más tiempo (LRU según la fecha de modificación, que se
+    actualiza en cada lectura).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, extractor_version=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extractor_version = extractor_version or get_extractor_version()
+        self._version_digest = hashlib.sha256(self.extractor_version.encode("utf-8")).hexdigest()[:12]
+
+    def _entry_path(self, pdf_hash):
+        return os.path.join(self.cache_dir, f"{pdf_hash}-{self._version_digest}.json")
+
+    def get(self, pdf_hash):
+        """Devuelve la lista de textos por página, o None si no está en caché."""
+        path = self._entry_path(pdf_hash)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("sha256") != pdf_hash or entry.get("extractor") != self.extractor_version:
+            return None
+
+        # Marcar la entrada como usada recientemente para la política LRU
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry["pages"]
+
+    def put(self, pdf_hash, pages):
+        """Guarda los textos por página de forma atómica y aplica el límite de tamaño."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(pdf_hash)
+        entry = {
+            "sha256": pdf_hash,
+            "extractor": self.extractor_version,
+            "created": time.time(),
+            "pages": pages,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Elimina las entradas menos usadas hasta quedar por debajo de `max_bytes`."""
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,92 @@
+import os
+
+from pdf_cache import PdfTextCache, hash_file
+
+
+def _extract_page_range(pdf_path, start=0, end=None):
+    """Extrae el texto de las páginas [start, end) abriendo un PdfReader propio (sin `end`, hasta la última)."""
+    # Se importa aquí para no pagar el costo de PyPDF2 cuando el texto ya está en caché
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    if end is None:
+        end = len(reader.pages)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def count_pdf_pages(pdf_path):
+    """Devuelve el número de páginas del PDF."""
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+
+def resolve_workers(workers):
+    """Convierte el valor de --workers en un número de procesos (0 = todos los núcleos)."""
+    if workers is None or workers < 0:
+        return 1
+    if workers == 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def read_pdf_pages(pdf_path, workers=1):
+    """Extrae con PyPDF2 el texto de cada página del PDF (sin caché).
+
+    Con `workers` > 1 el rango de páginas se reparte en bloques contiguos entre
+    un pool de procesos; cada proceso abre su propio PdfReader y los bloques se
+    recombinan en orden, por lo que el resultado es idéntico al modo serial.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        # Un solo PdfReader cuenta y extrae las páginas: el PDF se analiza una vez
+        return _extract_page_range(pdf_path)
+
+    num_pages = count_pdf_pages(pdf_path)
+    if num_pages == 0:
+        return []
+    workers = min(workers, num_pages)
+
+    # Varios bloques por proceso para equilibrar páginas de distinto costo
+    chunk_count = min(num_pages, workers * 4)
+    bounds = [num_pages * i // chunk_count for i in range(chunk_count + 1)]
+    starts = bounds[:-1]
+    ends = bounds[1:]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    pages = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in executor.map(_extract_page_range, [pdf_path] * chunk_count, starts, ends):
+            pages.extend(chunk)
+    return pages
+
+
+def extract_pages(pdf_path, use_cache=True, cache=None, workers=1):
+    """Devuelve el texto de cada página del PDF, usando la caché en disco si es posible."""
+    if not use_cache:
+        return read_pdf_pages(pdf_path, workers=workers)
+
+    cache = cache or PdfTextCache()
+    pdf_hash = hash_file(pdf_path)
+
+    pages = cache.get(pdf_hash)
+    if pages is not None:
+        return pages
+
+    pages = read_pdf_pages(pdf_path, workers=workers)
+    try:
+        cache.put(pdf_hash, pages)
+    except OSError as e:
+        print(f"Aviso: no se pudo guardar el texto en caché: {e}")
+    return pages
+
+
+def add_workers_argument(parser, help="Procesos para extraer el texto del PDF en paralelo"):
+    """Agrega la opción --workers común a los scripts."""
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=f"{help} (0 = todos los núcleos, por defecto 1)",
+    )
@@ -1,98 +1,35 @@
+import argparse
 import json
-from PyPDF2 import PdfReader
-import re
+from articles import extract_pages_from_pdf, iter_articles
+from emitters import OpenAIEmitter
+from jsonl_io import JsonlWriter, open_jsonl
+from pdf_extraction import add_workers_argument
+from profiling import add_profile_arguments, profiler_from_args
+from streaming import CountedIterator
 
-# Paso 1: Extraer texto del PDF
-def extract_text_from_pdf(pdf_path):
-    try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text
-    except Exception as e:
-        print(f"Error al leer el PDF: {e}")
-        return ""
-
-# Paso 2: Dividir en bloques (ej: por artículo)
-def split_by_articles(full_text):
-    # Expresión regular para encontrar "ARTICULO" o "ARTÍCULO" seguido de números y un punto.
-    articles = re.split(r'(?=ART[IÍ]CULO\s+\d+[°º.]?)', full_text, flags=re.IGNORECASE)
-    return [article.strip() for article in articles if article and article.strip()]
-
-# Paso 3: Extraer número y título del artículo
-def extract_article_info(article_text):
-    lines = article_text.split('\n')
-    first_line = lines[0].strip() if lines else ""
-
-    match = re.search(r'ART[IÍ]CULO\s+(\d+)[°º.]?\s*[.-]?\s*(.*)', first_line, re.IGNORECASE)
-    if match:
-        number = match.group(1)
-        title = match.group(2).strip().rstrip('.')
-        if not title and len(lines) > 1:
-            title = lines[1].strip()
-        return number, title if title else "Sin título"
-        
-    return "UNKNOWN", "Sin título"
-
-# Paso 4: Generar preguntas variadas sobre el artículo
-def generate_questions_for_article(article_number, article_title):
-    if article_number == "UNKNOWN":
-        return []
-        
-    questions = [
-        f"¿Qué establece el artículo {article_number} del Código Nacional de Tránsito?",
-        f"Explícame el contenido del artículo {article_number}.",
-        f"¿Cuál es el contenido del artículo {article_number} sobre {article_title.lower()}?",
-        f"Artículo {article_number}: {article_title}",
-        f"¿Qué dice la ley de tránsito en el artículo {article_number}?",
-        f"Necesito información sobre el artículo {article_number} del código de tránsito."
-    ]
-    return questions
+# Paso 1: Extraer el texto de cada página del PDF (normalizado, ver text_normalization.py)
+# Paso 2: Dividir en artículos con el árbol del documento (ver document_parser.py):
+# solo los encabezados ARTÍCULO/ARTICULO al inicio de una línea abren un artículo,
+# y las referencias dentro del texto ("artículo 24 de la Constitución") no abren uno
+# Paso 3 y 4: Número, título y preguntas de cada artículo (ver articles.py)
 
 # Paso 5: Crear ejemplos de entrenamiento en formato OpenAI
 def create_training_examples_for_openai(articles):
-    training_examples = []
-    # El mensaje del sistema se incluye en cada ejemplo para el formato de chat de OpenAI
-    system_message = "Eres un asistente experto en el Código Nacional de Tránsito de Colombia (Ley 769 de 2002). Proporciona información precisa y detallada sobre los artículos del código cuando se te consulte."
-
+    # Mismos ejemplos que el emisor "openai" de generate_datasets.py; el preámbulo no genera preguntas
+    emitter = OpenAIEmitter()
     for article in articles:
-        if not article.strip():
-            continue
-            
-        article_number, article_title = extract_article_info(article)
-        
-        if article_number == "UNKNOWN":
-            continue
-
-        clean_content = article.strip()
-        questions = generate_questions_for_article(article_number, article_title)
-        
-        for question in questions:
-            # Formato específico para OpenAI con roles: system, user, assistant
-            training_example = {
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": question},
-                    {"role": "assistant", "content": clean_content}
-                ]
-            }
-            training_examples.append(training_example)
-            
-    return training_examples
+        yield from emitter.examples_for(article)
 
 # Paso 6: Guardar en formato JSONL
 def save_to_jsonl(training_examples, output_path):
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for example in training_examples:
-            f.write(json.dumps(example, ensure_ascii=False) + "\n")
+    # La extensión define la compresión: .jsonl, .jsonl.gz o .jsonl.zst
+    with JsonlWriter(output_path) as writer:
+        return writer.write_all(training_examples)
 
 # Paso 7: Validar formato del archivo JSONL para OpenAI
 def validate_jsonl_format_for_openai(file_path):
     errors = []
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open_jsonl(file_path) as f:
         for line_num, line in enumerate(f, 1):
             try:
                 data = json.loads(line.strip())
@@ -121,26 +58,39 @@ def validate_jsonl_format_for_openai(file_path):
 
 # Ejecutar el proceso
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el dataset de fine-tuning de OpenAI a partir del PDF de la Ley 769 de 2002.")
+    add_workers_argument(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--output", default="articulos_ley_769_openai.jsonl", help="Archivo de salida (.jsonl, .jsonl.gz o .jsonl.zst)")
+    args = parser.parse_args()
+    profiler = profiler_from_args(args)
+
     pdf_path = "ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf" 
-    output_path = "articulos_ley_769_openai.jsonl"
+    output_path = args.output
     
     print("Extrayendo texto del PDF...")
-    full_text = extract_text_from_pdf(pdf_path)
+    with profiler.stage("extract_pages_from_pdf") as record:
+        pages = extract_pages_from_pdf(pdf_path, workers=args.workers)
+        record.items = len(pages)
     
-    if full_text:
+    if pages:
         print("Dividiendo por artículos...")
-        articles = split_by_articles(full_text)
-        print(f"  Encontrados {len(articles)} bloques de artículos")
+        articles = CountedIterator(profiler.iterate("iter_articles", iter_articles(pages)))
         
         print("Creando ejemplos de entrenamiento para OpenAI...")
-        training_examples = create_training_examples_for_openai(articles)
-        print(f"  Generados {len(training_examples)} ejemplos de entrenamiento")
+        training_examples = profiler.iterate("create_training_examples_for_openai", create_training_examples_for_openai(articles))
         
         print(f"Guardando ejemplos en {output_path}...")
-        save_to_jsonl(training_examples, output_path)
+        with profiler.stage("save_to_jsonl") as record:
+            example_count = save_to_jsonl(training_examples, output_path)
+            record.items = example_count
+        print(f"  Encontrados {articles.count} bloques de artículos")
+        print(f"  Generados {example_count} ejemplos de entrenamiento")
         
         print("Validando formato del archivo para OpenAI...")
-        validation_errors = validate_jsonl_format_for_openai(output_path)
+        with profiler.stage("validate_jsonl_format_for_openai") as record:
+            validation_errors = validate_jsonl_format_for_openai(output_path)
+            record.items = example_count
         
         if validation_errors:
             print("ERROR: Se encontraron errores de formato:")
@@ -150,6 +100,9 @@ if __name__ == "__main__":
                 print(f"  ... y {len(validation_errors) - 10} errores más")
         else:
             print("EXITO: Archivo JSONL generado y validado exitosamente para fine-tuning de OpenAI.")
-            print(f"  Total de ejemplos: {len(training_examples)}")
+            print(f"  Total de ejemplos: {example_count}")
             print(f"  Archivo: {output_path}")
             print("\nEl archivo está listo para subirse a la plataforma de OpenAI.")
+
+    if args.profile:
+        profiler.finish(args.profile)
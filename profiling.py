@@ -0,0 +1,200 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Perfilado por etapa para los scripts generadores (opción --profile). Cada
+# etapa acumula tiempo real y de CPU, elementos procesados y el pico de memoria
+# de tracemalloc mientras estuvo activa.
+#
+# Las etapas de los scripts se encadenan como generadores, así que el trabajo de
+# una etapa ocurre dentro del `next()` de la siguiente. Los tiempos que se
+# reportan son exclusivos: al entrar en una etapa anidada se descuenta su tiempo
+# de la etapa que la consume. El pico de memoria sí incluye a las etapas
+# anidadas, porque sus objetos viven mientras la etapa externa los usa.
+
+DEFAULT_REPORT_PATH = "profile_report.json"
+
+
+class StageRecord:
+    __slots__ = ("name", "wall_s", "cpu_s", "items", "calls", "peak_bytes")
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.items = 0
+        self.calls = 0
+        self.peak_bytes = 0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "items": self.items,
+            "items_per_s": round(self.items / self.wall_s, 1) if self.wall_s and self.items else None,
+            "peak_mb": round(self.peak_bytes / (1024 * 1024), 3),
+            "calls": self.calls,
+        }
+
+
+class StageProfiler:
+    """Mide las etapas de un script; deshabilitado no agrega ningún costo.
+
+        profiler = StageProfiler()
+        with profiler.stage("extraccion") as record:
+            pages = extract_pages(pdf_path)
+            record.items = len(pages)
+        articles = profiler.iterate("division", split_by_articles(pages))
+    """
+
+    def __init__(self, enabled=True, cprofile_stage=None, cprofile_path=None):
+        self.enabled = enabled
+        self.records = {}
+        self._stack = []  # (registro, inicio real, inicio CPU)
+        self._started = None
+        self._cprofile_stage = cprofile_stage
+        self._cprofile_path = cprofile_path or (f"profile_{cprofile_stage}.prof" if cprofile_stage else None)
+        self._cprofile = cProfile.Profile() if enabled and cprofile_stage else None
+        self._cprofile_depth = 0
+
+    def start(self):
+        if self.enabled and self._started is None:
+            self._started = (time.perf_counter(), time.process_time())
+            tracemalloc.start()
+
+    def _record(self, name):
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = StageRecord(name)
+        return record
+
+    def _sample_peak(self):
+        # El pico desde el último evento pertenece a todas las etapas activas
+        peak = tracemalloc.get_traced_memory()[1]
+        for record, _, _ in self._stack:
+            if peak > record.peak_bytes:
+                record.peak_bytes = peak
+        tracemalloc.reset_peak()
+
+    def _enter(self, record):
+        now = (time.perf_counter(), time.process_time())
+        if self._stack:
+            # Se cierra el tramo de la etapa externa para no contar dos veces este tiempo
+            outer, wall_start, cpu_start = self._stack[-1]
+            outer.wall_s += now[0] - wall_start
+            outer.cpu_s += now[1] - cpu_start
+        self._sample_peak()
+        self._stack.append((record, now[0], now[1]))
+        record.calls += 1
+        if self._cprofile is not None and record.name == self._cprofile_stage:
+            if self._cprofile_depth == 0:
+                self._cprofile.enable()
+            self._cprofile_depth += 1
+
+    def _exit(self):
+        if self._cprofile is not None and self._stack[-1][0].name == self._cprofile_stage:
+            self._cprofile_depth -= 1
+            if self._cprofile_depth == 0:
+                self._cprofile.disable()
+        self._sample_peak()
+        record, wall_start, cpu_start = self._stack.pop()
+        now = (time.perf_counter(), time.process_time())
+        record.wall_s += now[0] - wall_start
+        record.cpu_s += now[1] - cpu_start
+        if self._stack:
+            # La etapa externa retoma su tramo desde ahora
+            outer = self._stack[-1][0]
+            self._stack[-1] = (outer, now[0], now[1])
+
+    @contextmanager
+    def stage(self, name):
+        """Mide un bloque de código; se puede asignar `record.items` dentro del bloque."""
+        record = self._record(name)
+        if not self.enabled:
+            yield record
+            return
+        self.start()
+        self._enter(record)
+        try:
+            yield record
+        finally:
+            self._exit()
+
+    def iterate(self, name, iterable):
+        """Envuelve un generador: el tiempo de cada `next()` se asigna a la etapa y se cuentan los elementos."""
+        if not self.enabled:
+            return iterable
+        return self._iterate(self._record(name), iter(iterable))
+
+    def _iterate(self, record, iterator):
+        self.start()
+        while True:
+            self._enter(record)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            record.items += 1
+            yield item
+
+    def report(self):
+        """Devuelve el reporte como diccionario (etapas en orden de aparición)."""
+        if self._started is None:
+            return {"stages": [], "total_wall_s": 0.0, "total_cpu_s": 0.0, "peak_mb": 0.0}
+        return {
+            "stages": [record.to_dict() for record in self.records.values()],
+            "total_wall_s": round(time.perf_counter() - self._started[0], 6),
+            "total_cpu_s": round(time.process_time() - self._started[1], 6),
+            "peak_mb": round(max((record.peak_bytes for record in self.records.values()), default=0) / (1024 * 1024), 3),
+            "cprofile": self._cprofile_path if self._cprofile is not None else None,
+        }
+
+    def finish(self, report_path=DEFAULT_REPORT_PATH):
+        """Detiene tracemalloc, escribe el reporte JSON (y el volcado de cProfile) e imprime el resumen."""
+        if not self.enabled or self._started is None:
+            return None
+        report = self.report()
+        tracemalloc.stop()
+        tmp_path = report_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, report_path)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(self._cprofile_path)
+        print_profile_report(report)
+        print(f"  Reporte de perfilado guardado en {report_path}")
+        return report
+
+
+def print_profile_report(report):
+    print(f"  Perfilado: {report['total_wall_s']:.3f} s en total, pico de memoria {report['peak_mb']:.2f} MB")
+    width = max((len(stage["stage"]) for stage in report["stages"]), default=0)
+    for stage in report["stages"]:
+        rate = f"{stage['items_per_s']:.1f}/s" if stage["items_per_s"] else "-"
+        print(f"    {stage['stage']:<{width}} {stage['wall_s'] * 1000:10.2f} ms  CPU {stage['cpu_s'] * 1000:10.2f} ms  "
+              f"{stage['items']:>8} elem.  {rate:>12}  {stage['peak_mb']:8.2f} MB")
+    if report.get("cprofile"):
+        print(f"    Volcado de cProfile: {report['cprofile']} (python -m pstats {report['cprofile']})")
+
+
+def add_profile_arguments(parser):
+    """Agrega las opciones --profile y --profile-cprofile comunes a los scripts generadores."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_REPORT_PATH,
+        default=None,
+        help=f"Mide cada etapa (tiempo, CPU, elementos/s, pico de memoria) y guarda el reporte JSON (por defecto: {DEFAULT_REPORT_PATH})",
+    )
+    parser.add_argument("--profile-cprofile", default=None, metavar="ETAPA", help="Con --profile, guarda además un volcado de cProfile de esa etapa en profile_<ETAPA>.prof")
+
+
+def profiler_from_args(args):
+    """Crea el perfilador según --profile (deshabilitado si no se pidió)."""
+    return StageProfiler(enabled=bool(args.profile), cprofile_stage=args.profile_cprofile)
@@ -0,0 +1,318 @@
+import argparse
+import itertools
+import random
+import re
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from articles import source_phrases
+
+# Generador de preguntas variadas por artículo. La biblioteca de plantillas se
+# compila una sola vez al crear el generador:
+#
+#   "[¿Qué|¿Qué cosa] establece el artículo {numero} {de_la_norma}?"
+#
+#   - `[a|b|c]` son variantes de redacción (una alternativa puede estar vacía);
+#   - `{de_la_norma}`, `{la_norma}` y `{pide}` son grupos de sinónimos
+#     ("del Código Nacional de Tránsito", "de la Ley 769 de 2002", ...);
+#     todas las plantillas se enmarcan además con `{contexto}` y `{cierre}`;
+#   - `{numero}`, `{titulo}`, `{capitulo}`, `{paragrafo}` y `{multa}` son datos
+#     del artículo y quedan como campos posicionales de un str.format.
+#
+# Las variantes y sinónimos se expanden al compilar, así que cada plantilla
+# compilada es un formato listo para `format(*valores)`; los formatos que usan
+# los mismos datos se agrupan. Para cada artículo se usan solo los grupos cuyos
+# datos existen (parágrafos si el artículo los tiene, multas si menciona multas
+# en salarios mínimos) y se eligen sin repetición N combinaciones con una
+# semilla derivada del número de artículo: la salida es la misma en cada ejecución y no depende del orden en
+# que se procesen los artículos. Solo se mantienen en memoria las preguntas del
+# artículo en curso, sin importar el tamaño total de la salida.
+
+DEFAULT_SEED = 769
+DEFAULT_BATCH_SIZE = 1024
+UNTITLED = "Sin título"
+
+SYNONYMS = {
+    "de_la_norma": [
+        "del Código Nacional de Tránsito", "del Código Nacional de Tránsito Terrestre", "de la Ley 769 de 2002",
+        "de la Ley 769", "de la ley de tránsito", "del código de tránsito", "de la norma de tránsito",
+    ],
+    "la_norma": [
+        "el Código Nacional de Tránsito", "la Ley 769 de 2002", "la Ley 769", "la ley de tránsito",
+        "el código de tránsito", "la norma de tránsito",
+    ],
+    "pide": ["Explícame", "Explica", "Resume", "Describe", "Dime", "Indícame", "Cuéntame"],
+    "contexto": ["", "Tengo una duda: ", "Una consulta: ", "Pregunta sobre tránsito: ", "Para el examen de conducción: ", "Soy conductor en Colombia. "],
+    "cierre": ["", " Responde con base en el texto de la ley.", " Cita el artículo si es posible.", " Sé breve y preciso."],
+}
+FRAME = "{contexto}%s{cierre}"  # Marco común de todas las plantillas
+
+TEMPLATES = {
+    "general": [
+        "[¿Qué|¿Qué cosa] [establece|dispone|señala|indica|dice|regula] el artículo {numero} {de_la_norma}?",
+        "{pide} el [contenido|texto|alcance] del artículo {numero}[| {de_la_norma}].",
+        "¿Cuál es el [contenido|texto|alcance] del artículo {numero} {de_la_norma}?",
+        "Necesito [información|saber más] sobre el artículo {numero} {de_la_norma}.",
+        "¿Qué [dice|establece|dispone] {la_norma} en [su|el] artículo {numero}?",
+        "[¿Podrías|¿Puedes] [explicarme|resumirme|aclararme] el artículo {numero} {de_la_norma}?",
+        "[¿De qué trata|¿Sobre qué trata|¿A qué se refiere] el artículo {numero} {de_la_norma}?",
+        "Quiero [conocer|entender] lo que [establece|dispone] el artículo {numero} {de_la_norma}.",
+        "[Cítame|Muéstrame|Transcríbeme] el artículo {numero} {de_la_norma}.",
+        "Según {la_norma}, ¿qué [establece|dispone] el artículo {numero}?",
+    ],
+    "titulo": [
+        "¿Cuál es el contenido del artículo {numero} sobre {titulo}?",
+        "Artículo {numero}: {titulo_original}",
+        "¿Qué [establece|dispone|dice] {la_norma} [sobre|respecto a|en materia de] {titulo}?",
+        "¿Qué artículo {de_la_norma} [trata|habla] [sobre|de] {titulo}?",
+        "{pide} lo que [establece|dispone] {la_norma} [sobre|respecto a|en materia de] {titulo}.",
+        "¿Qué [normas|reglas|disposiciones] [aplican a|rigen] {titulo} según {la_norma}?",
+        "En {la_norma}, ¿qué [dice|establece] el artículo {numero} ({titulo_original})?",
+    ],
+    "capitulo": [
+        "¿Qué [establece|dispone] el artículo {numero} del capítulo [sobre|de] {capitulo}?",
+        "En el capítulo [sobre|de] {capitulo} {de_la_norma}, ¿qué dice el artículo {numero}?",
+    ],
+    "paragrafo": [
+        "¿Qué [establece|dispone|aclara|señala] {paragrafo} del artículo {numero} {de_la_norma}?",
+        "{pide} {paragrafo} del artículo {numero}[| {de_la_norma}].",
+        "¿Qué [excepción|precisión] [hace|introduce] {paragrafo} del artículo {numero}?",
+    ],
+    "multa": [
+        "¿Qué [conducta|infracción] se sanciona con [|una ]multa de {multa} según el artículo {numero}?",
+        "¿En qué casos [impone|establece|prevé] {la_norma} una multa de {multa}?",
+        "¿Cuándo procede una multa de {multa} según el artículo {numero} {de_la_norma}?",
+        "¿A quién se le impone una multa de {multa} [según|de acuerdo con] {la_norma}?",
+    ],
+}
+
+ALTERNATIVES_PATTERN = re.compile(r'\[([^\[\]]*)\]')
+SLOT_PATTERN = re.compile(r'\{(\w+)\}')
+PARAGRAPH_PATTERN = re.compile(r'^PAR[AÁ]GRAFO\b\s*(\d+)?\s*[°ºo]?\s*(NUEVO|TRANSITORIO)?', re.MULTILINE)
+FINE_PATTERN = re.compile(
+    r'multa\s+(?:de|equivalente\s+a|igual\s+a)\s+(?P<amount>[^,.;:]{0,60}?salarios?\s+m[ií]nimos?[^,.;:]{0,40}(?:vigentes|diarios|mensuales))',
+    re.IGNORECASE,
+)
+PARENTHESIS_SPACES_PATTERN = re.compile(r'\(\s*(\d+)\s*\)')  # "quince ( 15)" -> "quince (15)"
+
+CompiledTemplate = namedtuple("CompiledTemplate", ["category", "format", "slots"])
+
+
+def _expand_alternatives(template):
+    parts = ALTERNATIVES_PATTERN.split(template)
+    # Las partes impares son las alternativas de un [a|b]
+    options = [part.split("|") if i % 2 else [part] for i, part in enumerate(parts)]
+    return ["".join(choice) for choice in itertools.product(*options)]
+
+
+def _compile_text(category, text, synonyms):
+    parts = SLOT_PATTERN.split(text)
+    # Las partes impares son nombres de campo: los sinónimos se expanden y los
+    # datos del artículo pasan a ser campos posicionales ({0}, {1}, ...)
+    slots = tuple(part for i, part in enumerate(parts) if i % 2 and part not in synonyms)
+    options = []
+    position = 0
+    for i, part in enumerate(parts):
+        if not i % 2:
+            options.append([part.replace("{", "{{").replace("}", "}}")])
+        elif part in synonyms:
+            options.append(synonyms[part])
+        else:
+            options.append([f"{{{position}}}"])
+            position += 1
+    return [CompiledTemplate(category, "".join(choice), slots) for choice in itertools.product(*options)]
+
+
+def compile_templates(templates=TEMPLATES, synonyms=SYNONYMS, frame=FRAME):
+    """Expande variantes y sinónimos; devuelve las plantillas compiladas sin duplicados."""
+    compiled = []
+    seen = set()
+    for category, category_templates in templates.items():
+        for template in category_templates:
+            for text in _expand_alternatives(frame % template if frame else template):
+                for entry in _compile_text(category, " ".join(text.split()), synonyms):
+                    if (entry.format, entry.slots) not in seen:
+                        seen.add((entry.format, entry.slots))
+                        compiled.append(entry)
+    return compiled
+
+
+def _paragraph_names(content):
+    names = []
+    for match in PARAGRAPH_PATTERN.finditer(content):
+        number, qualifier = match.groups()
+        name = "el parágrafo" + (f" {number}" if number else "") + (f" {qualifier.lower()}" if qualifier else "")
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def _fine_amounts(content):
+    amounts = []
+    for match in FINE_PATTERN.finditer(content):
+        amount = PARENTHESIS_SPACES_PATTERN.sub(r"(\1)", " ".join(match.group("amount").split()).lower())
+        if amount not in amounts:
+            amounts.append(amount)
+    return amounts
+
+
+def article_facts(article):
+    """Datos del artículo que usan las plantillas: {campo: [valores posibles]} (sin los campos que no aplican)."""
+    facts = {"numero": [article.number]}
+    title = article.title
+    if title and title != UNTITLED:
+        facts["titulo"] = [title.lower()]
+        facts["titulo_original"] = [title]
+    # Los nodos de document_parser.py conocen su capítulo; los Article leídos de un JSONL no
+    chapter = article.ancestor("capitulo") if hasattr(article, "ancestor") else None
+    if chapter is not None and chapter.title != UNTITLED:
+        facts["capitulo"] = [chapter.title.lower()]
+    paragraphs = _paragraph_names(article.content)
+    if paragraphs:
+        facts["paragrafo"] = paragraphs
+    fines = _fine_amounts(article.content)
+    if fines:
+        facts["multa"] = fines
+    return facts
+
+
+class QuestionGenerator:
+    """Genera hasta `per_article` preguntas únicas por artículo, siempre las mismas para la misma semilla.
+
+        generator = QuestionGenerator(per_article=200)
+        for batch in generator.iter_batches(article):
+            ...
+
+    Los artículos de un corpus (con atributo `source`) usan un generador con
+    `source`: sus preguntas nombran esa norma y se descartan las que no la nombran.
+    """
+
+    def __init__(self, per_article, seed=DEFAULT_SEED, batch_size=DEFAULT_BATCH_SIZE, templates=TEMPLATES, synonyms=SYNONYMS, source=None):
+        self.per_article = per_article
+        self.seed = seed
+        self.batch_size = batch_size
+        self.source = source
+        if source is not None:
+            of_source, the_source = source_phrases(source)
+            synonyms = dict(synonyms, de_la_norma=[of_source], la_norma=[the_source])
+        self.templates = compile_templates(templates, synonyms)
+        if source is not None:
+            # En un corpus, una pregunta que no nombra la norma sería ambigua entre normas
+            self.templates = [template for template in self.templates if source in template.format]
+        groups = {}
+        for template in self.templates:
+            groups.setdefault(template.slots, []).append(template.format)
+        self._groups = list(groups.items())
+        self._template_sources = templates
+        self._synonyms = synonyms
+        self._by_source = {}
+
+    def _for_source(self, article):
+        """Generador para la norma del artículo: en un corpus, las preguntas nombran su norma en lugar del código de tránsito."""
+        source = getattr(article, "source", None)
+        if source is None or source == self.source:
+            return self
+        generator = self._by_source.get(source)
+        if generator is None:
+            generator = self._by_source[source] = QuestionGenerator(
+                self.per_article, self.seed, self.batch_size, self._template_sources, self._synonyms, source)
+        return generator
+
+    def _plan(self, facts):
+        # Cada grupo aporta (formatos x combinaciones de valores de sus campos) preguntas
+        entries = []
+        bounds = []
+        total = 0
+        for slots, formats in self._groups:
+            values = [facts.get(slot) for slot in slots]
+            if not all(values):
+                continue
+            count = len(formats)
+            for slot_values in values:
+                count *= len(slot_values)
+            entries.append((formats, values))
+            total += count
+            bounds.append(total)
+        return entries, bounds, total
+
+    def candidate_count(self, article):
+        """Cantidad de preguntas distintas posibles para el artículo."""
+        return self._for_source(article)._plan(article_facts(article))[2]
+
+    def iter_batches(self, article):
+        """Genera listas de hasta `batch_size` preguntas del artículo (ninguna si no tiene número)."""
+        if article.number == "UNKNOWN":
+            return
+        generator = self._for_source(article)
+        if generator is not self:
+            yield from generator.iter_batches(article)
+            return
+        entries, bounds, total = self._plan(article_facts(article))
+        # Semilla por artículo (las semillas str no dependen de PYTHONHASHSEED)
+        rng = random.Random(f"{self.seed}:{article.number}")
+        indices = rng.sample(range(total), min(self.per_article, total))
+        seen = set()
+        for start in range(0, len(indices), self.batch_size):
+            batch = []
+            for index in indices[start:start + self.batch_size]:
+                position = bisect_right(bounds, index)
+                formats, values = entries[position]
+                index -= bounds[position - 1] if position else 0
+                # El índice elige el formato y luego un valor por campo (numeración mixta)
+                index, format_index = divmod(index, len(formats))
+                fmt = formats[format_index]
+                chosen = []
+                for slot_values in values:
+                    index, choice = divmod(index, len(slot_values))
+                    chosen.append(slot_values[choice])
+                question = fmt.format(*chosen)
+                if question not in seen:
+                    seen.add(question)
+                    batch.append(question)
+            if batch:
+                yield batch
+
+    def questions_for(self, article):
+        for batch in self.iter_batches(article):
+            yield from batch
+
+
+def add_question_arguments(parser):
+    """Agrega las opciones --preguntas y --semilla-preguntas de los generadores."""
+    parser.add_argument("--preguntas", dest="questions", type=int, default=None, help="Preguntas únicas por artículo con el generador de plantillas (por defecto, las 6 preguntas fijas)")
+    parser.add_argument("--semilla-preguntas", dest="question_seed", type=int, default=DEFAULT_SEED, help=f"Semilla del generador de preguntas (por defecto {DEFAULT_SEED})")
+
+
+def question_generator_from_args(args):
+    return QuestionGenerator(args.questions, args.question_seed) if args.questions else None
+
+
+def main(argv=None, prog=None):
+    from articles import extract_pages_from_pdf, iter_articles
+
+    parser = argparse.ArgumentParser(prog=prog, description="Muestra las preguntas que genera la biblioteca de plantillas para los artículos del PDF.")
+    parser.add_argument("--pdf", default="ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf", help="PDF de entrada")
+    parser.add_argument("--articulo", dest="article", default=None, help="Número de artículo a mostrar (por defecto, solo el resumen)")
+    add_question_arguments(parser)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    generator = QuestionGenerator(args.questions or 20, args.question_seed)
+    print(f"Plantillas compiladas: {len(generator.templates)} en {(time.perf_counter() - start) * 1000:.1f} ms")
+    articles = [article for article in iter_articles(extract_pages_from_pdf(args.pdf)) if article.number != "UNKNOWN"]
+    counts = [generator.candidate_count(article) for article in articles]
+    print(f"Artículos: {len(articles)}; preguntas posibles por artículo: mínimo {min(counts)}, máximo {max(counts)}, total {sum(counts)}")
+    if args.article:
+        for article in articles:
+            if article.number == args.article:
+                print(f"Artículo {article.number} ({article.title}):")
+                for question in generator.questions_for(article):
+                    print(f"  {question}")
+                break
+        else:
+            print(f"No se encontró el artículo {args.article}")
+
+
+if __name__ == "__main__":
+    main()
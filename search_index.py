@@ -0,0 +1,258 @@
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from articles import article_key, extract_pages_from_pdf, iter_articles
+from pdf_cache import hash_file
+from pdf_extraction import add_workers_argument
+
+# Índice invertido con puntuación BM25 sobre los artículos del código. El
+# archivo guarda arreglos contiguos que se leen con mmap sin copiarlos:
+#
+#   encabezado   magic, versión, conteos y hash del PDF de origen
+#   términos     hash de 64 bits de cada término (ordenados) e inicio de sus postings
+#   postings     id del documento y peso BM25 ya calculado (float32)
+#   documentos   inicio del contenido de cada artículo en el bloque de texto
+#   metadatos    JSON con [número, título] de cada documento
+#   contenido    texto UTF-8 de los artículos
+#
+# Como los pesos se calculan al construir el índice, una consulta solo suma los
+# pesos de los postings de sus términos y toma los k mayores.
+
+INDEX_MAGIC = b"BM25"
+INDEX_VERSION = 3  # 2: texto normalizado; 3: artículos del árbol de document_parser.py
+DEFAULT_INDEX_PATH = "articulos_ley_769.bm25"
+CORPUS_INDEX_PATH = "articulos_corpus.bm25"  # Índice de generate_datasets.py --corpus
+DEFAULT_TOP_K = 10
+BM25_K1 = 1.2
+BM25_B = 0.75
+HEADER = struct.Struct("<4sHxxIIIII64s")
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun cada como con contra cual cuales cuando de del
+desde donde dos durante e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos fue
+fueron ha han hasta hay la las le les lo los mas me mi mismo muy ni no nos o otra otras otro otros para pero por
+porque pueda puede que quien se sea segun ser si sido sin sobre son su sus tal tambien te tiene tienen todo todos
+tu un una unas uno unos y ya
+""".split())
+
+SearchHit = namedtuple("SearchHit", ["number", "title", "score", "doc_id"])
+
+
+def fold_text(text):
+    """Pasa a minúsculas y quita tildes (á -> a, ñ -> n)."""
+    return unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+
+
+def tokenize(text):
+    """Tokens de búsqueda: texto sin tildes ni mayúsculas, sin palabras vacías."""
+    return [token for token in TOKEN_PATTERN.findall(fold_text(text)) if token not in STOP_WORDS]
+
+
+def _term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("ascii"), digest_size=8).digest(), "little")
+
+
+def _pad(f):
+    # Cada arreglo empieza alineado a 8 bytes
+    f.write(b"\0" * (-f.tell() % 8))
+
+
+class SearchIndexBuilder:
+    """Recibe los artículos uno a uno (por ejemplo, desde generate_datasets.py) y escribe el índice."""
+
+    def __init__(self):
+        self.postings = {}
+        self.doc_lengths = array('I')
+        self.docs = []
+        self.contents = []
+
+    def add(self, article):
+        if article.number == "UNKNOWN":
+            return
+        doc_id = len(self.docs)
+        content = article.content
+        tokens = tokenize(content)
+        term_counts = {}
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, []).append((doc_id, count))
+        self.doc_lengths.append(len(tokens))
+        self.docs.append([article_key(article), article.title])
+        self.contents.append(content.encode("utf-8"))
+
+    def save(self, index_path, source_hash=""):
+        doc_count = len(self.docs)
+        avg_length = sum(self.doc_lengths) / doc_count if doc_count else 0
+
+        terms = sorted(self.postings, key=_term_hash)
+        term_hashes = array('Q', map(_term_hash, terms))
+        term_starts = array('I', [0])
+        doc_ids = array('I')
+        weights = array('f')
+        for term in terms:
+            postings = self.postings[term]
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, count in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)
+                doc_ids.append(doc_id)
+                weights.append(idf * count * (BM25_K1 + 1) / (count + norm))
+            term_starts.append(len(doc_ids))
+
+        content_starts = array('I', [0])
+        for content in self.contents:
+            content_starts.append(content_starts[-1] + len(content))
+        metadata = json.dumps(self.docs, ensure_ascii=False).encode("utf-8")
+
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, doc_count, len(terms), len(doc_ids),
+                                len(metadata), content_starts[-1], source_hash.encode("ascii")))
+            for section in (term_hashes, term_starts, doc_ids, weights, content_starts):
+                _pad(f)
+                f.write(section.tobytes())
+            f.write(metadata)
+            for content in self.contents:
+                f.write(content)
+        os.replace(tmp_path, index_path)
+        return index_path
+
+
+def build_search_index(pdf_path, index_path=DEFAULT_INDEX_PATH, workers=1, normalize=True):
+    """Construye el índice a partir del PDF; devuelve el número de artículos indexados."""
+    builder = SearchIndexBuilder()
+    for article in iter_articles(extract_pages_from_pdf(pdf_path, workers=workers, normalize=normalize)):
+        builder.add(article)
+    builder.save(index_path, hash_file(pdf_path))
+    return len(builder.docs)
+
+
+def _read_header(index_path):
+    try:
+        with open(index_path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    fields = HEADER.unpack(header)
+    if fields[0] != INDEX_MAGIC or fields[1] != INDEX_VERSION:
+        return None
+    return fields
+
+
+def is_search_index_current(index_path, source_path):
+    """Indica si el índice existe y se construyó a partir de esta versión del archivo de origen (PDF o JSONL)."""
+    header = _read_header(index_path)
+    return header is not None and header[7].decode("ascii").rstrip("\0") == hash_file(source_path)
+
+
+class SearchIndex:
+    """Índice BM25 abierto con mmap.
+
+        with SearchIndex("articulos_ley_769.bm25") as index:
+            for hit in index.search("multa por no llevar casco", k=5):
+                print(hit.number, hit.title, hit.score)
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        if _read_header(index_path) is None:
+            raise ValueError(f"{index_path} no es un índice de búsqueda válido (constrúyelo con search_index.py construir)")
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        _, _, self.doc_count, term_count, posting_count, metadata_size, content_size, _ = HEADER.unpack_from(self._mm, 0)
+
+        position = HEADER.size
+        sections = []
+        for fmt, count in (("Q", term_count), ("I", term_count + 1), ("I", posting_count), ("f", posting_count), ("I", self.doc_count + 1)):
+            position += -position % 8
+            size = count * struct.calcsize(fmt)
+            sections.append(self._view[position:position + size].cast(fmt))
+            position += size
+        self._term_hashes, self._term_starts, self._doc_ids, self._weights, self._content_starts = sections
+        self.docs = json.loads(bytes(self._view[position:position + metadata_size]))
+        self._content_offset = position + metadata_size
+
+    @classmethod
+    def for_pdf(cls, pdf_path, index_path=DEFAULT_INDEX_PATH, workers=1):
+        """Abre el índice del PDF, reconstruyéndolo si falta o si el PDF cambió."""
+        if not is_search_index_current(index_path, pdf_path):
+            build_search_index(pdf_path, index_path, workers=workers)
+        return cls(index_path)
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """Devuelve los k artículos con mayor puntuación BM25 para la consulta."""
+        scores = {}
+        term_hashes = self._term_hashes
+        for term in set(tokenize(query)):
+            term_hash = _term_hash(term)
+            position = bisect_left(term_hashes, term_hash)
+            if position == len(term_hashes) or term_hashes[position] != term_hash:
+                continue
+            start, end = self._term_starts[position], self._term_starts[position + 1]
+            for doc_id, weight in zip(self._doc_ids[start:end], self._weights[start:end]):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [SearchHit(self.docs[doc_id][0], self.docs[doc_id][1], score, doc_id) for doc_id, score in best]
+
+    def content(self, doc_id):
+        """Texto completo del artículo (para mostrarlo o usarlo como contexto del modelo)."""
+        start = self._content_offset + self._content_starts[doc_id]
+        end = self._content_offset + self._content_starts[doc_id + 1]
+        return bytes(self._view[start:end]).decode("utf-8")
+
+    def close(self):
+        if self._mm is not None:
+            for section in (self._term_hashes, self._term_starts, self._doc_ids, self._weights, self._content_starts):
+                section.release()
+            self._view.release()
+            self._mm.close()
+            self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de búsqueda BM25 sobre los artículos de la Ley 769 de 2002.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("construir", help="Construye el índice a partir del PDF")
+    build_parser.add_argument("--pdf", default="ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf", help="PDF de entrada")
+    build_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Archivo del índice")
+    add_workers_argument(build_parser)
+
+    search_parser = subparsers.add_parser("buscar", help="Busca los artículos más relevantes para una consulta")
+    search_parser.add_argument("query", help='Consulta en texto libre, p. ej. "multa por no llevar casco"')
+    search_parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Archivo del índice")
+    search_parser.add_argument("-k", type=int, default=DEFAULT_TOP_K, help="Número de resultados")
+    args = parser.parse_args()
+
+    if args.command == "construir":
+        count = build_search_index(args.pdf, args.index, workers=args.workers)
+        print(f"Índice guardado en {args.index} ({count} artículos)")
+    else:
+        try:
+            index = SearchIndex(args.index)
+        except ValueError as e:
+            parser.error(str(e))
+        with index:
+            for hit in index.search(args.query, k=args.k):
+                print(f"{hit.score:7.3f}  Artículo {hit.number}: {hit.title}")
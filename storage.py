@@ -0,0 +1,515 @@
+import argparse
+import base64
+import hashlib
+import os
+import time
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Capa de almacenamiento para subir los datasets. Antes de subir un archivo se
+# compara su MD5/CRC32C con el del objeto remoto y, si coinciden, no se sube de
+# nuevo. Los archivos grandes se suben en partes paralelas que luego se unen
+# (compose); los nombres de las partes dependen del contenido, así que una
+# subida interrumpida se retoma reutilizando las partes ya subidas. Con
+# `compress` el archivo se comprime con gzip mientras se sube.
+#
+# Los backends implementan `stat`, `put`, `compose` y `delete`:
+#
+#   LocalBackend   carpeta local (para pruebas o copias sin conexión)
+#   MemoryBackend  objetos en memoria, con fallos simulados para probar reintentos
+#   GCSBackend     bucket de Google Cloud Storage (requiere google-cloud-storage)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # Tamaño de cada parte
+DEFAULT_WORKERS = 8  # Partes (o archivos) que se suben en paralelo
+RETRY_ATTEMPTS = 5
+RETRY_DELAY = 0.5  # Segundos antes del primer reintento; se duplica en cada intento
+SOURCE_MD5_KEY = "source-md5"  # Metadato con el MD5 del archivo local (también para los comprimidos)
+PARTS_SUFFIX = ".partes/"
+
+ObjectInfo = namedtuple("ObjectInfo", ["size", "md5", "crc32c", "metadata"])
+UploadResult = namedtuple("UploadResult", ["name", "uri", "skipped", "bytes", "parts", "parts_reused"])
+
+
+class TransientStorageError(Exception):
+    """Error temporal del almacenamiento: la operación se reintenta."""
+
+
+@lru_cache(maxsize=None)
+def _crc32c_table():
+    # Solo se arma si no está google-crc32c, al calcular el primer checksum
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_google_crc32c = False  # Se importa al calcular el primer checksum
+
+
+def _load_google_crc32c():
+    global _google_crc32c
+    if _google_crc32c is False:
+        try:
+            import google_crc32c
+        except ImportError:  # google-crc32c es opcional (viene con google-cloud-storage)
+            google_crc32c = None
+        _google_crc32c = google_crc32c
+    return _google_crc32c
+
+
+def crc32c(data, crc=0):
+    """CRC32C (Castagnoli), el checksum que usa GCS; `crc` permite calcularlo por partes."""
+    google_crc32c = _load_google_crc32c()
+    if google_crc32c is not None:
+        return google_crc32c.extend(crc, bytes(data))
+    table = _crc32c_table()
+    crc ^= 0xFFFFFFFF
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+def _b64(digest):
+    return base64.b64encode(digest).decode("ascii")
+
+
+def md5_b64(data):
+    return _b64(hashlib.md5(data).digest())
+
+
+def crc32c_b64(data):
+    return _b64(crc32c(data).to_bytes(4, "big"))
+
+
+def file_md5(path, chunk_size=1024 * 1024):
+    """MD5 del archivo en base64 (el formato de `md5Hash` en GCS)."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return _b64(digest.digest())
+
+
+def file_crc32c(path, chunk_size=1024 * 1024):
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            crc = crc32c(chunk, crc)
+    return _b64(crc.to_bytes(4, "big"))
+
+
+class StorageBackend:
+    # Errores que se reintentan; cada backend agrega los suyos
+    transient_errors = (TransientStorageError, ConnectionError, TimeoutError)
+    # Máximo de objetos que acepta `compose` en una llamada (None = sin límite)
+    max_compose = None
+
+    def uri(self, name):
+        raise NotImplementedError
+
+    def stat(self, name):
+        """Devuelve un ObjectInfo del objeto o None si no existe."""
+        raise NotImplementedError
+
+    def put(self, name, data, metadata=None):
+        raise NotImplementedError
+
+    def compose(self, name, part_names, metadata=None):
+        """Crea `name` concatenando los objetos `part_names` en orden."""
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+
+class MemoryBackend(StorageBackend):
+    """Objetos en memoria. Las primeras `failures` llamadas a `put` fallan con TransientStorageError."""
+
+    def __init__(self, failures=0):
+        self.objects = {}
+        self.failures = failures
+        self.put_calls = 0
+
+    def uri(self, name):
+        return f"memoria://{name}"
+
+    def stat(self, name):
+        entry = self.objects.get(name)
+        if entry is None:
+            return None
+        data, metadata = entry
+        return ObjectInfo(len(data), md5_b64(data), crc32c_b64(data), dict(metadata))
+
+    def put(self, name, data, metadata=None):
+        self.put_calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise TransientStorageError(f"Fallo simulado al subir {name}")
+        self.objects[name] = (bytes(data), dict(metadata or {}))
+
+    def compose(self, name, part_names, metadata=None):
+        self.objects[name] = (b"".join(self.objects[part][0] for part in part_names), dict(metadata or {}))
+
+    def delete(self, name):
+        self.objects.pop(name, None)
+
+
+class LocalBackend(StorageBackend):
+    """Guarda los objetos como archivos bajo `root`; los metadatos van en `<objeto>.metadata`."""
+
+    transient_errors = StorageBackend.transient_errors + (InterruptedError,)
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, name):
+        return os.path.join(self.root, *name.split("/"))
+
+    def uri(self, name):
+        return os.path.abspath(self._path(name))
+
+    def stat(self, name):
+        path = self._path(name)
+        if not os.path.isfile(path):
+            return None
+        metadata = {}
+        if os.path.exists(path + ".metadata"):
+            with open(path + ".metadata", encoding="utf-8") as f:
+                metadata = dict(line.rstrip("\n").split("=", 1) for line in f if "=" in line)
+        return ObjectInfo(os.path.getsize(path), file_md5(path), None, metadata)
+
+    def _write(self, name, chunks, metadata):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        if metadata:
+            with open(path + ".metadata", "w", encoding="utf-8") as f:
+                f.writelines(f"{key}={value}\n" for key, value in metadata.items())
+        elif os.path.exists(path + ".metadata"):
+            os.remove(path + ".metadata")
+
+    def put(self, name, data, metadata=None):
+        self._write(name, [data], metadata)
+
+    def compose(self, name, part_names, metadata=None):
+        def chunks():
+            for part in part_names:
+                with open(self._path(part), 'rb') as f:
+                    yield from iter(lambda: f.read(1024 * 1024), b"")
+        self._write(name, chunks(), metadata)
+
+    def delete(self, name):
+        for path in (self._path(name), self._path(name) + ".metadata"):
+            if os.path.exists(path):
+                os.remove(path)
+        # La carpeta de partes queda vacía al terminar la subida
+        directory = os.path.dirname(self._path(name))
+        if os.path.normpath(directory) != os.path.normpath(self.root) and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+class GCSBackend(StorageBackend):
+    """Bucket de Google Cloud Storage."""
+
+    max_compose = 32
+
+    def __init__(self, bucket):
+        from google.api_core import exceptions
+
+        self.bucket = bucket
+        self.transient_errors = StorageBackend.transient_errors + (
+            exceptions.TooManyRequests, exceptions.InternalServerError, exceptions.ServiceUnavailable, exceptions.GatewayTimeout,
+        )
+
+    @classmethod
+    def open(cls, bucket_name, project=None, location=None):
+        """Abre el bucket, creándolo en `location` si no existe."""
+        try:
+            from google.cloud import storage
+            from google.api_core import exceptions
+        except ImportError:
+            raise ValueError("Para subir a GCS instala el paquete google-cloud-storage") from None
+
+        client = storage.Client(project=project)
+        try:
+            bucket = client.get_bucket(bucket_name)
+            print(f"Bucket '{bucket_name}' ya existe.")
+        except exceptions.NotFound:
+            print(f"Bucket '{bucket_name}' no encontrado. Creándolo en la región {location}...")
+            bucket = client.create_bucket(bucket_name, location=location)
+            print(f"Bucket '{bucket_name}' creado exitosamente.")
+        return cls(bucket)
+
+    def uri(self, name):
+        return f"gs://{self.bucket.name}/{name}"
+
+    def stat(self, name):
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return None
+        # Los objetos compuestos no tienen MD5, solo CRC32C
+        return ObjectInfo(blob.size, blob.md5_hash, blob.crc32c, dict(blob.metadata or {}))
+
+    def put(self, name, data, metadata=None):
+        blob = self.bucket.blob(name)
+        blob.metadata = metadata
+        blob.upload_from_string(bytes(data), content_type="application/octet-stream", checksum="crc32c")
+
+    def compose(self, name, part_names, metadata=None):
+        blob = self.bucket.blob(name)
+        blob.metadata = metadata
+        blob.compose([self.bucket.blob(part) for part in part_names])
+
+    def delete(self, name):
+        from google.api_core import exceptions
+
+        try:
+            self.bucket.delete_blob(name)
+        except exceptions.NotFound:
+            pass
+
+
+def _with_retries(backend, func, *args, retry_delay=RETRY_DELAY):
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return func(*args)
+        except backend.transient_errors:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            time.sleep(retry_delay * 2 ** attempt)
+
+
+def _file_chunks(path, chunk_size):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(chunk_size), b"")
+
+
+def _rechunk(blocks, chunk_size):
+    """Agrupa bloques de bytes de cualquier tamaño en partes de `chunk_size` bytes (la última puede ser menor)."""
+    pending = []
+    pending_size = 0
+    for block in blocks:
+        pending.append(block)
+        pending_size += len(block)
+        if pending_size >= chunk_size:
+            buffer = b"".join(pending)
+            start = 0
+            while len(buffer) - start >= chunk_size:
+                yield buffer[start:start + chunk_size]
+                start += chunk_size
+            pending, pending_size = [buffer[start:]], len(buffer) - start
+    buffer = b"".join(pending)
+    if buffer:
+        yield buffer
+
+
+def _gzip_chunks(blocks, chunk_size):
+    """Comprime los bloques con gzip en streaming y los entrega en partes de `chunk_size` bytes comprimidos."""
+    # wbits=31 escribe el encabezado gzip con fecha 0: el resultado es idéntico en cada ejecución
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compressed():
+        for block in blocks:
+            yield compressor.compress(block)
+        yield compressor.flush()
+
+    return _rechunk(compressed(), chunk_size)
+
+
+def _is_unchanged(remote, source_md5, compress, source_crc32c=None):
+    """Indica si el objeto remoto ya tiene este contenido; `source_crc32c()` calcula el CRC32C si hace falta."""
+    if remote.metadata.get(SOURCE_MD5_KEY) == source_md5:
+        return True
+    if compress:
+        return False
+    if remote.md5:
+        return remote.md5 == source_md5
+    return bool(remote.crc32c) and source_crc32c is not None and remote.crc32c == source_crc32c()
+
+
+def _part_is_current(remote, data):
+    if remote is None or remote.size != len(data):
+        return False
+    if remote.md5:
+        return remote.md5 == md5_b64(data)
+    return remote.crc32c == crc32c_b64(data)
+
+
+def _compose_all(backend, name, part_names, metadata, retry_delay):
+    """Une las partes; si el backend limita cuántas acepta `compose`, las une por niveles."""
+    intermediates = []
+    limit = backend.max_compose
+    level = 0
+    while limit and len(part_names) > limit:
+        grouped = []
+        for start in range(0, len(part_names), limit):
+            group_name = f"{name}{PARTS_SUFFIX}nivel{level}-{start // limit:05d}"
+            _with_retries(backend, backend.compose, group_name, part_names[start:start + limit], None, retry_delay=retry_delay)
+            grouped.append(group_name)
+        intermediates.extend(grouped)
+        part_names = grouped
+        level += 1
+    _with_retries(backend, backend.compose, name, part_names, metadata, retry_delay=retry_delay)
+    return intermediates
+
+
+def upload_file(backend, source_path, name, compress=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                executor=None, retry_delay=RETRY_DELAY):
+    """Sube un archivo al backend si cambió; devuelve un UploadResult.
+
+    Los archivos de más de una parte se suben en paralelo (en `executor` o en un
+    pool propio de `workers` hilos) y se unen al final con `compose`.
+    """
+    source_md5 = file_md5(source_path)
+    remote = _with_retries(backend, backend.stat, name, retry_delay=retry_delay)
+    if remote is not None and _is_unchanged(remote, source_md5, compress, lambda: file_crc32c(source_path)):
+        return UploadResult(name, backend.uri(name), True, remote.size, 0, 0)
+
+    chunks = _file_chunks(source_path, chunk_size)
+    if compress:
+        chunks = _gzip_chunks(chunks, chunk_size)
+    return _upload_chunks(backend, name, chunks, source_md5, compress, workers, executor, retry_delay)
+
+
+def upload_stream(backend, read_blocks, name, compress=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                  executor=None, retry_delay=RETRY_DELAY):
+    """Sube sin escribirlo en disco el contenido que genera `read_blocks()` (bloques de bytes); devuelve un UploadResult.
+
+    `read_blocks` se llama dos veces y debe generar siempre lo mismo: la primera
+    solo calcula el MD5 para no volver a subir un objeto sin cambios, la segunda
+    sube las partes (ver dataset_store.py materializar --destino).
+    """
+    digest = hashlib.md5()
+    for block in read_blocks():
+        digest.update(block)
+    source_md5 = _b64(digest.digest())
+    remote = _with_retries(backend, backend.stat, name, retry_delay=retry_delay)
+    if remote is not None and _is_unchanged(remote, source_md5, compress):
+        return UploadResult(name, backend.uri(name), True, remote.size, 0, 0)
+
+    chunks = _gzip_chunks(read_blocks(), chunk_size) if compress else _rechunk(read_blocks(), chunk_size)
+    return _upload_chunks(backend, name, chunks, source_md5, compress, workers, executor, retry_delay)
+
+
+def _upload_chunks(backend, name, chunks, source_md5, compress, workers, executor, retry_delay):
+    """Sube las partes (una sola con `put`; varias en paralelo, unidas al final con `compose`)."""
+    metadata = {SOURCE_MD5_KEY: source_md5}
+    first = next(chunks, b"")
+    second = next(chunks, None)
+    if second is None:
+        _with_retries(backend, backend.put, name, first, metadata, retry_delay=retry_delay)
+        return UploadResult(name, backend.uri(name), False, len(first), 1, 0)
+
+    # Las partes se nombran por el contenido del archivo: si la subida se corta, la siguiente ejecución las reutiliza
+    part_prefix = f"{name}{PARTS_SUFFIX}{base64.b64decode(source_md5).hex()}-{'gz' if compress else 'raw'}-"
+
+    def upload_part(part_name, data):
+        if _part_is_current(_with_retries(backend, backend.stat, part_name, retry_delay=retry_delay), data):
+            return 0, True
+        _with_retries(backend, backend.put, part_name, data, None, retry_delay=retry_delay)
+        return len(data), False
+
+    own_executor = executor is None
+    executor = executor or ThreadPoolExecutor(max_workers=workers)
+    part_names = []
+    in_flight = deque()
+    total_bytes = reused = 0
+    try:
+        def collect(future):
+            nonlocal total_bytes, reused
+            size, was_reused = future.result()
+            total_bytes += size
+            reused += was_reused
+
+        for data in _chain(first, second, chunks):
+            part_name = f"{part_prefix}{len(part_names):05d}"
+            part_names.append(part_name)
+            in_flight.append(executor.submit(upload_part, part_name, data))
+            # Se limitan las partes pendientes para no tener todo el archivo en memoria
+            while len(in_flight) >= workers:
+                collect(in_flight.popleft())
+        while in_flight:
+            collect(in_flight.popleft())
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    intermediates = _compose_all(backend, name, part_names, metadata, retry_delay)
+    for part_name in part_names + intermediates:
+        _with_retries(backend, backend.delete, part_name, retry_delay=retry_delay)
+    return UploadResult(name, backend.uri(name), False, total_bytes, len(part_names), reused)
+
+
+def _chain(first, second, rest):
+    yield first
+    yield second
+    yield from rest
+
+
+def upload_files(backend, files, compress=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS, retry_delay=RETRY_DELAY):
+    """Sube varios archivos (por ejemplo, los fragmentos de dataset_shards.py) en paralelo.
+
+    `files` es una lista de (ruta local, nombre remoto); devuelve los UploadResult en el mismo orden.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as part_executor, ThreadPoolExecutor(max_workers=workers) as file_executor:
+        futures = [
+            file_executor.submit(upload_file, backend, path, name, compress, chunk_size, workers, part_executor, retry_delay)
+            for path, name in files
+        ]
+        return [future.result() for future in futures]
+
+
+def backend_for(destination):
+    """Crea el backend para un destino "gs://bucket/prefijo" o una carpeta local; devuelve (backend, prefijo)."""
+    if destination.startswith("gs://"):
+        bucket_name, _, prefix = destination[len("gs://"):].partition("/")
+        return GCSBackend.open(bucket_name), prefix.strip("/")
+    return LocalBackend(destination), ""
+
+
+def print_upload_result(result):
+    if result.skipped:
+        print(f"  {result.uri}: sin cambios, no se volvió a subir")
+    else:
+        reused = f", {result.parts_reused} reutilizadas" if result.parts_reused else ""
+        print(f"  {result.uri}: {result.bytes} bytes subidos en {result.parts} partes{reused}")
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Sube archivos de dataset a GCS o a una carpeta local, omitiendo los que no cambiaron.")
+    parser.add_argument("files", nargs="+", help="Archivos a subir")
+    parser.add_argument("--destino", dest="destination", required=True, help='Destino: "gs://bucket/prefijo" o una carpeta local')
+    parser.add_argument("--comprimir", dest="compress", action="store_true", help="Comprime con gzip mientras sube (agrega .gz al nombre)")
+    parser.add_argument("--parte-mb", dest="chunk_mb", type=float, default=DEFAULT_CHUNK_SIZE / (1024 * 1024), help="Tamaño de cada parte en MB")
+    parser.add_argument("--hilos", dest="workers", type=int, default=DEFAULT_WORKERS, help="Subidas en paralelo")
+    args = parser.parse_args(argv)
+
+    # Se revisan los archivos antes de abrir el destino (para GCS, antes de importar google-cloud-storage)
+    missing = [path for path in args.files if not os.path.isfile(path)]
+    if missing:
+        parser.error(f"No existen los archivos: {', '.join(missing)}")
+    try:
+        backend, prefix = backend_for(args.destination)
+    except ValueError as e:
+        parser.error(str(e))
+    files = []
+    for path in args.files:
+        name = os.path.basename(path) + (".gz" if args.compress else "")
+        files.append((path, f"{prefix}/{name}" if prefix else name))
+    start = time.perf_counter()
+    for result in upload_files(backend, files, args.compress, int(args.chunk_mb * 1024 * 1024), max(1, args.workers)):
+        print_upload_result(result)
+    print(f"Listo en {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
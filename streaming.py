@@ -0,0 +1,50 @@
+def iter_lines(pages):
+    """Genera las líneas del texto formado por cada página seguida de un salto de línea.
+
+    Equivale a ``"".join(p + "\\n" for p in pages).split("\\n")`` sin construir
+    nunca el texto completo en memoria.
+    """
+    for page_text in pages:
+        yield from page_text.split('\n')
+    # El texto completo termina en "\n", así que split() siempre produce una última línea vacía
+    yield ""
+
+
+def split_stream(chunks, pattern):
+    """Equivalente en streaming a ``pattern.split("".join(chunks))`` para patrones de ancho cero.
+
+    `pattern` debe ser una expresión compilada que solo use lookahead (por
+    ejemplo ``(?=ARTÍCULO...)``). El texto pendiente desde el último corte se
+    conserva como búfer de arrastre, de modo que los bloques que cruzan un salto
+    de página se unen correctamente y la memoria queda acotada por el bloque más
+    largo.
+    """
+    buffer = ""
+    # Si el búfer empieza en un punto de corte ya emitido, no hay que volver a probar la posición 0
+    at_split = False
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in pattern.finditer(buffer, 1 if at_split else 0):
+            yield buffer[start:match.start()]
+            start = match.start()
+            at_split = True
+        if start:
+            buffer = buffer[start:]
+    yield buffer
+
+
+class CountedIterator:
+    """Envuelve un iterable y cuenta los elementos que han pasado por él."""
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self._iterator)
+        self.count += 1
+        return item
@@ -0,0 +1,174 @@
+import re
+from collections import Counter
+
+# Limpieza del texto que extrae PyPDF2 antes de dividirlo en artículos:
+#
+#   - Une las palabras partidas ("Tránsi to" -> "Tránsito", "a ños" -> "años")
+#     usando como vocabulario las palabras del propio documento.
+#   - Quita los saltos de línea de maquetación (cada ~80 caracteres) y conserva
+#     los que separan párrafos, encabezados, numerales y artículos.
+#   - Normaliza "º" a "°" y los espacios repetidos o antes de la puntuación.
+#
+# Todo se hace en una pasada para contar el vocabulario y otra para reescribir,
+# página por página (ver normalize_pages).
+
+WORD_PATTERN = re.compile(r'\w+')
+TRAILING_WORD_PATTERN = re.compile(r'\w+$')
+LEADING_WORD_PATTERN = re.compile(r'^\w+')
+SPACE_BEFORE_PUNCTUATION_PATTERN = re.compile(r'(?<=\w) +(?=[,.;:)])')
+# Líneas que siempre empiezan en un renglón propio
+BLOCK_START_PATTERN = re.compile(
+    r'^(ART[IÍ]CULO\s+\d|CAP[IÍ]TULO\b|T[IÍ]TULO\b|T I T U L O\b|PAR[AÁ]GRAFO\b|LIBRO\b|\d+[.)°]\s|[a-zA-Z]\)\s|[-•]\s)',
+    re.IGNORECASE,
+)
+PARAGRAPH_END = (".", ":", ";")
+MIN_JOINED_COUNT = 1  # Veces que la palabra unida debe aparecer completa en el documento
+REPAIR_COUNTS = ("words_repaired", "line_breaks_removed", "degree_signs", "whitespace_fixed")
+PAGE_END = object()  # Marca el final de una página entre los fragmentos normalizados
+
+
+def build_vocabulary(texts):
+    """Cuenta las palabras (en minúsculas) de todos los textos."""
+    vocabulary = Counter()
+    for text in texts:
+        vocabulary.update(WORD_PATTERN.findall(text.lower()))
+    return vocabulary
+
+
+def _should_join(left, right, vocabulary):
+    """Indica si dos fragmentos separados por un espacio son en realidad una palabra partida."""
+    if not (left.isalpha() and right.isalpha()):
+        return False
+    # Letras sueltas seguidas: encabezados espaciados como "T I T U L O"
+    if len(left) == 1 and len(right) == 1:
+        return False
+    # La continuación de una palabra partida va en minúscula (salvo en textos en mayúsculas)
+    if not (right[0].islower() or (left.isupper() and right.isupper())):
+        return False
+    joined_count = vocabulary.get((left + right).lower(), 0)
+    if joined_count < MIN_JOINED_COUNT:
+        return False
+    # Al menos uno de los fragmentos no debe ser más frecuente que la palabra completa
+    return min(vocabulary.get(left.lower(), 0), vocabulary.get(right.lower(), 0)) <= joined_count
+
+
+def _keeps_line_break(line, next_line):
+    if not line or not next_line:
+        return True
+    if line.endswith(PARAGRAPH_END) or BLOCK_START_PATTERN.match(next_line):
+        return True
+    # Encabezados en mayúsculas ("DISPOSICIONES GENERALES", "CAPITULO I")
+    return line.isupper() or next_line.isupper()
+
+
+def _clean_line(raw_line, counts):
+    """Unifica los espacios de una línea y quita los que van antes de la puntuación."""
+    counts["degree_signs"] += raw_line.count("º")
+    raw_line = raw_line.replace("º", "°")
+    line = " ".join(raw_line.split())
+    if line != raw_line.strip():
+        counts["whitespace_fixed"] += 1
+    line, count = SPACE_BEFORE_PUNCTUATION_PATTERN.subn("", line)
+    counts["whitespace_fixed"] += count
+    return line
+
+
+def _normalized_pieces(lines, vocabulary, counts):
+    """Genera los fragmentos del texto normalizado a partir de pares (línea, es la última de su página).
+
+    Tras la última línea de cada página se genera PAGE_END, antes del
+    separador que la une con la página siguiente.
+    """
+    lines = iter(lines)
+    following = next(lines, None)
+    following = following and (_clean_line(following[0], counts), following[1])
+    # Se recorren las palabras una sola vez; el separador de cada palabra con la
+    # siguiente es un espacio o un salto de línea que se conserva.
+    pending = None
+    while following is not None:
+        line, page_end = following
+        following = next(lines, None)
+        following = following and (_clean_line(following[0], counts), following[1])
+        for word in line.split(" ") if line else []:
+            if pending is not None:
+                # Se comparan la última palabra del fragmento izquierdo y la primera del derecho
+                left = TRAILING_WORD_PATTERN.search(pending)
+                right = LEADING_WORD_PATTERN.match(word)
+                if left and right and _should_join(left.group(), right.group(), vocabulary):
+                    pending = pending + word
+                    counts["words_repaired"] += 1
+                    continue
+                yield pending
+                yield " "
+            pending = word
+        if following is None:
+            break
+        if page_end:
+            yield PAGE_END
+        if _keeps_line_break(line, following[0]):
+            if pending is not None:
+                yield pending
+                pending = None
+            yield "\n"
+        elif line:
+            counts["line_breaks_removed"] += 1
+    if pending is not None:
+        yield pending
+
+
+def _add_counts(report, counts):
+    if report is not None:
+        for key, value in counts.items():
+            report[key] = report.get(key, 0) + value
+
+
+def normalize_text(text, vocabulary, report=None):
+    """Normaliza un texto con el vocabulario dado; suma las reparaciones en `report` si se pasa."""
+    counts = dict.fromkeys(REPAIR_COUNTS, 0)
+    text = "".join(_normalized_pieces(((line, False) for line in text.split("\n")), vocabulary, counts))
+    _add_counts(report, counts)
+    return text
+
+
+def normalize_pages(pages, report=None):
+    """Normaliza las páginas con el vocabulario de todo el documento, página por página.
+
+    Una primera pasada cuenta el vocabulario y la segunda reescribe cada
+    página sin unirlas en un solo texto. Las palabras y los párrafos cortados
+    entre páginas se reparan igual que dentro de una página: la parte que
+    continúa en la página siguiente se queda con la anterior, de modo que
+    parse_pages da el mismo resultado que con el documento completo. Por eso
+    se pueden devolver menos páginas que las recibidas.
+    """
+    if not pages:
+        return []
+    vocabulary = build_vocabulary(pages)
+    counts = dict.fromkeys(REPAIR_COUNTS, 0)
+    normalized = []
+    current = []
+    page_ended = False
+    for piece in _normalized_pieces(_page_lines(pages), vocabulary, counts):
+        if piece is PAGE_END:
+            page_ended = True
+        elif piece == "\n" and page_ended and current and current[-1] != "\n":
+            # parse_pages vuelve a unir las páginas con este salto de línea
+            normalized.append("".join(current))
+            current = []
+            page_ended = False
+        else:
+            current.append(piece)
+    last_page = "".join(current)
+    if normalized and not last_page.strip("\n"):
+        # Solo saltos de línea al final del documento: una página vacía añadiría otro
+        normalized[-1] += "\n" + last_page
+    else:
+        normalized.append(last_page)
+    _add_counts(report, counts)
+    return normalized
+
+
+def _page_lines(pages):
+    for page in pages:
+        lines = page.rstrip("\n").split("\n")
+        for index, line in enumerate(lines):
+            yield line, index == len(lines) - 1
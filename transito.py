@@ -0,0 +1,74 @@
+import argparse
+import importlib
+import sys
+
+# Punto de entrada único para el pipeline:
+#
+#   python transito.py extraer ley.pdf --formato articulos
+#   python transito.py generar --validacion 20
+#   python transito.py validar articulos_ley_769_gemini.jsonl
+#   python transito.py estadisticas articulos_ley_769_openai.jsonl
+#   python transito.py deduplicar articulos_ley_769_openai.jsonl --representantes 2
+#   python transito.py corpus leyes/ --workers 0
+#   python transito.py subir articulos_ley_769_gemini.jsonl --destino gs://bucket
+#   python transito.py ajustar
+#
+# Cada subcomando delega en la función `main` del script correspondiente, que se
+# importa solo al ejecutar ese subcomando: `--help` y `validar` no cargan PyPDF2
+# ni los SDK de Google Cloud, y `subir`/`ajustar` validan los archivos y la
+# configuración antes de importarlos. `python benchmark.py --arranque` mide el
+# tiempo de arranque de estos comandos.
+
+PROG = "transito"
+
+# (subcomando, alias en inglés, módulo, descripción)
+COMMANDS = [
+    ("extraer", "extract", "articles", "Extrae el texto del PDF como texto plano o JSONL de artículos"),
+    ("generar", "generate", "generate_datasets", "Genera los formatos JSONL procesando el PDF una sola vez"),
+    ("validar", "validate", "validate_jsonl", "Valida archivos JSONL de fine-tuning"),
+    ("estadisticas", "stats", "dataset_stats", "Estadísticas de tokens y costo estimado de entrenamiento"),
+    ("deduplicar", "dedup", "near_duplicates", "Elimina ejemplos casi duplicados (MinHash + LSH)"),
+    ("corpus", "ingest", "corpus", "Extrae en paralelo los artículos de varias normas, etiquetados con su norma"),
+    ("subir", "upload", "storage", "Sube los datasets a GCS o a una carpeta local"),
+    ("ajustar", "tune", "tune_gemini", "Inicia (o reutiliza) el fine-tuning de Gemini en Vertex AI"),
+]
+
+
+def resolve_command(name):
+    """Devuelve (subcomando, módulo) para un subcomando o su alias, o None si no existe."""
+    for command, alias, module_name, _ in COMMANDS:
+        if name in (command, alias):
+            return command, module_name
+    return None
+
+
+def build_parser():
+    width = max(len(f"{command} ({alias})") for command, alias, _, _ in COMMANDS)
+    epilog = "subcomandos:\n" + "\n".join(
+        f"  {f'{command} ({alias})':<{width}}  {description}" for command, alias, _, description in COMMANDS
+    )
+    parser = argparse.ArgumentParser(
+        prog=PROG,
+        usage=f"{PROG} [-h] <subcomando> [opciones]",
+        description="Pipeline de datasets de la Ley 769 de 2002. Usa '<subcomando> --help' para ver sus opciones.",
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", metavar="subcomando", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    # Solo se analiza el subcomando; sus opciones las analiza el script correspondiente
+    args = parser.parse_args(argv[:1])
+    resolved = resolve_command(args.command)
+    if resolved is None:
+        parser.error(f"subcomando desconocido '{args.command}'. Disponibles: {', '.join(command for command, _, _, _ in COMMANDS)}")
+    command, module_name = resolved
+    importlib.import_module(module_name).main(argv[1:], prog=f"{PROG} {command}")
+
+
+if __name__ == "__main__":
+    main()
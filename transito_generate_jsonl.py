@@ -1,50 +1,49 @@
-import json
-from PyPDF2 import PdfReader
-
-# Paso 1: Extraer texto del PDF
-def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
-
-# Paso 2: Dividir en bloques (ej: por artículo)
-def split_by_articles(full_text):
-    articles = []
-    current_article = ""
-    
-    for line in full_text.split('\n'):
-        if line.strip().upper().startswith("ARTÍCULO") or line.strip().upper().startswith("CAPÍTULO"):
-            if current_article:
-                articles.append(current_article.strip())
-            current_article = line + "\n"
-        else:
-            current_article += line + "\n"
-    
-    if current_article:
-        articles.append(current_article.strip())
-    
-    return articles
+import argparse
+from articles import extract_pages_from_pdf, iter_articles
+from emitters import TextEmitter
+from jsonl_io import JsonlWriter
+from pdf_extraction import add_workers_argument
+from profiling import add_profile_arguments, profiler_from_args
+
+# Paso 1: Extraer el texto de cada página del PDF (normalizado, ver text_normalization.py)
+# Paso 2: Dividir en artículos con el árbol del documento (ver document_parser.py):
+# solo los encabezados ARTÍCULO/ARTICULO al inicio de una línea abren un artículo,
+# y los TÍTULO/CAPÍTULO no se confunden con artículos
 
 # Paso 3: Guardar en formato JSONL
 def save_to_jsonl(articles, output_path):
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for article in articles:
-            f.write(json.dumps({"text": article}, ensure_ascii=False) + "\n")
+    # Mismo formato que el emisor "text" de generate_datasets.py
+    emitter = TextEmitter()
+    with JsonlWriter(output_path) as writer:
+        return writer.write_all(example for article in articles for example in emitter.examples_for(article))
 
 # Ejecutar el proceso
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera articulos_ley_769.jsonl a partir del PDF de la Ley 769 de 2002.")
+    add_workers_argument(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--output", default="articulos_ley_769.jsonl", help="Archivo de salida (.jsonl, .jsonl.gz o .jsonl.zst)")
+    args = parser.parse_args()
+    profiler = profiler_from_args(args)
+
     pdf_path = "ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf"
-    output_path = "articulos_ley_769.jsonl"
+    output_path = args.output
 
     print("Extrayendo texto del PDF...")
-    full_text = extract_text_from_pdf(pdf_path)
+    with profiler.stage("extract_pages_from_pdf") as record:
+        pages = extract_pages_from_pdf(pdf_path, workers=args.workers)
+        record.items = len(pages)
 
     print("Dividiendo por artículos...")
-    articles = split_by_articles(full_text)
+    articles = profiler.iterate("iter_articles", iter_articles(pages))
+
+    print(f"Guardando artículos en {output_path}...")
+    with profiler.stage("save_to_jsonl") as record:
+        article_count = save_to_jsonl(articles, output_path)
+        record.items = article_count
+    print(f"   {article_count} artículos guardados")
 
-    print(f"Guardando {len(articles)} artículos en {output_path}...")
-    save_to_jsonl(articles, output_path)
+    print("✅ Archivo JSONL generado exitosamente.")
 
-    print("✅ Archivo JSONL generado exitosamente.")
\ No newline at end of file
+    if args.profile:
+        profiler.finish(args.profile)
@@ -1,109 +1,35 @@
+import argparse
 import json
-from PyPDF2 import PdfReader
-import re
+from articles import extract_pages_from_pdf, iter_articles
+from emitters import OpenAIEmitter
+from jsonl_io import JsonlWriter, open_jsonl
+from pdf_extraction import add_workers_argument
+from profiling import add_profile_arguments, profiler_from_args
+from streaming import CountedIterator
 
-# Paso 1: Extraer texto del PDF
-def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
-
-# Paso 2: Dividir en bloques (ej: por artículo)
-def split_by_articles(full_text):
-    articles = []
-    current_article = ""
-    
-    for line in full_text.split('\n'):
-        if line.strip().upper().startswith("ARTÍCULO") or line.strip().upper().startswith("CAPÍTULO"):
-            if current_article:
-                articles.append(current_article.strip())
-            current_article = line + "\n"
-        else:
-            current_article += line + "\n"
-    
-    if current_article:
-        articles.append(current_article.strip())
-    
-    return articles
-
-# Paso 3: Extraer número y título del artículo
-def extract_article_info(article_text):
-    lines = article_text.split('\n')
-    first_line = lines[0].strip() if lines else ""
-    
-    # Buscar patrón "ARTÍCULO X°." o "ARTÍCULO X."
-    match = re.search(r'ARTÍCULO\s+(\d+)[°.]?\s*[.-]?\s*(.*)', first_line, re.IGNORECASE)
-    if match:
-        number = match.group(1)
-        title = match.group(2).strip().rstrip('.')
-        return number, title
-    
-    # Buscar patrón "CAPÍTULO"
-    match = re.search(r'CAPÍTULO\s+(\w+)\s*[.-]?\s*(.*)', first_line, re.IGNORECASE)
-    if match:
-        number = match.group(1)
-        title = match.group(2).strip().rstrip('.')
-        return f"CAP-{number}", title
-    
-    # Si no encuentra patrón, usar las primeras palabras como título
-    words = first_line.split()[:5]  # Primeras 5 palabras
-    title = ' '.join(words) if words else "Sin título"
-    return "UNKNOWN", title
-
-# Paso 4: Generar preguntas variadas sobre el artículo
-def generate_questions_for_article(article_number, article_title, article_content):
-    questions = [
-        f"¿Qué establece el artículo {article_number} del Código Nacional de Tránsito?",
-        f"Explícame el contenido del artículo {article_number}.",
-        f"¿Cuál es el contenido del artículo {article_number} sobre {article_title.lower()}?",
-        f"Artículo {article_number}: {article_title}",
-        f"¿Qué dice la ley de tránsito en el artículo {article_number}?",
-        f"Necesito información sobre el artículo {article_number} del código de tránsito."
-    ]
-    return questions
+# Paso 1: Extraer el texto de cada página del PDF (normalizado, ver text_normalization.py)
+# Paso 2: Dividir en artículos con el árbol del documento (ver document_parser.py):
+# solo los encabezados ARTÍCULO/ARTICULO al inicio de una línea abren un artículo,
+# y los TÍTULO/CAPÍTULO no se confunden con artículos
+# Paso 3 y 4: Número, título y preguntas de cada artículo (ver articles.py)
 
 # Paso 5: Crear ejemplos de entrenamiento en formato OpenAI
 def create_training_examples(articles):
-    training_examples = []
-    system_message = "Eres un asistente experto en el Código Nacional de Tránsito de Colombia (Ley 769 de 2002). Proporciona información precisa y detallada sobre los artículos del código cuando se te consulte."
-    
+    # Mismos ejemplos que el emisor "openai" de generate_datasets.py; el preámbulo no genera preguntas
+    emitter = OpenAIEmitter()
     for article in articles:
-        if not article.strip():
-            continue
-            
-        article_number, article_title = extract_article_info(article)
-        
-        # Limpiar el contenido del artículo
-        clean_content = article.strip()
-        
-        # Generar múltiples preguntas para este artículo
-        questions = generate_questions_for_article(article_number, article_title, clean_content)
-        
-        # Crear ejemplos de entrenamiento para cada pregunta
-        for question in questions:
-            training_example = {
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": question},
-                    {"role": "assistant", "content": clean_content}
-                ]
-            }
-            training_examples.append(training_example)
-    
-    return training_examples
+        yield from emitter.examples_for(article)
 
 # Paso 6: Guardar en formato JSONL para fine-tuning
 def save_to_jsonl_finetuning(training_examples, output_path):
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for example in training_examples:
-            f.write(json.dumps(example, ensure_ascii=False) + "\n")
+    # La extensión define la compresión: .jsonl, .jsonl.gz o .jsonl.zst
+    with JsonlWriter(output_path) as writer:
+        return writer.write_all(training_examples)
 
 # Paso 7: Validar formato del archivo JSONL
 def validate_jsonl_format(file_path):
     errors = []
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open_jsonl(file_path) as f:
         for line_num, line in enumerate(f, 1):
             try:
                 data = json.loads(line.strip())
@@ -134,25 +60,40 @@ def validate_jsonl_format(file_path):
 
 # Ejecutar el proceso
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera el dataset de fine-tuning de OpenAI a partir del PDF de la Ley 769 de 2002.")
+    add_workers_argument(parser)
+    add_profile_arguments(parser)
+    parser.add_argument("--output", default="articulos_ley_769_finetuning.jsonl", help="Archivo de salida (.jsonl, .jsonl.gz o .jsonl.zst)")
+    args = parser.parse_args()
+    profiler = profiler_from_args(args)
+
     pdf_path = "ley-769-de-2002-codigo-nacional-de-transito_3704_0.pdf"
-    output_path = "articulos_ley_769_finetuning.jsonl"
+    output_path = args.output
 
     print("🔍 Extrayendo texto del PDF...")
-    full_text = extract_text_from_pdf(pdf_path)
+    with profiler.stage("extract_pages_from_pdf") as record:
+        pages = extract_pages_from_pdf(pdf_path, workers=args.workers)
+        record.items = len(pages)
 
+    # Las etapas se encadenan como generadores: cada artículo pasa por división,
+    # generación de ejemplos y escritura sin que el corpus completo esté en memoria
     print("📄 Dividiendo por artículos...")
-    articles = split_by_articles(full_text)
-    print(f"   Encontrados {len(articles)} artículos")
+    articles = CountedIterator(profiler.iterate("iter_articles", iter_articles(pages)))
 
     print("🤖 Creando ejemplos de entrenamiento para fine-tuning...")
-    training_examples = create_training_examples(articles)
-    print(f"   Generados {len(training_examples)} ejemplos de entrenamiento")
+    training_examples = profiler.iterate("create_training_examples", create_training_examples(articles))
 
     print(f"💾 Guardando ejemplos en {output_path}...")
-    save_to_jsonl_finetuning(training_examples, output_path)
+    with profiler.stage("save_to_jsonl_finetuning") as record:
+        example_count = save_to_jsonl_finetuning(training_examples, output_path)
+        record.items = example_count
+    print(f"   Encontrados {articles.count} artículos")
+    print(f"   Generados {example_count} ejemplos de entrenamiento")
 
     print("✅ Validando formato del archivo...")
-    validation_errors = validate_jsonl_format(output_path)
+    with profiler.stage("validate_jsonl_format") as record:
+        validation_errors = validate_jsonl_format(output_path)
+        record.items = example_count
     
     if validation_errors:
         print("❌ Se encontraron errores de formato:")
@@ -162,6 +103,9 @@ if __name__ == "__main__":
             print(f"   ... y {len(validation_errors) - 10} errores más")
     else:
         print("✅ Archivo JSONL generado exitosamente y validado para fine-tuning de OpenAI.")
-        print(f"📊 Total de ejemplos: {len(training_examples)}")
+        print(f"📊 Total de ejemplos: {example_count}")
         print(f"📁 Archivo: {output_path}")
-        print("\n🚀 El archivo está listo para subir a OpenAI para fine-tuning.")
\ No newline at end of file
+        print("\n🚀 El archivo está listo para subir a OpenAI para fine-tuning.")
+
+    if args.profile:
+        profiler.finish(args.profile)
@@ -1,9 +1,12 @@
 
 
+import argparse
 import os
-import vertexai
-from google.cloud import storage
-from google.api_core import exceptions
+
+from dataset_shards import MANIFEST_SUFFIX, load_shard_manifest
+from storage import GCSBackend, print_upload_result, upload_file, upload_files
+from tuning_registry import DEFAULT_REGISTRY_PATH, TuningRegistry, VertexTuningBackend, dataset_files, launch_or_reuse, print_job
+from tuning_sweep import add_sweep_arguments, run_sweep_from_args, sweep_jobs_from_args
 
 # ------------------------------------------------------------------
 # POR FAVOR, EDITA ESTAS VARIABLES ANTES DE EJECUTAR
@@ -12,60 +15,96 @@ PROJECT_ID = "141117906850"  # Reemplaza con tu ID de Proyecto de Google Cloud
 REGION = "us-central1"      # Región para crear el bucket y ejecutar el job
 BUCKET_NAME = "tu-bucket-unico-global" # Reemplaza con un nombre de bucket único
 LOCAL_JSONL_PATH = "articulos_ley_769_gemini.jsonl" # Nombre del archivo local
+# Si existe, se suben los fragmentos de entrenamiento y validación de generate_datasets.py --validacion
+LOCAL_MANIFEST_PATH = "articulos_ley_769_gemini.shards.json"
+UPLOAD_WORKERS = 8  # Partes o fragmentos que se suben en paralelo
 MODEL_DISPLAY_NAME = "ley-transito-colombia-v1" # Nombre para tu modelo ajustado
+BASE_MODEL = "gemini-1.0-pro-002" # Modelo base para el ajuste
+# Hiperparámetros (ajusta si es necesario); train_steps es equivalente a épocas, ajústalo según el tamaño de tu dataset
+HYPERPARAMETERS = {"train_steps": 100}
+# Registro local de trabajos: no se lanza otro si ya se ajustó este dataset con el mismo modelo e hiperparámetros
+REGISTRY_PATH = DEFAULT_REGISTRY_PATH
 # ------------------------------------------------------------------
 
-# Validar que las variables han sido cambiadas
-if "tu-project-id" in PROJECT_ID or "tu-bucket-unico-global" in BUCKET_NAME:
-    print("¡ERROR! Por favor, edita las variables PROJECT_ID y BUCKET_NAME en el script antes de ejecutarlo.")
-    exit()
+def check_config():
+    """Valida la configuración y el dataset local antes de importar los SDK de Google Cloud; devuelve el error o None."""
+    # Validar que las variables han sido cambiadas
+    if "tu-project-id" in PROJECT_ID or "tu-bucket-unico-global" in BUCKET_NAME:
+        return "¡ERROR! Por favor, edita las variables PROJECT_ID y BUCKET_NAME en el script antes de ejecutarlo."
+    if not os.path.exists(LOCAL_MANIFEST_PATH) and not os.path.exists(LOCAL_JSONL_PATH):
+        return f"¡ERROR! No existe '{LOCAL_JSONL_PATH}' ni '{LOCAL_MANIFEST_PATH}'. Genera primero el dataset con generate_datasets.py."
+    return None
 
 def upload_to_gcs(bucket_name, source_file_path, destination_blob_name):
-    """Sube un archivo local a un bucket de GCS, creándolo si no existe."""
-    storage_client = storage.Client(project=PROJECT_ID)
-    
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-        print(f"Bucket '{bucket_name}' ya existe.")
-    except exceptions.NotFound:
-        print(f"Bucket '{bucket_name}' no encontrado. Creándolo en la región {REGION}...")
-        bucket = storage_client.create_bucket(bucket_name, location=REGION)
-        print(f"Bucket '{bucket_name}' creado exitosamente.")
-
-    blob = bucket.blob(destination_blob_name)
-    
+    """Sube un archivo local a un bucket de GCS (creándolo si no existe); si el archivo no cambió, no se vuelve a subir."""
+    backend = GCSBackend.open(bucket_name, project=PROJECT_ID, location=REGION)
+
     print(f"Subiendo archivo '{source_file_path}' a 'gs://{bucket_name}/{destination_blob_name}'...")
-    blob.upload_from_filename(source_file_path)
-    print("Archivo subido exitosamente.")
-    
-    return f"gs://{bucket_name}/{destination_blob_name}"
-
-def tune_gemini_model(project_id, region, training_data_uri, model_display_name):
-    """Inicia un trabajo de fine-tuning para un modelo Gemini."""
-    print(f"Inicializando Vertex AI para el proyecto '{project_id}' en la región '{region}'...")
-    vertexai.init(project=project_id, location=region)
-    
-    # Selecciona el modelo base para el ajuste
-    base_model = vertexai.generative_models.GenerativeModel("gemini-1.0-pro-002")
-    
-    print(f"Iniciando trabajo de fine-tuning para el modelo '{model_display_name}'...")
-    print(f"Usando datos de entrenamiento: {training_data_uri}")
-    
-    # Inicia el trabajo de ajuste
-    tuning_job = base_model.tune(
-        training_data=training_data_uri,
-        model_display_name=model_display_name,
-        # Hiperparámetros (ajusta si es necesario)
-        train_steps=100, # Equivalente a épocas, ajusta según el tamaño de tu dataset
-        tuning_job_location="europe-west4", # Ubicación recomendada por Google para los jobs de ajuste
-        tuned_model_location=region # Dónde se desplegará el modelo final
-    )
-    
-    print("\n¡Trabajo de fine-tuning iniciado!")
-    print(f"Para monitorear el progreso, visita la consola de Vertex AI en tu proyecto.")
-    print(f"ID del Job: {tuning_job.resource_name}")
-    print(f"Una vez completado, tu modelo se llamará: '{model_display_name}'")
+    result = upload_file(backend, source_file_path, destination_blob_name, workers=UPLOAD_WORKERS)
+    print("El archivo ya estaba en el bucket sin cambios." if result.skipped else "Archivo subido exitosamente.")
+
+    return result.uri
+
+def upload_shards_to_gcs(bucket_name, manifest_path, max_workers=UPLOAD_WORKERS):
+    """Sube en paralelo los fragmentos del manifiesto (omitiendo los que no cambiaron); devuelve {split: [URIs gs://]}."""
+    paths, _ = load_shard_manifest(manifest_path)
+    backend = GCSBackend.open(bucket_name, project=PROJECT_ID, location=REGION)
+
+    print(f"Subiendo los fragmentos de '{manifest_path}' ({max_workers} en paralelo)...")
+    uris = {}
+    for split, split_paths in paths.items():
+        results = upload_files(backend, [(path, os.path.basename(path)) for path in split_paths], workers=max_workers)
+        for result in results:
+            print_upload_result(result)
+        uris[split] = [result.uri for result in results]
+    return uris
+
+def upload_dataset(dataset):
+    """Sube un JSONL o los fragmentos de un manifiesto; devuelve (URI de entrenamiento, URI de validación o None)."""
+    if dataset.endswith(MANIFEST_SUFFIX):
+        uris = upload_shards_to_gcs(BUCKET_NAME, dataset)
+        return uris["train"][0], uris["validation"][0] if uris["validation"] else None
+    name = os.path.basename(dataset)
+    return upload_to_gcs(BUCKET_NAME, dataset, name), None
+
+def tune_gemini_model(project_id, region, dataset_paths, upload, model_display_name, backend=None):
+    """Inicia un trabajo de fine-tuning para un modelo Gemini, salvo que el registro local ya tenga uno para este dataset.
+
+    `upload()` sube el dataset y devuelve (URI de entrenamiento, URI de validación o None).
+    """
+    backend = backend or VertexTuningBackend(project_id, region)
+    with TuningRegistry(REGISTRY_PATH) as registry:
+        job, reused = launch_or_reuse(registry, backend, dataset_paths, BASE_MODEL, HYPERPARAMETERS, model_display_name, upload)
+    print_job(job, reused)
+    if not reused:
+        print(f"Para monitorear el progreso, visita la consola de Vertex AI en tu proyecto.")
+    return job
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Sube el dataset de Gemini a GCS e inicia el fine-tuning en Vertex AI (o reutiliza el trabajo registrado).")
+    parser.add_argument("--barrido", dest="sweep", action="store_true", help="Lanza un trabajo por combinación de la grilla y espera a todos (ver tuning_sweep.py)")
+    add_sweep_arguments(parser)
+    args = parser.parse_args(argv)
+
+    error = check_config()
+    if error:
+        print(error)
+        raise SystemExit(1)
+    # Si existe, se suben los fragmentos de entrenamiento y validación en lugar del JSONL completo
+    dataset = LOCAL_MANIFEST_PATH if os.path.exists(LOCAL_MANIFEST_PATH) else LOCAL_JSONL_PATH
+
+    if args.sweep:
+        jobs = sweep_jobs_from_args(args, parser, BASE_MODEL, dataset, HYPERPARAMETERS, MODEL_DISPLAY_NAME)
+        with TuningRegistry(REGISTRY_PATH) as registry:
+            run_sweep_from_args(args, jobs, registry, VertexTuningBackend(PROJECT_ID, REGION), upload_dataset)
+        return
+
+    try:
+        dataset_paths = dataset_files(dataset)
+    except ValueError as e:
+        print(f"¡ERROR! {e}")
+        raise SystemExit(1)
+    tune_gemini_model(PROJECT_ID, REGION, dataset_paths, lambda: upload_dataset(dataset), MODEL_DISPLAY_NAME)
 
 if __name__ == "__main__":
-    gcs_uri = upload_to_gcs(BUCKET_NAME, LOCAL_JSONL_PATH, LOCAL_JSONL_PATH)
-    tune_gemini_model(PROJECT_ID, REGION, gcs_uri, MODEL_DISPLAY_NAME)
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from dataset_shards import MANIFEST_SUFFIX, load_shard_manifest
+from pdf_cache import hash_file
+
+# Registro local de los trabajos de ajuste (fine-tuning). Cada trabajo se
+# identifica por el hash del contenido del dataset, el modelo base y los
+# hiperparámetros; antes de lanzar uno nuevo se consulta el registro:
+#
+#   - si ya hay un modelo ajustado con la misma clave, se reutiliza;
+#   - si hay un trabajo en curso, se consulta su estado y se espera a ese;
+#   - si el anterior falló o se canceló, se lanza otro.
+#
+# El servicio de ajuste es intercambiable: VertexTuningBackend usa Vertex AI y
+# FakeTuningBackend simula los trabajos en memoria para probar sin conexión.
+
+DEFAULT_REGISTRY_PATH = "tuning_jobs.sqlite"
+
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+REUSABLE_STATUSES = (JOB_RUNNING, JOB_SUCCEEDED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    dataset_hash TEXT NOT NULL,
+    base_model TEXT NOT NULL,
+    hyperparameters TEXT NOT NULL,
+    display_name TEXT,
+    training_uri TEXT,
+    validation_uri TEXT,
+    job_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tuned_model TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+COLUMNS = ("key", "dataset_hash", "base_model", "hyperparameters", "display_name", "training_uri", "validation_uri",
+           "job_name", "status", "tuned_model", "attempts", "created_at", "updated_at")
+
+
+def dataset_files(dataset):
+    """Archivos de un dataset: un JSONL, o los fragmentos de entrenamiento y validación de un manifiesto `.shards.json`."""
+    if not dataset.endswith(MANIFEST_SUFFIX):
+        return [dataset]
+    paths, _ = load_shard_manifest(dataset)
+    # El job de ajuste recibe un único archivo por conjunto
+    if len(paths["train"]) != 1 or len(paths["validation"]) > 1:
+        raise ValueError(f"{dataset}: el job de ajuste recibe un solo archivo de entrenamiento y uno de validación; "
+                         "genera los fragmentos con un --fragmento-mb mayor (sin superar el límite de tamaño de Vertex AI)")
+    return paths["train"] + paths["validation"]
+
+
+def hash_dataset(paths):
+    """Hash del contenido de los archivos del dataset (entrenamiento y, si hay, validación) en orden."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(hash_file(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def job_key(dataset_hash, base_model, hyperparameters):
+    """Clave del trabajo: los hiperparámetros se serializan con las claves ordenadas."""
+    payload = json.dumps([dataset_hash, base_model, hyperparameters], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class TuningBackend:
+    """Servicio que ejecuta los trabajos de ajuste."""
+
+    def start(self, base_model, training_uri, validation_uri, display_name, hyperparameters):
+        """Lanza un trabajo y devuelve su nombre de recurso."""
+        raise NotImplementedError
+
+    def status(self, job_name):
+        """Devuelve (estado, modelo ajustado o None) del trabajo."""
+        raise NotImplementedError
+
+    def metrics(self, job_name):
+        """Métricas del trabajo terminado (por defecto, ninguna)."""
+        return {}
+
+
+class FakeTuningBackend(TuningBackend):
+    """Simula trabajos en memoria: cada uno termina después de `polls_to_finish` consultas de estado.
+
+    Con `duration` (segundos, o una función de los hiperparámetros que los
+    devuelve) los trabajos terminan al pasar ese tiempo, sin importar las consultas.
+    """
+
+    def __init__(self, polls_to_finish=1, fail=False, duration=None):
+        self.polls_to_finish = polls_to_finish
+        self.fail = fail
+        self.duration = duration
+        self.jobs = {}
+        self.launches = 0
+        self._lock = threading.Lock()  # Los barridos lanzan trabajos desde varios hilos
+
+    def start(self, base_model, training_uri, validation_uri, display_name, hyperparameters):
+        duration = self.duration(hyperparameters) if callable(self.duration) else self.duration
+        with self._lock:
+            self.launches += 1
+            job_name = f"fake/tuningJobs/{self.launches}"
+            self.jobs[job_name] = {
+                "polls": 0,
+                "display_name": display_name,
+                "hyperparameters": dict(hyperparameters),
+                "ends_at": time.monotonic() + duration if duration is not None else None,
+            }
+        return job_name
+
+    def status(self, job_name):
+        job = self.jobs.get(job_name)
+        if job is None:
+            return JOB_FAILED, None
+        job["polls"] += 1
+        if job["ends_at"] is not None:
+            running = time.monotonic() < job["ends_at"]
+        else:
+            running = job["polls"] < self.polls_to_finish
+        if running:
+            return JOB_RUNNING, None
+        if self.fail:
+            return JOB_FAILED, None
+        return JOB_SUCCEEDED, f"fake/models/{job['display_name']}-{job_name.rsplit('/', 1)[1]}"
+
+    def metrics(self, job_name):
+        # Pérdida simulada: baja con más pasos y un learning rate mayor
+        job = self.jobs.get(job_name)
+        if job is None:
+            return {}
+        hyperparameters = job["hyperparameters"]
+        steps = hyperparameters.get("train_steps", 0)
+        learning_rate = hyperparameters.get("learning_rate_multiplier", 1.0)
+        return {"final_loss": round(2.0 / (1 + steps * learning_rate / 100), 4)}
+
+
+class VertexTuningBackend(TuningBackend):
+    """Trabajos de ajuste supervisado de Gemini en Vertex AI."""
+
+    def __init__(self, project_id, region, tuning_job_location="europe-west4"):
+        import vertexai
+
+        print(f"Inicializando Vertex AI para el proyecto '{project_id}' en la región '{region}'...")
+        vertexai.init(project=project_id, location=region)
+        self.region = region
+        self.tuning_job_location = tuning_job_location
+
+    def start(self, base_model, training_uri, validation_uri, display_name, hyperparameters):
+        from vertexai.generative_models import GenerativeModel
+
+        tuning_job = GenerativeModel(base_model).tune(
+            training_data=training_uri,
+            validation_data=validation_uri,
+            model_display_name=display_name,
+            tuning_job_location=self.tuning_job_location,  # Ubicación recomendada por Google para los jobs de ajuste
+            tuned_model_location=self.region,  # Dónde se desplegará el modelo final
+            **hyperparameters,
+        )
+        return tuning_job.resource_name
+
+    def status(self, job_name):
+        from vertexai.tuning import sft
+
+        job = sft.SupervisedTuningJob(job_name)
+        if not job.has_ended:
+            return JOB_RUNNING, None
+        if job.has_succeeded:
+            return JOB_SUCCEEDED, job.tuned_model_name
+        return JOB_CANCELLED if "CANCELLED" in str(job.state) else JOB_FAILED, None
+
+    def metrics(self, job_name):
+        from vertexai.tuning import sft
+
+        resource = sft.SupervisedTuningJob(job_name).gca_resource
+        stats = resource.tuning_data_stats.supervised_tuning_data_stats
+        metrics = {
+            "examples": stats.tuning_dataset_example_count,
+            "steps": stats.tuning_step_count,
+            "billable_characters": stats.total_billable_character_count,
+        }
+        if resource.start_time and resource.end_time:
+            metrics["duration_s"] = round((resource.end_time - resource.start_time).total_seconds(), 1)
+        return metrics
+
+
+class TuningRegistry:
+    """Trabajos de ajuste guardados en SQLite, uno por clave (dataset + modelo base + hiperparámetros)."""
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+
+    def get(self, key):
+        row = self.connection.execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def jobs(self):
+        return [dict(row) for row in self.connection.execute("SELECT * FROM jobs ORDER BY created_at")]
+
+    def record_launch(self, key, dataset_hash, base_model, hyperparameters, display_name, training_uri, validation_uri, job_name):
+        previous = self.get(key)
+        now = time.time()
+        job = {
+            "key": key,
+            "dataset_hash": dataset_hash,
+            "base_model": base_model,
+            "hyperparameters": json.dumps(hyperparameters, sort_keys=True),
+            "display_name": display_name,
+            "training_uri": training_uri,
+            "validation_uri": validation_uri,
+            "job_name": job_name,
+            "status": JOB_RUNNING,
+            "tuned_model": None,
+            "attempts": previous["attempts"] + 1 if previous else 1,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [job[column] for column in COLUMNS],
+            )
+        return job
+
+    def update_status(self, key, status, tuned_model=None):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, tuned_model = COALESCE(?, tuned_model), updated_at = ? WHERE key = ?",
+                (status, tuned_model, time.time(), key),
+            )
+        return self.get(key)
+
+    def refresh(self, key, backend):
+        """Consulta el estado de un trabajo en curso y lo guarda."""
+        job = self.get(key)
+        if job is not None and job["status"] == JOB_RUNNING:
+            status, tuned_model = backend.status(job["job_name"])
+            job = self.update_status(key, status, tuned_model)
+        return job
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def launch_or_reuse(registry, backend, dataset_paths, base_model, hyperparameters, display_name, upload):
+    """Reutiliza el trabajo o el modelo ya registrado para este dataset o lanza uno nuevo.
+
+    `upload()` sube el dataset y devuelve (URI de entrenamiento, URI de
+    validación o None); solo se llama si hay que lanzar un trabajo. Devuelve
+    (trabajo, reutilizado).
+    """
+    dataset_hash = hash_dataset(dataset_paths)
+    key = job_key(dataset_hash, base_model, hyperparameters)
+    job = registry.refresh(key, backend)
+    if job is not None and job["status"] in REUSABLE_STATUSES:
+        return job, True
+
+    training_uri, validation_uri = upload()
+    job_name = backend.start(base_model, training_uri, validation_uri, display_name, hyperparameters)
+    return registry.record_launch(key, dataset_hash, base_model, hyperparameters, display_name, training_uri, validation_uri, job_name), False
+
+
+def print_job(job, reused):
+    if not reused:
+        print("\n¡Trabajo de fine-tuning iniciado!")
+    elif job["status"] == JOB_SUCCEEDED:
+        print("\nEste dataset ya se ajustó con el mismo modelo base e hiperparámetros: se reutiliza el modelo.")
+    else:
+        print("\nYa hay un trabajo en curso para este dataset con el mismo modelo base e hiperparámetros: no se lanza otro.")
+    print(f"Datos de entrenamiento: {job['training_uri']}")
+    if job["validation_uri"]:
+        print(f"Datos de validación: {job['validation_uri']}")
+    print(f"ID del Job: {job['job_name']} ({job['status']})")
+    if job["tuned_model"]:
+        print(f"Modelo ajustado: {job['tuned_model']}")
+    else:
+        print(f"Una vez completado, tu modelo se llamará: '{job['display_name']}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta el registro local de trabajos de fine-tuning.")
+    parser.add_argument("--registro", dest="registry", default=DEFAULT_REGISTRY_PATH, help="Archivo SQLite del registro")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.registry):
+        print(f"No hay trabajos registrados ({args.registry} no existe).")
+        raise SystemExit(0)
+    with TuningRegistry(args.registry) as registry:
+        for job in registry.jobs():
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(job["created_at"]))
+            print(f"{created}  {job['status']:<10} {job['base_model']}  {job['hyperparameters']}  {job['display_name']}")
+            print(f"    dataset {job['dataset_hash'][:16]}  job {job['job_name']}  modelo {job['tuned_model'] or '-'}")
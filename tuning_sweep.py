@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import namedtuple
+
+from tuning_registry import (
+    JOB_FAILED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    REUSABLE_STATUSES,
+    FakeTuningBackend,
+    TuningRegistry,
+    dataset_files,
+    hash_dataset,
+    job_key,
+)
+
+# Barrido de hiperparámetros: lanza un trabajo de ajuste por cada combinación de
+# la grilla (modelo base, dataset y valores de cada hiperparámetro) y espera a
+# todos a la vez con asyncio. Como los trabajos corren en paralelo en el
+# servicio, el barrido tarda lo que tarde el más lento y no la suma de todos.
+#
+#   - `--concurrencia` limita los trabajos en curso (las cuotas de Vertex AI
+#     también lo hacen); el resto espera su turno.
+#   - El estado se consulta con espera exponencial: `--sondeo` segundos al
+#     principio, el doble después de cada consulta, hasta `--sondeo-max`.
+#   - Cada trabajo pasa por el registro local (tuning_registry.py): las
+#     combinaciones ya ajustadas o en curso se reutilizan en lugar de lanzarse
+#     otra vez, así que repetir un barrido interrumpido solo espera a los que
+#     faltan.
+#
+# El servicio es intercambiable; este script usa FakeTuningBackend para probar
+# el barrido sin conexión y `tune_gemini.py --barrido` lo ejecuta en Vertex AI.
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POLL_INTERVAL = 60.0
+DEFAULT_MAX_POLL_INTERVAL = 900.0
+MAX_STATUS_ERRORS = 5  # Errores seguidos al consultar un trabajo antes de darlo por fallido
+DEFAULT_REPORT_PATH = "tuning_sweep.json"
+SPECIAL_KEYS = ("base_model", "dataset")
+
+SweepJob = namedtuple("SweepJob", ["display_name", "base_model", "dataset", "hyperparameters"])
+
+
+def expand_grid(grid, display_name):
+    """Genera un SweepJob por combinación; `grid` es {"base_model": [...], "dataset": [...], hiperparámetro: [...]}."""
+    names = [name for name in grid if name not in SPECIAL_KEYS]
+    jobs = []
+    for base_model, dataset, *values in itertools.product(grid["base_model"], grid["dataset"], *(grid[name] for name in names)):
+        jobs.append(SweepJob(f"{display_name}-{len(jobs) + 1:02d}", base_model, dataset, dict(zip(names, values))))
+    return jobs
+
+
+def load_grid(path):
+    """Lee la grilla de un JSON; un valor suelto equivale a una lista de un elemento."""
+    with open(path, encoding="utf-8") as f:
+        grid = json.load(f)
+    return {name: values if isinstance(values, list) else [values] for name, values in grid.items()}
+
+
+def _parse_list(value, convert):
+    values = []
+    for item in value.split(","):
+        item = item.strip()
+        if item and convert(item) not in values:
+            values.append(convert(item))
+    return values
+
+
+async def _shared(cache, dataset, func):
+    # Los trabajos del mismo dataset comparten el hash y la subida
+    if dataset not in cache:
+        cache[dataset] = asyncio.ensure_future(asyncio.to_thread(func, dataset))
+    return await cache[dataset]
+
+
+async def _wait_for_job(registry, backend, key, job, result, poll_interval, max_poll_interval, deadline):
+    interval = poll_interval
+    errors = 0
+    while job["status"] == JOB_RUNNING:
+        try:
+            status, tuned_model = await asyncio.to_thread(backend.status, job["job_name"])
+        except Exception:
+            errors += 1
+            if errors >= MAX_STATUS_ERRORS:
+                raise
+        else:
+            errors = 0
+            result["polls"] += 1
+            job = registry.update_status(key, status, tuned_model)
+            if job["status"] != JOB_RUNNING:
+                break
+        if deadline is not None and time.monotonic() + interval > deadline:
+            # El trabajo sigue en el servicio; el registro lo retoma en el próximo barrido
+            break
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, max_poll_interval)
+    return job
+
+
+async def _run_job(sweep_job, registry, backend, upload, semaphore, hashes, uploads, poll_interval, max_poll_interval, max_wait):
+    result = {
+        "display_name": sweep_job.display_name,
+        "base_model": sweep_job.base_model,
+        "dataset": sweep_job.dataset,
+        "hyperparameters": sweep_job.hyperparameters,
+        "job_name": None,
+        "status": None,
+        "tuned_model": None,
+        "reused": False,
+        "metrics": {},
+        "polls": 0,
+        "elapsed_s": None,
+        "error": None,
+    }
+    async with semaphore:
+        started = time.monotonic()
+        deadline = started + max_wait if max_wait else None
+        try:
+            dataset_hash = await _shared(hashes, sweep_job.dataset, lambda dataset: hash_dataset(dataset_files(dataset)))
+            key = job_key(dataset_hash, sweep_job.base_model, sweep_job.hyperparameters)
+            job = registry.get(key)
+            if job is not None and job["status"] in REUSABLE_STATUSES:
+                result["reused"] = True
+            else:
+                training_uri, validation_uri = await _shared(uploads, sweep_job.dataset, upload)
+                job_name = await asyncio.to_thread(
+                    backend.start, sweep_job.base_model, training_uri, validation_uri, sweep_job.display_name, sweep_job.hyperparameters,
+                )
+                job = registry.record_launch(
+                    key, dataset_hash, sweep_job.base_model, sweep_job.hyperparameters, sweep_job.display_name,
+                    training_uri, validation_uri, job_name,
+                )
+            result["job_name"] = job["job_name"]
+            job = await _wait_for_job(registry, backend, key, job, result, poll_interval, max_poll_interval, deadline)
+            result["status"] = job["status"]
+            result["tuned_model"] = job["tuned_model"]
+        except Exception as e:
+            result["status"] = JOB_FAILED
+            result["error"] = str(e)
+        if result["status"] == JOB_SUCCEEDED:
+            try:
+                result["metrics"] = await asyncio.to_thread(backend.metrics, result["job_name"])
+            except Exception as e:
+                # El modelo ya está ajustado: sin métricas el trabajo no cuenta como fallido
+                result["error"] = f"Métricas no disponibles: {e}"
+        result["elapsed_s"] = round(time.monotonic() - started, 3)
+    return result
+
+
+async def run_sweep(jobs, registry, backend, upload, concurrency=DEFAULT_CONCURRENCY, poll_interval=DEFAULT_POLL_INTERVAL,
+                    max_poll_interval=DEFAULT_MAX_POLL_INTERVAL, max_wait=None):
+    """Lanza (o reutiliza) los trabajos del barrido y espera a que terminen; devuelve un resultado por trabajo, en orden.
+
+    `upload(dataset)` sube un dataset y devuelve (URI de entrenamiento, URI de
+    validación o None); se llama una vez por dataset. Las llamadas al servicio
+    son bloqueantes y se ejecutan en hilos; el registro se usa solo desde el
+    bucle de eventos. Con `max_wait` los trabajos que sigan en curso después de
+    esos segundos quedan como "running".
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    hashes = {}
+    uploads = {}
+    return await asyncio.gather(*(
+        _run_job(job, registry, backend, upload, semaphore, hashes, uploads, poll_interval, max_poll_interval, max_wait)
+        for job in jobs
+    ))
+
+
+def save_sweep_report(results, report_path, wall_s):
+    report = {"wall_s": round(wall_s, 3), "jobs": results}
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, report_path)
+    return report
+
+
+def _format_values(values):
+    return " ".join(f"{name}={value}" for name, value in values.items()) or "-"
+
+
+def print_sweep_table(results, wall_s):
+    headers = ("trabajo", "modelo base", "dataset", "hiperparámetros", "estado", "tiempo", "métricas", "modelo ajustado")
+    rows = []
+    for result in results:
+        status = result["status"] + (" (reutilizado)" if result["reused"] else "")
+        rows.append((
+            result["display_name"],
+            result["base_model"],
+            os.path.basename(result["dataset"]),
+            _format_values(result["hyperparameters"]),
+            status,
+            f"{result['elapsed_s']:.1f} s",
+            _format_values(result["metrics"]),
+            result["tuned_model"] or result["error"] or "-",
+        ))
+    widths = [max(len(row[column]) for row in rows + [headers]) for column in range(len(headers))]
+    for row in [headers] + rows:
+        print("  " + "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+    succeeded = sum(1 for result in results if result["status"] == JOB_SUCCEEDED)
+    slowest = max((result["elapsed_s"] for result in results), default=0.0)
+    total = sum(result["elapsed_s"] for result in results)
+    print(f"  {succeeded}/{len(results)} trabajos terminados con éxito en {wall_s:.1f} s "
+          f"(el más lento tardó {slowest:.1f} s; uno tras otro habrían sido {total:.1f} s)")
+
+
+def add_sweep_arguments(parser):
+    """Agrega las opciones de la grilla y del monitoreo del barrido."""
+    parser.add_argument("--grilla", dest="grid", default=None, help='JSON con la grilla, p. ej. {"train_steps": [50, 100], "learning_rate_multiplier": [0.5, 1.0]}')
+    parser.add_argument("--modelos", dest="base_models", default=None, help="Modelos base separados por comas")
+    parser.add_argument("--datasets", default=None, help="Datasets separados por comas (JSONL o manifiestos .shards.json)")
+    parser.add_argument("--train-steps", default=None, help="Valores de train_steps separados por comas")
+    parser.add_argument("--lr", dest="learning_rates", default=None, help="Valores de learning_rate_multiplier separados por comas")
+    parser.add_argument("--concurrencia", dest="concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Trabajos en curso a la vez (por defecto {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--sondeo", dest="poll_interval", type=float, default=DEFAULT_POLL_INTERVAL, help="Segundos hasta la primera consulta de estado; se duplica en cada consulta")
+    parser.add_argument("--sondeo-max", dest="max_poll_interval", type=float, default=DEFAULT_MAX_POLL_INTERVAL, help="Máximo de segundos entre consultas de estado")
+    parser.add_argument("--espera-max", dest="max_wait", type=float, default=None, help="Segundos máximos de espera por trabajo (los que sigan en curso se retoman en el próximo barrido)")
+    parser.add_argument("--reporte", dest="report", default=DEFAULT_REPORT_PATH, help=f"Reporte JSON del barrido (por defecto {DEFAULT_REPORT_PATH})")
+
+
+def sweep_jobs_from_args(args, parser, base_model, dataset, hyperparameters, display_name):
+    """Arma los trabajos del barrido; lo que no indique la grilla toma los valores de un ajuste simple."""
+    try:
+        grid = load_grid(args.grid) if args.grid else {}
+        if args.base_models:
+            grid["base_model"] = _parse_list(args.base_models, str)
+        if args.datasets:
+            grid["dataset"] = _parse_list(args.datasets, str)
+        if args.train_steps:
+            grid["train_steps"] = _parse_list(args.train_steps, int)
+        if args.learning_rates:
+            grid["learning_rate_multiplier"] = _parse_list(args.learning_rates, float)
+    except (OSError, ValueError) as e:
+        parser.error(f"Grilla inválida: {e}")
+    grid.setdefault("base_model", [base_model])
+    grid.setdefault("dataset", [dataset])
+    for name, value in hyperparameters.items():
+        grid.setdefault(name, [value])
+    empty = [name for name, values in grid.items() if not values]
+    if empty:
+        parser.error(f"La grilla no tiene valores para: {', '.join(empty)}")
+
+    # Los datasets se revisan antes de importar los SDK o de subir nada
+    for path in grid["dataset"]:
+        if not os.path.exists(path):
+            parser.error(f"No existe el dataset {path}")
+        try:
+            dataset_files(path)
+        except ValueError as e:
+            parser.error(str(e))
+    return expand_grid(grid, display_name)
+
+
+def run_sweep_from_args(args, jobs, registry, backend, upload):
+    """Ejecuta el barrido, imprime la tabla y guarda el reporte."""
+    print(f"Barrido de {len(jobs)} trabajos ({args.concurrency} en paralelo)...")
+    start = time.perf_counter()
+    results = asyncio.run(run_sweep(
+        jobs, registry, backend, upload, args.concurrency, args.poll_interval, args.max_poll_interval, args.max_wait,
+    ))
+    wall_s = time.perf_counter() - start
+    print_sweep_table(results, wall_s)
+    save_sweep_report(results, args.report, wall_s)
+    print(f"Reporte del barrido guardado en {args.report}")
+    return results
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Simula un barrido de hiperparámetros con un servicio de ajuste en memoria (sin conexión).")
+    add_sweep_arguments(parser)
+    parser.add_argument("--segundos-por-paso", dest="seconds_per_step", type=float, default=0.01, help="Duración simulada de cada trabajo por cada train_step")
+    parser.add_argument("--registro", dest="registry", default=":memory:", help="Registro de trabajos (por defecto en memoria, para no mezclar trabajos simulados con los reales)")
+    parser.set_defaults(poll_interval=0.05, max_poll_interval=1.0)
+    args = parser.parse_args(argv)
+
+    jobs = sweep_jobs_from_args(args, parser, "gemini-1.0-pro-002", "articulos_ley_769_gemini.jsonl", {"train_steps": 100}, "simulado")
+    backend = FakeTuningBackend(duration=lambda hyperparameters: hyperparameters.get("train_steps", 0) * args.seconds_per_step)
+
+    def upload(dataset):
+        paths = dataset_files(dataset)
+        uris = [f"file://{os.path.abspath(path)}" for path in paths]
+        return uris[0], uris[1] if len(uris) > 1 else None
+
+    with TuningRegistry(args.registry) as registry:
+        results = run_sweep_from_args(args, jobs, registry, backend, upload)
+    if any(result["status"] != JOB_SUCCEEDED for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import json
+
+from jsonl_io import open_jsonl, read_chunk_lines, split_chunks
+from pdf_extraction import add_workers_argument, resolve_workers
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+DEFAULT_MAX_CHARS = 100000  # Longitud máxima (en caracteres) de todo el contenido de un ejemplo
+DEFAULT_MAX_ERRORS = 20  # Errores de muestra que se conservan; el resto solo se cuenta
+
+ROLE_RULES = {
+    # Formato de chat de OpenAI: system opcional al inicio, luego user/assistant alternados
+    "openai": {"first": "user", "optional_first": "system", "answer": "assistant"},
+    # Formato de Gemini: user/model alternados, sin mensaje de sistema
+    "gemini": {"first": "user", "optional_first": None, "answer": "model"},
+}
+SCHEMAS = ("openai", "gemini", "text")
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _check_text(data, max_chars):
+    text = data.get("text") if isinstance(data, dict) else None
+    if not isinstance(text, str):
+        return [("text", "Falta la clave 'text' o no es una cadena")]
+    if not text.strip():
+        return [("empty", "El texto está vacío")]
+    if max_chars and len(text) > max_chars:
+        return [("length", f"El texto tiene {len(text)} caracteres (máximo {max_chars})")]
+    return []
+
+
+def _check_messages(data, rules, max_chars):
+    if not isinstance(data, dict) or 'messages' not in data:
+        return [("messages", "Falta la clave 'messages'")]
+    messages = data['messages']
+    if not isinstance(messages, list):
+        return [("messages", "'messages' debe ser una lista")]
+
+    errors = []
+    allowed = {rules["first"], rules["answer"], rules["optional_first"]} - {None}
+    conversation = messages
+    total_chars = 0
+    for msg_idx, message in enumerate(messages, 1):
+        if not isinstance(message, dict) or 'role' not in message or 'content' not in message:
+            errors.append(("fields", f"Mensaje {msg_idx}: Falta 'role' o 'content'"))
+            return errors
+        if message['role'] not in allowed:
+            errors.append(("role", f"Mensaje {msg_idx}: Rol inválido '{message['role']}'"))
+        content = message['content']
+        if not isinstance(content, str) or not content.strip():
+            errors.append(("empty", f"Mensaje {msg_idx}: El contenido está vacío"))
+        else:
+            total_chars += len(content)
+
+    if errors:
+        return errors
+
+    if rules["optional_first"] and messages and messages[0]['role'] == rules["optional_first"]:
+        conversation = messages[1:]
+    if len(conversation) < 2 or len(conversation) % 2:
+        errors.append(("order", f"Debe haber pares de mensajes '{rules['first']}' y '{rules['answer']}'"))
+    else:
+        for msg_idx, message in enumerate(conversation):
+            expected = rules["first"] if msg_idx % 2 == 0 else rules["answer"]
+            if message['role'] != expected:
+                errors.append(("order", f"Los roles deben alternar '{rules['first']}' y '{rules['answer']}'"))
+                break
+
+    if max_chars and total_chars > max_chars:
+        errors.append(("length", f"El ejemplo tiene {total_chars} caracteres (máximo {max_chars})"))
+    return errors
+
+
+def check_example(schema, data, max_chars=DEFAULT_MAX_CHARS):
+    """Valida un ejemplo ya parseado; devuelve una lista de (código, mensaje)."""
+    if schema == "text":
+        return _check_text(data, max_chars)
+    return _check_messages(data, ROLE_RULES[schema], max_chars)
+
+
+class ValidationResult:
+    """Totales de una validación: líneas, errores por código y una muestra acotada de mensajes."""
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.lines = 0
+        self.invalid_lines = 0
+        self.error_counts = {}
+        self.samples = []
+
+    @property
+    def error_count(self):
+        return sum(self.error_counts.values())
+
+    @property
+    def ok(self):
+        return self.invalid_lines == 0
+
+    def add(self, line_num, errors):
+        """Registra los errores de una línea (una lista vacía cuenta como línea válida)."""
+        self.lines += 1
+        if not errors:
+            return
+        self.invalid_lines += 1
+        for code, message in errors:
+            self.error_counts[code] = self.error_counts.get(code, 0) + 1
+            if len(self.samples) < self.max_errors:
+                self.samples.append((line_num, message))
+
+    def add_valid(self, count):
+        """Cuenta `count` líneas válidas sin revisarlas (por ejemplo, un lote ya verificado)."""
+        self.lines += count
+
+    def check(self, schema, data, line_num=None, max_chars=DEFAULT_MAX_CHARS):
+        """Valida un ejemplo en memoria (validación en línea mientras se escribe)."""
+        self.add(self.lines + 1 if line_num is None else line_num, check_example(schema, data, max_chars))
+
+    def merge(self, other, line_offset=0):
+        self.lines += other.lines
+        self.invalid_lines += other.invalid_lines
+        for code, count in other.error_counts.items():
+            self.error_counts[code] = self.error_counts.get(code, 0) + count
+        for line_num, message in other.samples:
+            if len(self.samples) >= self.max_errors:
+                break
+            self.samples.append((line_num + line_offset, message))
+
+    def error_messages(self):
+        return [f"Línea {line_num}: {message}" for line_num, message in self.samples]
+
+    def to_dict(self):
+        return {
+            "lines": self.lines,
+            "invalid_lines": self.invalid_lines,
+            "error_counts": self.error_counts,
+            "samples": self.error_messages(),
+        }
+
+
+def _validate_lines(lines, schema, max_chars, max_errors):
+    result = ValidationResult(max_errors)
+    for line_num, line in enumerate(lines, 1):
+        try:
+            data = _loads(line)
+        except ValueError as e:
+            result.add(line_num, [("json", f"Error de JSON - {e}")])
+            continue
+        result.add(line_num, check_example(schema, data, max_chars))
+    return result
+
+
+def _validate_chunk(path, start, end, schema, max_chars, max_errors):
+    """Valida las líneas completas entre los bytes [start, end) del archivo."""
+    return _validate_lines(read_chunk_lines(path, start, end), schema, max_chars, max_errors)
+
+
+def validate_file(path, schema, workers=1, max_chars=DEFAULT_MAX_CHARS, max_errors=DEFAULT_MAX_ERRORS):
+    """Valida un archivo JSONL completo y devuelve un ValidationResult.
+
+    Los archivos sin comprimir se leen con mmap y se dividen en bloques que se
+    validan en paralelo; los comprimidos se recorren en streaming en un proceso.
+    """
+    workers = resolve_workers(workers)
+    if path.endswith((".gz", ".zst")):
+        with open_jsonl(path) as f:
+            return _validate_lines((line.rstrip("\n") for line in f), schema, max_chars, max_errors)
+
+    chunks = split_chunks(path, workers * 4)
+    result = ValidationResult(max_errors)
+    if workers == 1 or len(chunks) <= 1:
+        partials = [_validate_chunk(path, start, end, schema, max_chars, max_errors) for start, end in chunks]
+    else:
+        # Se importa aquí: el pool solo hace falta en modo paralelo y su importación retrasa el arranque
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(
+                _validate_chunk,
+                [path] * len(chunks),
+                [start for start, _ in chunks],
+                [end for _, end in chunks],
+                [schema] * len(chunks),
+                [max_chars] * len(chunks),
+                [max_errors] * len(chunks),
+            ))
+    for partial in partials:
+        # Los números de línea de cada bloque son locales: se desplazan según las líneas anteriores
+        result.merge(partial, line_offset=result.lines)
+    return result
+
+
+def detect_schema(path):
+    """Deduce el formato a partir de la primera línea del archivo."""
+    with open_jsonl(path) as f:
+        first_line = f.readline()
+    try:
+        data = json.loads(first_line)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and "text" in data:
+        return "text"
+    messages = data.get("messages") if isinstance(data, dict) else None
+    if isinstance(messages, list):
+        roles = {message.get("role") for message in messages if isinstance(message, dict)}
+        return "gemini" if "model" in roles else "openai"
+    return None
+
+
+def print_validation_result(result):
+    print(f"  Líneas: {result.lines}, inválidas: {result.invalid_lines}")
+    if result.error_counts:
+        print("  Errores por tipo: " + ", ".join(f"{code}={count}" for code, count in sorted(result.error_counts.items())))
+        for message in result.error_messages():
+            print(f"    {message}")
+        if result.error_count > len(result.samples):
+            print(f"    ... y {result.error_count - len(result.samples)} errores más")
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Valida archivos JSONL de fine-tuning (OpenAI, Gemini o texto) en paralelo.")
+    parser.add_argument("files", nargs="+", help="Archivos JSONL a validar (.jsonl, .jsonl.gz o .jsonl.zst)")
+    parser.add_argument("--schema", choices=SCHEMAS + ("auto",), default="auto", help="Formato esperado (por defecto se deduce de la primera línea)")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS, help="Máximo de caracteres por ejemplo (0 = sin límite)")
+    parser.add_argument("--max-errors", type=int, default=DEFAULT_MAX_ERRORS, help="Errores de muestra a mostrar")
+    add_workers_argument(parser, help="Procesos para validar en paralelo")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.files:
+        schema = detect_schema(path) if args.schema == "auto" else args.schema
+        if schema is None:
+            print(f"ERROR: No se pudo deducir el formato de {path}; usa --schema")
+            failed = True
+            continue
+        print(f"Validando {path} (formato {schema})...")
+        result = validate_file(path, schema, workers=args.workers, max_chars=args.max_chars, max_errors=args.max_errors)
+        print_validation_result(result)
+        if result.ok:
+            print("  Formato validado correctamente.")
+        else:
+            failed = True
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()